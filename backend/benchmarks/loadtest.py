@@ -0,0 +1,317 @@
+"""Async load generator for every /api route, with a fake LLM and optional in-memory Mongo.
+
+By default it starts its own server with LLM_BACKEND=fake and
+MONGO_URL=memory:// (needs mongomock-motor), so it runs offline. Point
+--mongo-url at a local mongod for realistic database timings, or use
+--url to drive a server that is already running.
+
+Each virtual user picks weighted operations. Some are chained, e.g. the
+innovation ids come from earlier generate jobs. The report gives
+throughput and p50/p95/p99 per route.
+
+    python benchmarks/loadtest.py --concurrency 32 --duration 30
+    python benchmarks/loadtest.py --mongo-url mongodb://localhost:27017 --llm-latency-ms 1500
+    python benchmarks/loadtest.py --url http://localhost:8001 --json results.json
+"""
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+WASTE_ITEMS = [
+    ("old smartphone", "cracked screen"), ("broken laptop", ""), ("desktop power supply", "dead"),
+    ("CRT monitor", "working"), ("wireless router", ""), ("inkjet printer", "paper jam"),
+    ("game controller", "stick drift"), ("DVD player", ""), ("electric toothbrush", "battery dead"),
+    ("bluetooth speaker", "no sound"), ("hard drive", "clicking"), ("tablet", "won't charge"),
+]
+INNOVATION_TYPES = ["diy_tools", "electronics", "home_utility", "creative_art", "eco_friendly"]
+
+
+def make_images(count: int) -> List[bytes]:
+    from PIL import Image
+
+    images = []
+    for index in range(count):
+        image = Image.new("RGB", (640, 480), (index * 37 % 256, index * 91 % 256, index * 53 % 256))
+        out = io.BytesIO()
+        image.save(out, format="JPEG", quality=90)
+        images.append(out.getvalue())
+    return images
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def request(self, http: httpx.AsyncClient, route: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        try:
+            response = await http.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[route] += 1
+            self.latencies[route].append(time.perf_counter() - started)
+            return None
+        self.latencies[route].append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors[route] += 1
+            return None
+        return response
+
+    def report(self, elapsed: float) -> List[dict]:
+        rows = []
+        for route in sorted(self.latencies):
+            ordered = sorted(self.latencies[route])
+            rows.append({
+                "route": route,
+                "requests": len(ordered),
+                "errors": self.errors[route],
+                "rps": len(ordered) / elapsed,
+                "p50_ms": 1000 * percentile(ordered, 0.50),
+                "p95_ms": 1000 * percentile(ordered, 0.95),
+                "p99_ms": 1000 * percentile(ordered, 0.99),
+                "max_ms": 1000 * ordered[-1],
+            })
+        return rows
+
+
+class Scenario:
+    """Operations against the API; state (waste and innovation ids) is shared by all virtual users"""
+
+    def __init__(self, http: httpx.AsyncClient, recorder: Recorder, images: List[bytes], job_poll: float):
+        self.http = http
+        self.recorder = recorder
+        self.images = images
+        self.job_poll = job_poll
+        self.wastes: List[dict] = []
+        self.innovation_ids: List[str] = []
+        self.user_ids = [f"loadtest-{i}" for i in range(8)]
+
+    def request(self, route: str, method: str, url: str, **kwargs):
+        return self.recorder.request(self.http, route, method, url, **kwargs)
+
+    async def root(self, rng: random.Random) -> None:
+        await self.request("GET /api/", "GET", "/api/")
+
+    async def analyze_text(self, rng: random.Random) -> None:
+        name, description = rng.choice(WASTE_ITEMS)
+        response = await self.request("POST /api/analyze-waste [text]", "POST", "/api/analyze-waste",
+                                      json={"waste_name": name, "waste_description": description})
+        if response is not None:
+            self.wastes.append(response.json())
+
+    async def analyze_image(self, rng: random.Random) -> None:
+        image = base64.b64encode(rng.choice(self.images)).decode("ascii")
+        await self.request("POST /api/analyze-waste [image]", "POST", "/api/analyze-waste", json={"image_base64": image})
+
+    async def analyze_upload(self, rng: random.Random) -> None:
+        files = {"file": ("photo.jpg", rng.choice(self.images), "image/jpeg")}
+        await self.request("POST /api/analyze-waste/upload", "POST", "/api/analyze-waste/upload", files=files)
+
+    async def analyze_batch(self, rng: random.Random) -> None:
+        items = [{"waste_name": name, "waste_description": desc} for name, desc in rng.sample(WASTE_ITEMS, 5)]
+        await self.request("POST /api/analyze-waste/batch", "POST", "/api/analyze-waste/batch", json=items)
+
+    def innovation_request(self, rng: random.Random) -> dict:
+        waste = rng.choice(self.wastes)
+        return {
+            "waste_id": waste["waste_id"],
+            "innovation_types": rng.sample(INNOVATION_TYPES, 2),
+            "budget": rng.choice([10, 25, 50]),
+            "skill_level": rng.choice(["Beginner", "Intermediate", "Advanced"]),
+        }
+
+    async def generate_job(self, rng: random.Random) -> None:
+        started = time.perf_counter()
+        response = await self.request("POST /api/generate-innovations", "POST", "/api/generate-innovations",
+                                      json=self.innovation_request(rng))
+        if response is None:
+            return
+        job_id = response.json()["job_id"]
+        while True:
+            await asyncio.sleep(self.job_poll)
+            polled = await self.request("GET /api/jobs/{job_id}", "GET", f"/api/jobs/{job_id}")
+            if polled is None:
+                return
+            job = polled.json()
+            if job["status"] in ("succeeded", "failed"):
+                break
+        # End-to-end time a client waits for its ideas
+        self.recorder.latencies["job generate_innovations (end to end)"].append(time.perf_counter() - started)
+        if job["status"] == "failed":
+            self.recorder.errors["job generate_innovations (end to end)"] += 1
+            return
+        self.innovation_ids.extend(i["id"] for i in job["result"]["innovations"])
+
+    async def generate_stream(self, rng: random.Random) -> None:
+        response = await self.request("POST /api/generate-innovations/stream", "POST",
+                                      "/api/generate-innovations/stream?format=ndjson", json=self.innovation_request(rng))
+        if response is None:
+            return
+        for line in response.text.splitlines():
+            event = json.loads(line)
+            if event["event"] == "innovation":
+                self.innovation_ids.append(event["data"]["id"])
+
+    async def innovation_detail(self, rng: random.Random) -> None:
+        innovation_id = rng.choice(self.innovation_ids)
+        await self.request("GET /api/innovation/{innovation_id}", "GET", f"/api/innovation/{innovation_id}")
+
+    async def save(self, rng: random.Random) -> None:
+        await self.request("POST /api/save-innovation", "POST", "/api/save-innovation",
+                           params={"user_id": rng.choice(self.user_ids), "innovation_id": rng.choice(self.innovation_ids)})
+
+    async def saved_list(self, rng: random.Random) -> None:
+        await self.request("GET /api/saved-innovations", "GET", "/api/saved-innovations",
+                           params={"user_id": rng.choice(self.user_ids), "page_size": 20})
+
+    async def search(self, rng: random.Random) -> None:
+        # Browse with filters (mongomock has no $text), then follow the cursor once
+        params = {"innovation_type": rng.choice(["DIY Tools", "Electronics Projects", "Home Utility Items"]),
+                  "max_cost": rng.choice([25, 50, 100]), "page_size": 10}
+        response = await self.request("GET /api/innovations/search", "GET", "/api/innovations/search", params=params)
+        if response is not None and response.json()["next_cursor"]:
+            await self.request("GET /api/innovations/search [cursor]", "GET", "/api/innovations/search",
+                               params={**params, "cursor": response.json()["next_cursor"]})
+
+    async def stats(self, rng: random.Random) -> None:
+        await self.request("GET /api/stats", "GET", "/api/stats")
+
+    def operations(self):
+        """(weight, operation, needs) — an operation runs only once its prerequisite state exists"""
+        return [
+            (1, self.root, None),
+            (6, self.analyze_text, None),
+            (1, self.analyze_image, None),
+            (1, self.analyze_upload, None),
+            (1, self.analyze_batch, None),
+            (3, self.generate_job, "wastes"),
+            (1, self.generate_stream, "wastes"),
+            (6, self.innovation_detail, "innovation_ids"),
+            (2, self.save, "innovation_ids"),
+            (3, self.saved_list, None),
+            (3, self.search, "innovation_ids"),
+            (0.5, self.stats, None),
+        ]
+
+    async def virtual_user(self, seed: int, deadline: float) -> None:
+        rng = random.Random(seed)
+        operations = self.operations()
+        while time.perf_counter() < deadline:
+            ready = [(w, op) for w, op, needs in operations if needs is None or getattr(self, needs)]
+            _, operation = rng.choices(ready, weights=[w for w, _ in ready])[0]
+            await operation(rng)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(args) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "LLM_BACKEND": "fake",
+        "LLM_FAKE_LATENCY_MS": str(args.llm_latency_ms),
+        "LLM_FAKE_JITTER_MS": str(args.llm_jitter_ms),
+        "MONGO_URL": args.mongo_url,
+        "DB_NAME": args.db_name,
+    }
+    for override in args.server_env:
+        key, _, value = override.partition("=")
+        env[key] = value
+    command = [sys.executable, "-m", "uvicorn", "server:app", "--host", "127.0.0.1", "--port", str(args.port),
+               "--log-level", "warning"]
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+
+
+async def wait_for(url: str, timeout: float = 30) -> None:
+    deadline = time.time() + timeout
+    async with httpx.AsyncClient() as http:
+        while time.time() < deadline:
+            try:
+                await http.get(url, timeout=1)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"server did not start at {url}")
+
+
+async def run(args) -> List[dict]:
+    await wait_for(f"{args.url}/api/")
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as http:
+        recorder = Recorder()
+        scenario = Scenario(http, recorder, make_images(8), args.job_poll)
+        # Seed state so chained operations have something to work with from the start
+        await scenario.analyze_text(random.Random(args.seed))
+        await scenario.generate_job(random.Random(args.seed))
+        recorder = scenario.recorder = Recorder()
+
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(scenario.virtual_user(args.seed + i, deadline) for i in range(args.concurrency)))
+        return recorder.report(time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="drive an already running server instead of starting one")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20, help="seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--job-poll", type=float, default=0.25, help="seconds between job status polls")
+    parser.add_argument("--mongo-url", default="memory://")
+    parser.add_argument("--db-name", default="recircuit_loadtest")
+    parser.add_argument("--llm-latency-ms", type=int, default=800)
+    parser.add_argument("--llm-jitter-ms", type=int, default=200)
+    parser.add_argument("--server-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the spawned server (repeatable)")
+    parser.add_argument("--json", type=Path, help="also write the report here")
+    args = parser.parse_args()
+
+    server = None
+    if not args.url:
+        args.port = free_port()
+        args.url = f"http://127.0.0.1:{args.port}"
+        server = start_server(args)
+    try:
+        rows = asyncio.run(run(args))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    print(f"{args.concurrency} virtual users, {args.duration:g}s, fake LLM {args.llm_latency_ms}±{args.llm_jitter_ms} ms")
+    print(f"{'route':<44} {'reqs':>6} {'err':>5} {'rps':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for row in rows:
+        print(f"{row['route']:<44} {row['requests']:>6} {row['errors']:>5} {row['rps']:>7.1f} {row['p50_ms']:>8.1f} "
+              f"{row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}")
+    if args.json:
+        args.json.write_text(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
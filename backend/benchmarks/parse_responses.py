@@ -0,0 +1,67 @@
+"""Micro-benchmark: legacy fence-split parser vs llm_parsing on recorded responses.
+
+Reports per-response parse time and outcome for both paths. "legacy" is
+the split("```json") + json.loads code that generate_innovations and
+generate_steps used to carry; its failures silently became a default idea.
+
+    python benchmarks/parse_responses.py --repeat 2000
+"""
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from llm_parsing import parse_model_list  # noqa: E402
+from server import Innovation, InnovationRequest, Step, idea_fields, step_fields  # noqa: E402
+
+RECORDS = Path(__file__).parent / "data" / "llm_responses.json"
+
+
+def legacy_parse(response: str):
+    try:
+        response_text = response.strip()
+        if "```json" in response_text:
+            response_text = response_text.split("```json")[1].split("```")[0]
+        elif "```" in response_text:
+            response_text = response_text.split("```")[1].split("```")[0]
+        return json.loads(response_text), "ok"
+    except Exception:
+        return None, "fallback"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--records", type=Path, default=RECORDS)
+    args = parser.parse_args()
+
+    request = InnovationRequest(
+        waste_id="bench", waste_description="old smartphone", innovation_types=["electronics"],
+        budget=25, skill_level="Beginner"
+    )
+    parsers = {
+        "innovations": lambda text: parse_model_list(
+            text, Innovation, "innovations", prepare=lambda idea, _: idea_fields(idea, request), limit=3
+        ),
+        "steps": lambda text: parse_model_list(text, Step, "steps", prepare=step_fields),
+    }
+
+    records = json.loads(args.records.read_text())
+    print(f"{'kind':<12} {'response':<18} {'legacy':>9} {'us':>8} {'new':>9} {'items':>6} {'us':>8}")
+    for record in records:
+        text = record["response"]
+        parse = parsers[record["kind"]]
+        _, legacy_outcome = legacy_parse(text)
+        result = parse(text)
+        legacy_us = 1e6 * timeit.timeit(lambda: legacy_parse(text), number=args.repeat) / args.repeat
+        new_us = 1e6 * timeit.timeit(lambda: parse(text), number=args.repeat) / args.repeat
+        print(f"{record['kind']:<12} {record['label']:<18} {legacy_outcome:>9} {legacy_us:>8.1f} "
+              f"{result.status:>9} {len(result.items):>6} {new_us:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Micro-benchmark: per-request serialization CPU before and after the orjson layer.
+
+Each case replays what one request does to turn stored/generated data into
+response bytes, timed with process_time (CPU only, no I/O). "legacy" is
+the code the routes used to carry: ISO strings converted by hand, models
+rebuilt from Mongo documents, dumped twice and rendered through
+jsonable_encoder + json.dumps. "new" dumps each model once and renders
+documents straight through serialization.dumps.
+
+    python benchmarks/serialize_responses.py --repeat 2000
+"""
+import argparse
+import json
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from serialization import dumps, orjson  # noqa: E402
+from server import Innovation, SavedInnovation, Step  # noqa: E402
+
+
+def sample_innovation(with_steps: bool = True) -> Innovation:
+    steps = [
+        Step(step_number=n, title=f"Step {n}", description="Strip the casing and sort the parts by material. " * 3,
+             duration="20 minutes", tools_required=["screwdriver", "pliers"], safety_note="Wear gloves")
+        for n in range(1, 9)
+    ] if with_steps else []
+    return Innovation(
+        waste_description="old smartphone with a cracked screen", title="Bedside speaker dock",
+        description="Turn the phone into a dedicated music player with a passive amplifier. " * 4,
+        innovation_type="electronics", difficulty="Beginner", estimated_cost=12.5, currency="USD",
+        materials_needed=["old phone", "wood offcut", "felt pads"], tools_required=["saw", "drill", "sandpaper"],
+        time_estimate="2 hours", steps=steps, sustainability_score=82, reusability_score=75,
+        potential_value="$30 as a gift", safety_warnings=["Do not charge a swollen battery"]
+    )
+
+
+def legacy_render(content) -> bytes:
+    """FastAPI's default path for a returned dict/model"""
+    return json.dumps(jsonable_encoder(content), ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def legacy_create(innovations):
+    for innovation in innovations:
+        doc = innovation.model_dump()
+        doc["created_at"] = doc["created_at"].isoformat()
+    return legacy_render({"innovations": [innovation.model_dump(mode="json") for innovation in innovations]})
+
+
+def new_create(innovations):
+    return dumps({"innovations": [innovation.model_dump() for innovation in innovations]})
+
+
+def legacy_detail(stored: dict) -> bytes:
+    doc = dict(stored)
+    if isinstance(doc.get("created_at"), str):
+        doc["created_at"] = datetime.fromisoformat(doc["created_at"])
+    return Innovation(**doc).model_dump_json().encode("utf-8")
+
+
+def new_detail(stored: dict) -> bytes:
+    return dumps(stored)
+
+
+def cpu_us(fn, repeat: int) -> float:
+    started = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return 1e6 * (time.process_time() - started) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--ideas", type=int, default=3, help="innovations per create request")
+    parser.add_argument("--saved", type=int, default=20, help="expanded items per saved-list page")
+    args = parser.parse_args()
+
+    innovations = [sample_innovation(with_steps=False) for _ in range(args.ideas)]
+    detail = sample_innovation().model_dump()
+    legacy_stored = {**detail, "created_at": detail["created_at"].isoformat()}
+    page = []
+    for _ in range(args.saved):
+        item = SavedInnovation(innovation_id=detail["id"]).model_dump()
+        page.append({**item, "innovation": {k: v for k, v in detail.items() if k != "steps"}})
+    legacy_page = [{**item, "saved_at": item["saved_at"].isoformat(),
+                    "innovation": {**item["innovation"], "created_at": legacy_stored["created_at"]}}
+                   for item in page]
+
+    cases = [
+        ("create", lambda: legacy_create(innovations), lambda: new_create(innovations)),
+        ("detail", lambda: legacy_detail(legacy_stored), lambda: new_detail(detail)),
+        ("saved_list", lambda: legacy_render({"saved_innovations": legacy_page, "next_cursor": None}),
+         lambda: dumps({"saved_innovations": page, "next_cursor": None})),
+    ]
+    print(f"encoder: {'orjson' if orjson is not None else 'json (orjson not installed)'}")
+    print(f"{'request':<12} {'legacy us':>10} {'new us':>10} {'speedup':>8} {'bytes':>7}")
+    for name, legacy, new in cases:
+        legacy_us = cpu_us(legacy, args.repeat)
+        new_us = cpu_us(new, args.repeat)
+        print(f"{name:<12} {legacy_us:>10.1f} {new_us:>10.1f} {legacy_us / new_us:>7.1f}x {len(new()):>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Peak RSS per request: base64 JSON upload vs streaming multipart upload.
+
+Each mode gets a fresh server process so VmHWM (peak resident set) is not
+polluted by the other mode. The vision call is replaced by a canned answer,
+so only ingest, preprocessing and the waste_cache write are measured.
+Needs Linux (/proc) and the MongoDB from backend/.env.
+
+    python benchmarks/upload_rss.py --megapixels 12 --requests 5
+"""
+import argparse
+import base64
+import io
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def serve(port: int) -> None:
+    sys.path.insert(0, str(BACKEND_DIR))
+    import uvicorn
+    import server
+
+    async def fake_identify(image_base64: str) -> dict:
+        return {"waste_description": "benchmark", "identified_from": "image"}
+
+    server.identify_waste_from_image = fake_identify
+    uvicorn.run(server.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def make_photo(megapixels: float) -> bytes:
+    from PIL import Image
+
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    image = Image.frombytes("RGB", (width, height), os.urandom(width * height * 3))
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=92)
+    return out.getvalue()
+
+
+def read_status(pid: int) -> dict:
+    values = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("VmRSS", "VmHWM"):
+                values[key] = int(rest.split()[0]) / 1024
+    return values
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url: str, timeout: float = 30) -> None:
+    import httpx
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"server did not start at {url}")
+
+
+def run_mode(mode: str, photo: bytes, requests: int) -> dict:
+    import httpx
+
+    port = free_port()
+    proc = subprocess.Popen([sys.executable, __file__, "--serve", str(port)], cwd=BACKEND_DIR)
+    base_url = f"http://127.0.0.1:{port}/api"
+    try:
+        wait_for(f"{base_url}/")
+        baseline = read_status(proc.pid)["VmRSS"]
+        timings = []
+        with httpx.Client(timeout=120) as http:
+            for _ in range(requests):
+                start = time.perf_counter()
+                if mode == "base64":
+                    body = {"image_base64": base64.b64encode(photo).decode("ascii"), "bypass_cache": True}
+                    response = http.post(f"{base_url}/analyze-waste", json=body)
+                else:
+                    files = {"file": ("photo.jpg", photo, "image/jpeg")}
+                    response = http.post(f"{base_url}/analyze-waste/upload", files=files, data={"bypass_cache": "true"})
+                response.raise_for_status()
+                timings.append(time.perf_counter() - start)
+        status = read_status(proc.pid)
+        return {
+            "mode": mode,
+            "baseline_mb": baseline,
+            "peak_mb": status["VmHWM"],
+            "peak_delta_mb": status["VmHWM"] - baseline,
+            "mean_ms": 1000 * sum(timings) / len(timings),
+        }
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megapixels", type=float, default=12)
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve)
+        return
+
+    photo = make_photo(args.megapixels)
+    print(f"photo: {args.megapixels} MP, {len(photo) / 1024 / 1024:.1f} MiB JPEG, {args.requests} requests per mode")
+    print(f"{'mode':<10} {'baseline MiB':>13} {'peak MiB':>10} {'peak delta':>11} {'mean ms':>9}")
+    for mode in ("base64", "multipart"):
+        r = run_mode(mode, photo, args.requests)
+        print(f"{r['mode']:<10} {r['baseline_mb']:>13.1f} {r['peak_mb']:>10.1f} {r['peak_delta_mb']:>11.1f} {r['mean_ms']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+"""Result caches that sit in front of the LLM analysis calls"""
+import hashlib
+import logging
+import random
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Sequence
+
+from cachetools import TTLCache
+from pymongo import ReturnDocument
+
+import metrics
+from imaging import hamming_distance, hash_bands, hash_to_hex
+
+cache_requests = metrics.counter(
+    "waste_cache_requests_total",
+    "Waste analysis cache lookups by tier and outcome",
+    ("tier", "outcome"),
+)
+cache_bypasses = metrics.counter(
+    "waste_cache_bypass_total",
+    "Waste analyses that skipped the cache on request",
+)
+cache_invalidations = metrics.counter(
+    "waste_cache_invalidations_total",
+    "Waste analysis cache entries invalidated",
+)
+waste_lookups = metrics.counter(
+    "waste_lookup_requests_total",
+    "waste_id resolutions by tier and outcome",
+    ("tier", "outcome"),
+)
+idea_cache_requests = metrics.counter(
+    "idea_cache_requests_total",
+    "Idea cache lookups by tier and outcome",
+    ("tier", "outcome"),
+)
+image_cache_requests = metrics.counter(
+    "image_cache_requests_total",
+    "Perceptual-hash image cache lookups by tier and outcome",
+    ("tier", "outcome"),
+)
+
+
+def _entry_from_doc(doc: dict) -> dict:
+    return {
+        "waste_id": doc["id"],
+        "waste_description": doc["description"],
+        "analysis": doc.get("analysis"),
+        "identified_from": doc["identified_from"],
+    }
+
+
+def _entry_from_result(waste_id: str, result: dict) -> dict:
+    return {
+        "waste_id": waste_id,
+        "waste_description": result["waste_description"],
+        "analysis": result.get("analysis"),
+        "identified_from": result["identified_from"],
+    }
+
+
+def normalize_text(value: Optional[str]) -> str:
+    """Lowercase and collapse whitespace so trivial edits share a key"""
+    return " ".join((value or "").lower().split())
+
+
+def waste_text_key(waste_name: str, waste_description: str = "") -> str:
+    """Content hash for a text waste analysis request"""
+    payload = f"{normalize_text(waste_name)}\x1f{normalize_text(waste_description)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class WasteLookup:
+    """Resolve a waste_id to its stored analysis: in-process TTL cache over an indexed find_one.
+
+    Analyses are immutable once written, so entries only leave memory by
+    size or age.
+    """
+
+    def __init__(self, collection, maxsize: int = 4096, ttl: float = 3600):
+        self.collection = collection
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, waste_id: str) -> Optional[dict]:
+        entry = self.memory.get(waste_id)
+        if entry is not None:
+            waste_lookups.inc(tier="memory", outcome="hit")
+            return entry
+
+        doc = await self.collection.find_one(
+            {"id": waste_id}, {"_id": 0, "id": 1, "description": 1, "analysis": 1, "identified_from": 1}
+        )
+        if not doc:
+            waste_lookups.inc(tier="mongo", outcome="miss")
+            return None
+
+        waste_lookups.inc(tier="mongo", outcome="hit")
+        entry = self.memory[waste_id] = _entry_from_doc(doc)
+        return entry
+
+    def remember(self, waste_id: str, result: dict) -> None:
+        self.memory[waste_id] = _entry_from_result(waste_id, result)
+
+    def stats(self) -> dict:
+        memory_hits = waste_lookups.value(tier="memory", outcome="hit")
+        mongo_hits = waste_lookups.value(tier="mongo", outcome="hit")
+        misses = waste_lookups.value(tier="mongo", outcome="miss")
+        return {
+            "memory_entries": len(self.memory),
+            "memory_hits": memory_hits,
+            "mongo_hits": mongo_hits,
+            "misses": misses,
+        }
+
+
+class WasteAnalysisCache:
+    """Two-tier cache: in-process LRU with TTL backed by the waste_cache collection.
+
+    Mongo entries are the regular waste_cache documents tagged with a
+    ``content_hash`` field, so a hit reuses the original ``waste_id``.
+    """
+
+    def __init__(self, collection, maxsize: int = 1024, ttl: float = 3600, mongo_ttl: float = 7 * 24 * 3600):
+        self.collection = collection
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.mongo_ttl = mongo_ttl
+
+    async def get(self, key: str) -> Optional[dict]:
+        """Return the cached analysis for key, checking memory then Mongo"""
+        entry = self.memory.get(key)
+        if entry is not None:
+            cache_requests.inc(tier="memory", outcome="hit")
+            return entry
+        cache_requests.inc(tier="memory", outcome="miss")
+
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.mongo_ttl)
+        try:
+            doc = await self.collection.find_one(
+                {"content_hash": key, "created_at": {"$gte": cutoff}},
+                {"_id": 0},
+                sort=[("created_at", -1)],
+            )
+        except Exception as e:
+            logging.error(f"Error reading waste cache: {str(e)}")
+            doc = None
+
+        if not doc:
+            cache_requests.inc(tier="mongo", outcome="miss")
+            return None
+
+        cache_requests.inc(tier="mongo", outcome="hit")
+        entry = _entry_from_doc(doc)
+        self.memory[key] = entry
+        return entry
+
+    def remember(self, key: str, waste_id: str, result: dict) -> None:
+        """Populate the memory tier after a fresh analysis was stored"""
+        self.memory[key] = _entry_from_result(waste_id, result)
+
+    def bypass(self) -> None:
+        """Record a lookup skipped because the caller forced a fresh analysis"""
+        cache_bypasses.inc()
+
+    async def invalidate(self, key: str) -> List[str]:
+        """Drop key from both tiers and return the waste_ids it pointed at.
+
+        The waste_cache documents are kept but lose ``content_hash`` and
+        ``source_text``, so neither this cache nor the similarity index
+        serves them again. Memory entries that other keys picked up from a
+        near-duplicate hit on those analyses are dropped as well.
+        """
+        entry = self.memory.pop(key, None)
+        waste_ids = {doc["id"] async for doc in self.collection.find({"content_hash": key}, {"_id": 0, "id": 1})}
+        if entry is not None:
+            waste_ids.add(entry["waste_id"])
+        for other, cached in list(self.memory.items()):
+            if cached["waste_id"] in waste_ids:
+                self.memory.pop(other, None)
+        if waste_ids:
+            await self.collection.update_many(
+                {"id": {"$in": list(waste_ids)}},
+                {"$unset": {"content_hash": "", "source_text": ""}},
+            )
+        cache_invalidations.inc()
+        return sorted(waste_ids)
+
+    def stats(self) -> dict:
+        memory_hits = cache_requests.value(tier="memory", outcome="hit")
+        mongo_hits = cache_requests.value(tier="mongo", outcome="hit")
+        misses = cache_requests.value(tier="mongo", outcome="miss")
+        lookups = memory_hits + mongo_hits + misses
+        return {
+            "memory_entries": len(self.memory),
+            "memory_hits": memory_hits,
+            "mongo_hits": mongo_hits,
+            "misses": misses,
+            "hit_ratio": (memory_hits + mongo_hits) / lookups if lookups else 0.0,
+            "bypasses": cache_bypasses.value(),
+            "invalidations": cache_invalidations.value(),
+        }
+
+
+class ImageAnalysisCache:
+    """Near-duplicate lookup for image analyses keyed by a 64-bit perceptual hash.
+
+    Exact hashes are served from memory. Otherwise candidates sharing at least
+    one hash band are pulled from waste_cache and compared by Hamming distance.
+    """
+
+    def __init__(self, collection, max_distance: int = 4, maxsize: int = 1024, ttl: float = 3600,
+                 mongo_ttl: float = 7 * 24 * 3600, candidate_limit: int = 200):
+        self.collection = collection
+        self.max_distance = max_distance
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.mongo_ttl = mongo_ttl
+        self.candidate_limit = candidate_limit
+
+    @staticmethod
+    def document_fields(image_hash: int) -> dict:
+        """Fields stored next to a waste_cache entry so later uploads can match it"""
+        return {"image_hash": hash_to_hex(image_hash), "image_hash_bands": hash_bands(image_hash)}
+
+    async def find(self, image_hash: int) -> Optional[dict]:
+        """Return the closest earlier analysis within max_distance, if any"""
+        entry = self.memory.get(image_hash)
+        if entry is not None:
+            image_cache_requests.inc(tier="memory", outcome="hit")
+            return entry
+        image_cache_requests.inc(tier="memory", outcome="miss")
+
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=self.mongo_ttl)
+        try:
+            candidates = await self.collection.find(
+                {"image_hash_bands": {"$in": hash_bands(image_hash)}, "created_at": {"$gte": cutoff}},
+                {"_id": 0, "id": 1, "description": 1, "analysis": 1, "identified_from": 1, "image_hash": 1},
+            ).sort("created_at", -1).to_list(self.candidate_limit)
+        except Exception as e:
+            logging.error(f"Error reading image cache: {str(e)}")
+            candidates = []
+
+        best, best_distance = None, self.max_distance + 1
+        for doc in candidates:
+            distance = hamming_distance(image_hash, int(doc["image_hash"], 16))
+            if distance < best_distance:
+                best, best_distance = doc, distance
+                if distance == 0:
+                    break
+
+        if best is None:
+            image_cache_requests.inc(tier="mongo", outcome="miss")
+            return None
+
+        image_cache_requests.inc(tier="mongo", outcome="hit")
+        entry = _entry_from_doc(best)
+        self.memory[image_hash] = entry
+        return entry
+
+    def remember(self, image_hash: int, waste_id: str, result: dict) -> None:
+        self.memory[image_hash] = _entry_from_result(waste_id, result)
+
+    def stats(self) -> dict:
+        memory_hits = image_cache_requests.value(tier="memory", outcome="hit")
+        mongo_hits = image_cache_requests.value(tier="mongo", outcome="hit")
+        misses = image_cache_requests.value(tier="mongo", outcome="miss")
+        lookups = memory_hits + mongo_hits + misses
+        return {
+            "memory_entries": len(self.memory),
+            "memory_hits": memory_hits,
+            "mongo_hits": mongo_hits,
+            "misses": misses,
+            "hit_ratio": (memory_hits + mongo_hits) / lookups if lookups else 0.0,
+            "max_distance": self.max_distance,
+        }
+
+
+def budget_band(budget: float, bands: Sequence[float]) -> str:
+    """Label for the band budget falls in, e.g. "25-50" for bands (10, 25, 50)"""
+    index = bisect_right(bands, budget)
+    low = bands[index - 1] if index else 0
+    if index == len(bands):
+        return f"{low:g}+"
+    return f"{low:g}-{bands[index]:g}"
+
+
+def idea_cache_key(waste_description: str, innovation_types: Iterable[str], skill_level: str, currency: str,
+                   budget: float, bands: Sequence[float]) -> str:
+    """Fingerprint of everything that shapes an idea set, with the budget bucketed"""
+    payload = "\x1f".join((
+        normalize_text(waste_description),
+        ",".join(sorted({normalize_text(t) for t in innovation_types})),
+        normalize_text(skill_level),
+        (currency or "").upper(),
+        budget_band(budget, bands),
+    ))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class IdeaCache:
+    """Pool of generated ideas per idea_cache_key, in memory and in the idea_cache collection.
+
+    Entries hold raw idea fields (no id, waste or currency), so callers
+    re-stamp them into new Innovations on every hit. Each key keeps up to
+    ``pool_size`` ideas; fresh ideas are pushed in and the oldest drop
+    out, and the whole pool expires ``ttl`` seconds after it was created.
+    """
+
+    def __init__(self, collection, bands: Sequence[float], pool_size: int = 9, ttl: float = 24 * 3600,
+                 maxsize: int = 1024, memory_ttl: float = 600):
+        self.collection = collection
+        self.bands = sorted(bands)
+        self.pool_size = pool_size
+        self.ttl = ttl
+        self.memory = TTLCache(maxsize=maxsize, ttl=min(memory_ttl, ttl))
+
+    def key(self, waste_description: str, innovation_types: Iterable[str], skill_level: str, currency: str,
+            budget: float) -> str:
+        return idea_cache_key(waste_description, innovation_types, skill_level, currency, budget, self.bands)
+
+    async def pool(self, key: str) -> List[dict]:
+        """All live ideas for key, checking memory then Mongo"""
+        ideas = self.memory.get(key)
+        if ideas is not None:
+            idea_cache_requests.inc(tier="memory", outcome="hit")
+            return ideas
+        idea_cache_requests.inc(tier="memory", outcome="miss")
+
+        try:
+            doc = await self.collection.find_one(
+                {"key": key, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+                {"_id": 0, "ideas": 1},
+            )
+        except Exception as e:
+            logging.error(f"Error reading idea cache: {str(e)}")
+            doc = None
+
+        if not doc or not doc.get("ideas"):
+            idea_cache_requests.inc(tier="mongo", outcome="miss")
+            return []
+
+        idea_cache_requests.inc(tier="mongo", outcome="hit")
+        ideas = self.memory[key] = doc["ideas"]
+        return ideas
+
+    async def sample(self, key: str, count: int, max_cost: Optional[float] = None) -> List[dict]:
+        """Up to count distinct ideas from the pool, optionally capped by estimated_cost"""
+        ideas = await self.pool(key)
+        if max_cost is not None:
+            ideas = [idea for idea in ideas if (idea.get("estimated_cost") or 0) <= max_cost]
+        return random.sample(ideas, min(count, len(ideas)))
+
+    async def add(self, key: str, ideas: List[dict]) -> None:
+        """Push freshly generated ideas into the pool for key"""
+        if not ideas:
+            return
+        now = datetime.now(timezone.utc)
+        try:
+            # An expired pool may outlive its TTL until Mongo's monitor removes it; start over
+            await self.collection.delete_one({"key": key, "expires_at": {"$lte": now}})
+            doc = await self.collection.find_one_and_update(
+                {"key": key},
+                {
+                    "$push": {"ideas": {"$each": ideas, "$slice": -self.pool_size}},
+                    "$setOnInsert": {"created_at": now, "expires_at": now + timedelta(seconds=self.ttl)},
+                },
+                projection={"_id": 0, "ideas": 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+        except Exception as e:
+            logging.error(f"Error writing idea cache: {str(e)}")
+            doc = None
+        if doc:
+            self.memory[key] = doc["ideas"]
+        else:
+            self.memory[key] = (self.memory.get(key, []) + ideas)[-self.pool_size:]
+
+    def stats(self) -> dict:
+        memory_hits = idea_cache_requests.value(tier="memory", outcome="hit")
+        mongo_hits = idea_cache_requests.value(tier="mongo", outcome="hit")
+        misses = idea_cache_requests.value(tier="mongo", outcome="miss")
+        lookups = memory_hits + mongo_hits + misses
+        return {
+            "memory_entries": len(self.memory),
+            "memory_hits": memory_hits,
+            "mongo_hits": mongo_hits,
+            "misses": misses,
+            "hit_ratio": (memory_hits + mongo_hits) / lookups if lookups else 0.0,
+        }
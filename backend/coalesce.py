@@ -0,0 +1,168 @@
+"""Single-flight coalescing for keyed LLM work, in-process and across workers"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Optional
+
+from pymongo.errors import DuplicateKeyError
+
+import metrics
+
+coalesced_calls = metrics.counter(
+    "llm_coalesced_total",
+    "Callers that joined existing work instead of starting their own",
+    ("kind", "scope"),
+)
+
+Producer = Callable[[], Awaitable]
+Fetcher = Callable[[], Awaitable]
+
+
+def _kind(key: str) -> str:
+    return key.split(":", 1)[0]
+
+
+class Coalescer:
+    """Run at most one producer per key.
+
+    Within a process, concurrent callers share one task. Across uvicorn
+    workers, the task first claims a lease document in ``lease_collection``
+    (an upsert that only succeeds when no live lease exists) and renews it
+    every ``lease_ttl / 3`` seconds while it runs, however long the
+    producer queues for rate limits or semaphores. The winner
+    publishes its result on the lease document for ``result_ttl`` seconds,
+    so losers never depend on the result's own (possibly buffered) write.
+    Losers poll the lease and ``fetch_existing`` and take over if the
+    lease expires without a result. Empty results (a failed generation)
+    are not published, so the next caller tries again.
+    """
+
+    def __init__(self, lease_collection=None, lease_ttl: float = 120, poll_interval: float = 0.25,
+                 result_ttl: float = 5):
+        self.lease_collection = lease_collection
+        self.lease_ttl = lease_ttl
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._tasks
+
+    def start(self, key: str, produce: Producer, fetch_existing: Optional[Fetcher] = None) -> asyncio.Task:
+        """Return the task for key, starting it if nothing is in flight"""
+        task = self._tasks.get(key)
+        if task is not None:
+            coalesced_calls.inc(kind=_kind(key), scope="process")
+            return task
+        task = asyncio.create_task(self._claim_and_run(key, produce, fetch_existing))
+        self._tasks[key] = task
+        task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        return task
+
+    async def run(self, key: str, produce: Producer, fetch_existing: Optional[Fetcher] = None):
+        """Await the shared result; a cancelled caller does not cancel the shared work"""
+        return await asyncio.shield(self.start(key, produce, fetch_existing))
+
+    def cancel_all(self) -> None:
+        for task in list(self._tasks.values()):
+            task.cancel()
+
+    async def _claim_and_run(self, key: str, produce: Producer, fetch_existing: Optional[Fetcher]):
+        if self.lease_collection is None or fetch_existing is None:
+            return await produce()
+
+        joined = False
+        deadline = asyncio.get_running_loop().time() + 2 * self.lease_ttl
+        while True:
+            if await self._acquire(key):
+                heartbeat = asyncio.create_task(self._heartbeat(key))
+                try:
+                    result = await produce()
+                except BaseException:
+                    heartbeat.cancel()
+                    await self._release(key)
+                    raise
+                heartbeat.cancel()
+                if result:
+                    await self._publish(key, result)
+                else:
+                    await self._release(key)
+                return result
+
+            if not joined:
+                coalesced_calls.inc(kind=_kind(key), scope="cluster")
+                joined = True
+            await asyncio.sleep(self.poll_interval)
+            existing = await self._published(key)
+            if existing is None:
+                existing = await fetch_existing()
+            if existing is not None:
+                return existing
+            if asyncio.get_running_loop().time() > deadline:
+                logging.error(f"Lease wait for {key} timed out, producing locally")
+                return await produce()
+
+    async def _acquire(self, key: str) -> bool:
+        now = datetime.now(timezone.utc)
+        try:
+            await self.lease_collection.update_one(
+                {"_id": key, "expires_at": {"$lt": now}},
+                {"$set": {"owner": self.owner, "expires_at": now + timedelta(seconds=self.lease_ttl)},
+                 "$unset": {"result": ""}},
+                upsert=True,
+            )
+            return True
+        except DuplicateKeyError:
+            return False
+        except Exception as e:
+            # Never let lease bookkeeping block the actual work
+            logging.error(f"Error acquiring lease {key}: {str(e)}")
+            return True
+
+    async def _heartbeat(self, key: str) -> None:
+        """Keep a held lease alive so waiters do not take over work that is still running"""
+        while True:
+            await asyncio.sleep(self.lease_ttl / 3)
+            try:
+                await self.lease_collection.update_one(
+                    {"_id": key, "owner": self.owner, "result": {"$exists": False}},
+                    {"$set": {"expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.lease_ttl)}}
+                )
+            except Exception as e:
+                logging.error(f"Error renewing lease {key}: {str(e)}")
+
+    async def _publish(self, key: str, result) -> None:
+        """Hand the result to lease losers; the lease stays live until it expires"""
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.result_ttl)
+        try:
+            await self.lease_collection.update_one(
+                {"_id": key, "owner": self.owner},
+                {"$set": {"result": result, "expires_at": expires_at}}
+            )
+        except Exception as e:
+            logging.error(f"Error publishing lease result {key}: {str(e)}")
+            await self._release(key)
+
+    async def _published(self, key: str):
+        try:
+            doc = await self.lease_collection.find_one(
+                {"_id": key, "result": {"$exists": True}, "expires_at": {"$gt": datetime.now(timezone.utc)}},
+                {"result": 1}
+            )
+        except Exception as e:
+            logging.error(f"Error reading lease result {key}: {str(e)}")
+            return None
+        return doc["result"] if doc else None
+
+    async def _release(self, key: str) -> None:
+        try:
+            await self.lease_collection.delete_one({"_id": key, "owner": self.owner})
+        except Exception as e:
+            logging.error(f"Error releasing lease {key}: {str(e)}")
@@ -0,0 +1,159 @@
+"""MongoDB index set and query-plan diagnostics.
+
+Indexes are ensured at startup (create_indexes is idempotent). The same
+module doubles as a CLI for staging checks:
+
+    python db_indexes.py ensure
+    python db_indexes.py explain
+"""
+import asyncio
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+from imaging import hash_bands
+
+INDEXES = {
+    "innovations": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # /innovations/search: relevance-ranked text queries and newest-first browsing
+        IndexModel([("title", TEXT), ("description", TEXT), ("materials_needed", TEXT)], name="search_text",
+                   weights={"title": 10, "materials_needed": 5, "description": 1}, default_language="english"),
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("innovation_type", ASCENDING), ("created_at", DESCENDING)], name="innovation_type_created_at"),
+    ],
+    "saved_innovations": [
+        IndexModel([("user_id", ASCENDING), ("saved_at", DESCENDING), ("id", DESCENDING)], name="user_saved_at_id"),
+        IndexModel([("user_id", ASCENDING), ("innovation_id", ASCENDING)], name="user_innovation_unique", unique=True),
+    ],
+    "waste_cache": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("content_hash", ASCENDING), ("created_at", DESCENDING)], name="content_hash_created_at",
+                   partialFilterExpression={"content_hash": {"$exists": True}}),
+        IndexModel([("image_hash_bands", ASCENDING), ("created_at", DESCENDING)], name="image_hash_bands_created_at",
+                   partialFilterExpression={"image_hash_bands": {"$exists": True}}),
+        IndexModel([("created_at", ASCENDING)], name="source_text_created_at",
+                   partialFilterExpression={"source_text": {"$exists": True}}),
+    ],
+    "idea_cache": [
+        IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "llm_leases": [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "jobs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("available_at", ASCENDING)], name="status_available_at"),
+        IndexModel([("status", ASCENDING), ("lease_expires_at", ASCENDING)], name="status_lease_expires_at"),
+        # Finished jobs are kept for a week so clients can still fetch results
+        IndexModel([("finished_at", ASCENDING)], name="finished_at_ttl", expireAfterSeconds=7 * 24 * 3600),
+    ],
+}
+
+
+async def ensure_indexes(db) -> dict:
+    """Create any missing indexes; a failing collection is logged and skipped"""
+    created = {}
+    for collection, models in INDEXES.items():
+        try:
+            created[collection] = await db[collection].create_indexes(models)
+        except Exception as e:
+            logging.error(f"Error creating indexes on {collection}: {str(e)}")
+            created[collection] = []
+    return created
+
+
+def route_queries():
+    """(name, collection, filter, sort) for the queries each route issues"""
+    now = datetime.now(timezone.utc)
+    return [
+        ("get_innovation_detail", "innovations", {"id": "explain-probe"}, None),
+        ("load_stored_steps", "innovations", {"id": "explain-probe", "steps.0": {"$exists": True}}, None),
+        ("get_saved_innovations", "saved_innovations", {"user_id": "default_user"},
+         [("saved_at", DESCENDING), ("id", DESCENDING)]),
+        ("save_innovation", "saved_innovations", {"user_id": "default_user", "innovation_id": "explain-probe"}, None),
+        ("saved_innovations_join", "innovations", {"id": {"$in": ["explain-probe"]}}, None),
+        ("waste_cache_text", "waste_cache", {"content_hash": "explain-probe", "created_at": {"$gte": now}},
+         [("created_at", DESCENDING)]),
+        ("waste_cache_image", "waste_cache", {"image_hash_bands": {"$in": hash_bands(0)}, "created_at": {"$gte": now}},
+         [("created_at", DESCENDING)]),
+        ("search_innovations_browse", "innovations", {"innovation_type": {"$in": ["DIY Tools"]}},
+         [("created_at", DESCENDING), ("id", DESCENDING)]),
+        ("search_innovations_text", "innovations", {"$text": {"$search": "explain probe"}}, None),
+        ("resolve_waste_id", "waste_cache", {"id": "explain-probe"}, None),
+        ("similarity_refresh", "waste_cache", {"source_text": {"$exists": True}, "created_at": {"$gt": now}},
+         [("created_at", ASCENDING)]),
+        ("idea_cache_pool", "idea_cache", {"key": "explain-probe", "expires_at": {"$gt": now}}, None),
+        ("get_job", "jobs", {"id": "explain-probe"}, None),
+        ("claim_job", "jobs", {"kind": {"$in": ["generate_innovations"]}, "$or": [
+            {"status": "queued", "available_at": {"$lte": now}},
+            {"status": "running", "lease_expires_at": {"$lt": now}},
+        ]}, [("available_at", ASCENDING)]),
+    ]
+
+
+def _index_names(plan: dict) -> list:
+    names = []
+    if plan.get("stage") == "COLLSCAN":
+        names.append("COLLSCAN")
+    if plan.get("indexName"):
+        names.append(plan["indexName"])
+    for child_key in ("inputStage", "queryPlan"):
+        if isinstance(plan.get(child_key), dict):
+            names.extend(_index_names(plan[child_key]))
+    for child in plan.get("inputStages", []):
+        names.extend(_index_names(child))
+    return names
+
+
+async def explain_queries(db) -> list:
+    """Run explain() for every route query and summarize the winning plan"""
+    report = []
+    for name, collection, query, sort in route_queries():
+        cursor = db[collection].find(query, {"_id": 0})
+        if sort:
+            cursor = cursor.sort(sort)
+        try:
+            plan = await cursor.explain()
+        except Exception as e:
+            report.append({"query": name, "collection": collection, "error": str(e)})
+            continue
+        stats = plan.get("executionStats", {})
+        indexes = _index_names(plan.get("queryPlanner", {}).get("winningPlan", {}))
+        report.append({
+            "query": name,
+            "collection": collection,
+            "indexes": indexes,
+            "uses_index": bool(indexes) and "COLLSCAN" not in indexes,
+            "docs_examined": stats.get("totalDocsExamined"),
+            "keys_examined": stats.get("totalKeysExamined"),
+            "returned": stats.get("nReturned"),
+        })
+    return report
+
+
+async def _main(command: str) -> None:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv(Path(__file__).parent / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        if command in ("ensure", "all"):
+            print(json.dumps(await ensure_indexes(db), indent=2))
+        if command in ("explain", "all"):
+            print(json.dumps(await explain_queries(db), indent=2))
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    import sys
+
+    asyncio.run(_main(sys.argv[1] if len(sys.argv) > 1 else "all"))
@@ -0,0 +1,59 @@
+"""Deterministic stand-in for the upstream LLM, for local load tests and benchmarks"""
+import asyncio
+import json
+import random
+import zlib
+from pathlib import Path
+from typing import AsyncIterator, Dict, List, Optional
+
+from emergentintegrations.llm.chat import UserMessage
+
+from llm_client import LLMProvider
+
+DEFAULT_RECORDS = Path(__file__).parent / "benchmarks" / "data" / "fake_llm_responses.json"
+
+
+class FakeLLMProvider(LLMProvider):
+    """Replays recorded responses with a configurable latency.
+
+    The response for a stage is chosen by a checksum of the prompt, so the
+    same request always gets the same answer. Latency is ``latency`` plus
+    uniform ``jitter`` from a seeded generator. Streaming splits the
+    response into ``chunk_size`` pieces: the first arrives after a quarter
+    of the latency and the rest are spread over the remainder.
+    """
+    name = "fake"
+
+    def __init__(self, records: Dict[str, List[str]], latency: float = 0.8, jitter: float = 0.2,
+                 seed: int = 0, chunk_size: int = 64):
+        self.records = records
+        self.latency = latency
+        self.jitter = jitter
+        self.chunk_size = chunk_size
+        self._random = random.Random(seed)
+
+    @classmethod
+    def from_file(cls, path: Optional[str] = None, **kwargs) -> "FakeLLMProvider":
+        return cls(json.loads(Path(path or DEFAULT_RECORDS).read_text()), **kwargs)
+
+    def response_for(self, system_message: str, message: UserMessage, stage: str) -> str:
+        responses = self.records.get(stage) or next(iter(self.records.values()))
+        checksum = zlib.crc32(f"{system_message}\x1f{message.text}".encode("utf-8"))
+        return responses[checksum % len(responses)]
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+
+    async def complete(self, system_message: str, message: UserMessage, model: str, stage: str) -> str:
+        await asyncio.sleep(self._delay())
+        return self.response_for(system_message, message, stage)
+
+    async def stream(self, system_message: str, message: UserMessage, model: str, stage: str) -> AsyncIterator[str]:
+        response = self.response_for(system_message, message, stage)
+        chunks = [response[i:i + self.chunk_size] for i in range(0, len(response), self.chunk_size)] or [""]
+        delay = self._delay()
+        await asyncio.sleep(delay / 4)
+        for index, chunk in enumerate(chunks):
+            if index:
+                await asyncio.sleep(delay * 3 / 4 / (len(chunks) - 1))
+            yield chunk
@@ -0,0 +1,168 @@
+"""Conditional GETs and compression for JSON documents that stop changing"""
+import gzip
+import hashlib
+from typing import Dict, Mapping, Optional
+
+from cachetools import LRUCache
+from starlette.responses import Response
+
+import metrics
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only without it
+    brotli = None
+
+http_cache_requests = metrics.counter(
+    "http_cache_requests_total",
+    "Immutable-document responses by outcome (not_modified, memory, stored, uncached)",
+    ("outcome",),
+)
+http_compressed_bytes = metrics.counter(
+    "http_compressed_bytes_total",
+    "Response bytes before and after compression by encoding",
+    ("encoding", "stage"),
+)
+
+
+def strong_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def coded_etag(etag: str, encoding: Optional[str]) -> str:
+    """Strong validators must differ per content-coding: "abc" becomes "abc-gzip" """
+    return f'{etag[:-1]}-{encoding}"' if encoding else etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison, so W/ prefixes are ignored"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def pick_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Best supported content coding the client accepts (br over gzip)"""
+    accepted = {}
+    for part in (accept_encoding or "").lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip()] = q
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", accepted.get("*", 0)) > 0:
+        return "gzip"
+    return None
+
+
+class CachedBody:
+    """Serialized document plus its ETag; compressed variants are built once on demand"""
+    __slots__ = ("body", "etag", "_encoded")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = strong_etag(body)
+        self._encoded: Dict[str, bytes] = {}
+
+    def encoded(self, encoding: str, gzip_level: int, brotli_quality: int) -> bytes:
+        data = self._encoded.get(encoding)
+        if data is None:
+            if encoding == "br":
+                data = brotli.compress(self.body, quality=brotli_quality)
+            else:
+                data = gzip.compress(self.body, compresslevel=gzip_level, mtime=0)
+            self._encoded[encoding] = data
+            http_compressed_bytes.inc(len(self.body), encoding=encoding, stage="in")
+            http_compressed_bytes.inc(len(data), encoding=encoding, stage="out")
+        return data
+
+
+class ImmutableResponses:
+    """Serves documents that no longer change with strong ETags and long-lived caching.
+
+    ``versions`` maps a key to its current ETag (and whether the body is
+    big enough to compress), so If-None-Match is answered with 304 before
+    any database read; it is far larger than ``bodies``, the LRU of
+    serialized (and lazily compressed) documents. ETags are content hashes,
+    so every process agrees on them; each content-coding gets its own
+    suffixed tag.
+    """
+
+    def __init__(self, max_versions: int = 100000, max_bodies: int = 1024, min_compress_size: int = 1024,
+                 max_age: int = 86400, gzip_level: int = 6, brotli_quality: int = 5):
+        self.versions = LRUCache(maxsize=max_versions)
+        self.bodies = LRUCache(maxsize=max_bodies)
+        self.min_compress_size = min_compress_size
+        self.cache_control = f"public, max-age={max_age}, immutable"
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def not_modified(self, key: str, headers: Mapping[str, str]) -> Optional[Response]:
+        version = self.versions.get(key)
+        if version is None:
+            return None
+        return self._not_modified(*version, headers)
+
+    def _encoding(self, headers: Mapping[str, str], compressible: bool) -> Optional[str]:
+        return pick_encoding(headers.get("accept-encoding")) if compressible else None
+
+    def _not_modified(self, etag: str, compressible: bool, headers: Mapping[str, str]) -> Optional[Response]:
+        etag = coded_etag(etag, self._encoding(headers, compressible))
+        if not etag_matches(headers.get("if-none-match"), etag):
+            return None
+        http_cache_requests.inc(outcome="not_modified")
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": self.cache_control,
+                                                  "Vary": "Accept-Encoding"})
+
+    def cached(self, key: str, headers: Mapping[str, str]) -> Optional[Response]:
+        """304 or the stored body, whichever the request calls for, without touching the database"""
+        response = self.not_modified(key, headers)
+        if response is not None:
+            return response
+        entry = self.bodies.get(key)
+        if entry is None:
+            return None
+        http_cache_requests.inc(outcome="memory")
+        return self._respond(entry, headers, self.cache_control, etag=True)
+
+    def store(self, key: str, body: bytes, headers: Mapping[str, str]) -> Response:
+        """Remember a document that will not change again and respond with it"""
+        entry = CachedBody(body)
+        version = self.versions[key] = (entry.etag, len(body) >= self.min_compress_size)
+        self.bodies[key] = entry
+        response = self._not_modified(*version, headers)
+        if response is not None:
+            return response
+        http_cache_requests.inc(outcome="stored")
+        return self._respond(entry, headers, self.cache_control, etag=True)
+
+    def uncached(self, body: bytes, headers: Mapping[str, str]) -> Response:
+        """A document that may still change: compressed, but not cacheable"""
+        http_cache_requests.inc(outcome="uncached")
+        return self._respond(CachedBody(body), headers, "no-cache", etag=False)
+
+    def _respond(self, entry: CachedBody, headers: Mapping[str, str], cache_control: str, etag: bool) -> Response:
+        response_headers = {"Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        content = entry.body
+        encoding = self._encoding(headers, len(content) >= self.min_compress_size)
+        if etag:
+            response_headers["ETag"] = coded_etag(entry.etag, encoding)
+        if encoding:
+            content = entry.encoded(encoding, self.gzip_level, self.brotli_quality)
+            response_headers["Content-Encoding"] = encoding
+        return Response(content, media_type="application/json", headers=response_headers)
+
+    def stats(self) -> dict:
+        return {
+            "versions": len(self.versions),
+            "bodies": len(self.bodies),
+            **{outcome: http_cache_requests.value(outcome=outcome)
+               for outcome in ("not_modified", "memory", "stored", "uncached")},
+        }
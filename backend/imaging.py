@@ -0,0 +1,131 @@
+"""Image helpers used before handing uploads to the vision model"""
+import base64
+import binascii
+import io
+from dataclasses import dataclass
+from typing import List, Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+HASH_SIZE = 8
+# 64-bit hashes split into 8-bit bands; two hashes within Hamming distance 7
+# always share at least one band, so band equality is a safe Mongo pre-filter
+HASH_BANDS = 8
+
+
+class InvalidImageError(ValueError):
+    """Raised when an upload cannot be decoded as an image"""
+
+
+@dataclass
+class PreparedImage:
+    """Normalized upload ready for the vision model"""
+    image_base64: str
+    image_hash: int
+    # Both sizes are base64 lengths, so uploads and JSON payloads compare directly
+    bytes_in: int
+    bytes_out: int
+
+
+def base64_length(raw_bytes: int) -> int:
+    """Size of raw_bytes once base64 encoded (with padding)"""
+    return 4 * ((raw_bytes + 2) // 3)
+
+
+def decode_image(image_base64: str, max_edge: Optional[int] = None) -> Image.Image:
+    """Decode a base64 payload (optionally a data URL) into an upright PIL image"""
+    if image_base64.startswith("data:") and "," in image_base64:
+        image_base64 = image_base64.split(",", 1)[1]
+    try:
+        raw = base64.b64decode(image_base64, validate=False)
+    except binascii.Error as e:
+        raise InvalidImageError(str(e)) from e
+    return decode_image_bytes(raw, max_edge)
+
+
+def decode_image_bytes(raw, max_edge: Optional[int] = None) -> Image.Image:
+    """Decode raw bytes or a binary file object into an upright PIL image.
+
+    With max_edge, JPEGs are decoded at the smallest DCT scale that still
+    covers it, which avoids materializing full-resolution pixel buffers.
+    """
+    source = io.BytesIO(raw) if isinstance(raw, (bytes, bytearray)) else raw
+    try:
+        image = Image.open(source)
+        if max_edge:
+            image.draft("RGB", (max_edge, max_edge))
+        image.load()
+    except (UnidentifiedImageError, OSError) as e:
+        raise InvalidImageError(str(e)) from e
+    return ImageOps.exif_transpose(image)
+
+
+def dhash(image: Image.Image, hash_size: int = HASH_SIZE) -> int:
+    """Difference hash: compares horizontally adjacent pixels of a tiny grayscale copy"""
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS)
+    pixels = small.tobytes()
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+def hash_to_hex(value: int) -> str:
+    return f"{value:016x}"
+
+
+def hash_bands(value: int, bands: int = HASH_BANDS) -> List[str]:
+    """Split a 64-bit hash into "<band>:<bits>" tokens for a multikey index"""
+    width = 64 // bands
+    mask = (1 << width) - 1
+    return [f"{i}:{(value >> (i * width)) & mask:x}" for i in range(bands)]
+
+
+def normalize_image(image: Image.Image, max_edge: int = 1024, fmt: str = "JPEG", quality: int = 85) -> bytes:
+    """Downscale to max_edge and re-encode; re-encoding drops EXIF and other metadata"""
+    if max(image.size) > max_edge:
+        image = image.copy()
+        image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+
+    if fmt.upper() == "JPEG" and image.mode != "RGB":
+        if image.mode in ("RGBA", "LA", "P"):
+            image = image.convert("RGBA")
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        else:
+            image = image.convert("RGB")
+
+    out = io.BytesIO()
+    image.save(out, format=fmt.upper(), quality=quality, optimize=True)
+    return out.getvalue()
+
+
+def prepare_image(image_base64: str, max_edge: int = 1024, fmt: str = "JPEG", quality: int = 85) -> PreparedImage:
+    """Decode once, hash, then normalize. CPU bound: run it in an executor."""
+    return prepare_decoded_image(decode_image(image_base64, max_edge), len(image_base64), max_edge, fmt, quality)
+
+
+def prepare_image_file(fileobj, size: int, max_edge: int = 1024, fmt: str = "JPEG",
+                       quality: int = 85) -> PreparedImage:
+    """Same as prepare_image, but reads straight from a binary file (e.g. a spooled upload) of size raw bytes"""
+    fileobj.seek(0)
+    return prepare_decoded_image(decode_image_bytes(fileobj, max_edge), base64_length(size), max_edge, fmt, quality)
+
+
+def prepare_decoded_image(image: Image.Image, bytes_in: int, max_edge: int = 1024, fmt: str = "JPEG",
+                          quality: int = 85) -> PreparedImage:
+    image_hash = dhash(image)
+    encoded = base64.b64encode(normalize_image(image, max_edge, fmt, quality)).decode("ascii")
+    return PreparedImage(
+        image_base64=encoded,
+        image_hash=image_hash,
+        bytes_in=bytes_in,
+        bytes_out=len(encoded),
+    )
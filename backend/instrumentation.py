@@ -0,0 +1,84 @@
+"""Request and MongoDB timing hooks feeding the metrics registry"""
+import threading
+from time import perf_counter
+
+from pymongo import monitoring
+
+import metrics
+
+http_latency = metrics.histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template, method and status (streamed bodies included)",
+    ("route", "method", "status"),
+)
+mongo_latency = metrics.histogram(
+    "mongo_command_seconds",
+    "MongoDB command latency by collection, command and outcome",
+    ("collection", "command", "outcome"),
+)
+
+# Commands that are not reads or writes against a collection (handshakes, pings, sessions)
+_IGNORED_COMMANDS = frozenset(("hello", "ismaster", "isMaster", "ping", "buildInfo", "endSessions", "saslStart",
+                               "saslContinue", "killCursors"))
+
+
+class RequestMetricsMiddleware:
+    """Pure ASGI timing middleware; labels by route template so path parameters don't add series"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            http_latency.observe(
+                perf_counter() - started,
+                route=getattr(route, "path", "unmatched"),
+                method=scope["method"],
+                status=status,
+            )
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Times every command the driver sends; pass via ``event_listeners`` on the client.
+
+    Motor runs the driver on worker threads, so observations take a lock.
+    """
+
+    def __init__(self):
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        if event.command_name not in _IGNORED_COMMANDS:
+            # getMore names its collection in a separate field
+            collection = event.command.get("collection" if event.command_name == "getMore" else event.command_name)
+            self._collections[event.request_id] = collection if isinstance(collection, str) else ""
+
+    def _finish(self, event, outcome: str) -> None:
+        collection = self._collections.pop(event.request_id, None)
+        if collection is not None:
+            with self._lock:
+                mongo_latency.observe(event.duration_micros / 1e6, collection=collection,
+                                      command=event.command_name, outcome=outcome)
+
+    def succeeded(self, event):
+        self._finish(event, "ok")
+
+    def failed(self, event):
+        self._finish(event, "error")
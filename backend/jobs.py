@@ -0,0 +1,232 @@
+"""Durable job queue backed by a Mongo collection"""
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Iterable, Optional
+
+from pymongo import ReturnDocument
+
+import metrics
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TERMINAL = (SUCCEEDED, FAILED)
+
+job_events = metrics.counter(
+    "jobs_total",
+    "Job lifecycle events by kind (enqueued, claimed, retried, succeeded, failed, reclaimed)",
+    ("kind", "event"),
+)
+job_latency = metrics.histogram(
+    "job_run_seconds",
+    "Time from claim to completion by kind and outcome",
+    ("kind", "outcome"),
+)
+
+Handler = Callable[[dict], Awaitable[dict]]
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying cannot help (e.g. invalid payload)"""
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    if value is None:
+        return None
+    # pymongo hands back naive UTC datetimes unless the client is tz_aware
+    return (value if value.tzinfo else value.replace(tzinfo=timezone.utc)).isoformat()
+
+
+def public_job(doc: dict) -> dict:
+    """Job fields that are safe to return to clients"""
+    return {
+        "job_id": doc["id"],
+        "kind": doc["kind"],
+        "status": doc["status"],
+        "attempts": doc.get("attempts", 0),
+        "result": doc.get("result"),
+        "error": doc.get("error"),
+        "created_at": _iso(doc.get("created_at")),
+        "finished_at": _iso(doc.get("finished_at")),
+    }
+
+
+class JobQueue:
+    """Jobs live in ``collection`` until finished_at passes the retention TTL.
+
+    A claim is a single find_one_and_update that moves a due queued job
+    (or a running job whose lease expired) to running and stamps the
+    worker's lease, so two workers never run the same attempt. Running
+    jobs heartbeat their lease; a job that fails is re-queued with
+    exponential backoff until ``max_attempts`` is reached.
+    """
+
+    def __init__(self, collection, lease_seconds: float = 60, max_attempts: int = 3,
+                 retry_backoff: float = 2.0):
+        self.collection = collection
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+
+    async def enqueue(self, kind: str, payload: dict) -> dict:
+        now = _now()
+        doc = {
+            "id": str(uuid.uuid4()),
+            "kind": kind,
+            "status": QUEUED,
+            "payload": payload,
+            "attempts": 0,
+            "available_at": now,
+            "created_at": now,
+            "updated_at": now,
+            "result": None,
+            "error": None,
+        }
+        await self.collection.insert_one(doc)
+        doc.pop("_id", None)
+        job_events.inc(kind=kind, event="enqueued")
+        return doc
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        return await self.collection.find_one({"id": job_id}, {"_id": 0, "payload": 0})
+
+    async def claim(self, worker_id: str, kinds: Iterable[str]) -> Optional[dict]:
+        now = _now()
+        doc = await self.collection.find_one_and_update(
+            {
+                "kind": {"$in": list(kinds)},
+                "$or": [
+                    {"status": QUEUED, "available_at": {"$lte": now}},
+                    {"status": RUNNING, "lease_expires_at": {"$lt": now}},
+                ],
+            },
+            {
+                "$set": {
+                    "status": RUNNING,
+                    "worker": worker_id,
+                    "lease_expires_at": now + timedelta(seconds=self.lease_seconds),
+                    "updated_at": now,
+                },
+                "$inc": {"attempts": 1},
+            },
+            sort=[("available_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc:
+            doc.pop("_id", None)
+            job_events.inc(kind=doc["kind"], event="reclaimed" if doc["attempts"] > 1 else "claimed")
+        return doc
+
+    async def heartbeat(self, job: dict, worker_id: str) -> bool:
+        result = await self.collection.update_one(
+            {"id": job["id"], "worker": worker_id, "status": RUNNING},
+            {"$set": {"lease_expires_at": _now() + timedelta(seconds=self.lease_seconds)}},
+        )
+        return result.modified_count == 1
+
+    async def complete(self, job: dict, worker_id: str, result: dict) -> None:
+        now = _now()
+        await self.collection.update_one(
+            {"id": job["id"], "worker": worker_id, "status": RUNNING},
+            {"$set": {"status": SUCCEEDED, "result": result, "error": None,
+                      "finished_at": now, "updated_at": now},
+             "$unset": {"lease_expires_at": ""}},
+        )
+        job_events.inc(kind=job["kind"], event="succeeded")
+
+    async def fail(self, job: dict, worker_id: str, error: str, retryable: bool = True) -> None:
+        now = _now()
+        if retryable and job["attempts"] < self.max_attempts:
+            delay = self.retry_backoff ** job["attempts"]
+            update = {"status": QUEUED, "error": error, "available_at": now + timedelta(seconds=delay),
+                      "updated_at": now}
+            event = "retried"
+        else:
+            update = {"status": FAILED, "error": error, "finished_at": now, "updated_at": now}
+            event = "failed"
+        await self.collection.update_one(
+            {"id": job["id"], "worker": worker_id, "status": RUNNING},
+            {"$set": update, "$unset": {"lease_expires_at": ""}},
+        )
+        job_events.inc(kind=job["kind"], event=event)
+
+    async def counts(self) -> Dict[str, int]:
+        counts = {}
+        async for row in self.collection.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            counts[row["_id"]] = row["count"]
+        return counts
+
+
+class JobWorker:
+    """Claims and runs jobs with up to ``concurrency`` in flight in this process"""
+
+    def __init__(self, queue: JobQueue, handlers: Dict[str, Handler], concurrency: int = 4,
+                 poll_interval: float = 0.5):
+        self.queue = queue
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+    async def run(self) -> None:
+        await asyncio.gather(*(self._loop() for _ in range(self.concurrency)))
+
+    async def _loop(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                job = await self.queue.claim(self.worker_id, self.handlers)
+            except Exception as e:
+                logging.error(f"Error claiming job: {str(e)}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._execute(job)
+            except Exception as e:
+                # complete/fail could not be written; the lease expires and the job is reclaimed
+                logging.error(f"Error recording job {job['id']}: {str(e)}")
+
+    async def _heartbeat(self, job: dict) -> None:
+        while True:
+            await asyncio.sleep(self.queue.lease_seconds / 3)
+            if not await self.queue.heartbeat(job, self.worker_id):
+                logging.warning(f"Lost lease on job {job['id']}")
+                return
+
+    async def _execute(self, job: dict) -> None:
+        if job["attempts"] > self.queue.max_attempts:
+            # Reclaimed after its lease lapsed on the final attempt (worker crashed mid-run)
+            await self.queue.fail(job, self.worker_id, job.get("error") or "worker lost", retryable=False)
+            return
+        started = asyncio.get_running_loop().time()
+        heartbeat = asyncio.create_task(self._heartbeat(job))
+        outcome = "failed"
+        try:
+            result = await self.handlers[job["kind"]](job["payload"])
+            await self.queue.complete(job, self.worker_id, result)
+            outcome = "succeeded"
+        except PermanentJobError as e:
+            await self.queue.fail(job, self.worker_id, str(e), retryable=False)
+        except Exception as e:
+            logging.error(f"Error running job {job['id']} ({job['kind']}): {str(e)}")
+            await self.queue.fail(job, self.worker_id, str(e) or type(e).__name__)
+        finally:
+            heartbeat.cancel()
+            job_latency.observe(asyncio.get_running_loop().time() - started, kind=job["kind"], outcome=outcome)
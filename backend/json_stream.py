@@ -0,0 +1,70 @@
+"""Incremental parser that yields objects from a streamed JSON array"""
+import json
+from typing import List
+
+
+class JsonArrayStream:
+    """Feed text chunks of a JSON array; get back each element object as soon as it closes.
+
+    Text before the opening bracket (prose, a ```json fence) is skipped and
+    the buffer only retains the element currently being read.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._start = None
+        self._in_string = False
+        self._escape = False
+        self.started = False
+        self.finished = False
+        self.errors = 0
+
+    def feed(self, chunk: str) -> List[dict]:
+        if self.finished:
+            return []
+        self._buffer += chunk
+        items = []
+        buffer = self._buffer
+        i = self._pos
+        while i < len(buffer):
+            ch = buffer[i]
+            if not self.started:
+                if ch == "[":
+                    self.started = True
+                    self._depth = 1
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                if self._depth == 1 and ch == "{":
+                    self._start = i
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 1 and ch == "}" and self._start is not None:
+                    try:
+                        items.append(json.loads(buffer[self._start:i + 1]))
+                    except ValueError:
+                        self.errors += 1
+                    self._start = None
+                elif self._depth == 0:
+                    self.finished = True
+                    i += 1
+                    break
+            i += 1
+
+        # Drop everything that can no longer be part of an element
+        keep_from = self._start if self._start is not None else i
+        self._buffer = buffer[keep_from:]
+        if self._start is not None:
+            self._start = 0
+        self._pos = i - keep_from
+        return items
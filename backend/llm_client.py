@@ -0,0 +1,429 @@
+"""Shared, rate-limited access to the upstream LLM"""
+import asyncio
+import logging
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Dict, Optional, Sequence, Tuple
+
+from emergentintegrations.llm.chat import LlmChat, UserMessage
+
+import metrics
+
+llm_requests = metrics.counter(
+    "llm_requests_total",
+    "Upstream LLM calls by stage, model and outcome",
+    ("stage", "model", "outcome"),
+)
+llm_queue_wait = metrics.histogram(
+    "llm_queue_wait_seconds",
+    "Time a call waited for a rate-limit token and a concurrency slot",
+    ("model",),
+)
+llm_latency = metrics.histogram(
+    "llm_call_seconds",
+    "Upstream LLM call latency by stage and model",
+    ("stage", "model"),
+)
+
+
+llm_prompt_size = metrics.histogram(
+    "llm_prompt_chars",
+    "Characters sent per call (system message, prompt and inline images)",
+    ("stage",),
+    buckets=metrics.SIZE_BUCKETS,
+)
+llm_response_size = metrics.histogram(
+    "llm_response_chars",
+    "Characters received per call",
+    ("stage",),
+    buckets=metrics.SIZE_BUCKETS,
+)
+llm_hedges = metrics.counter(
+    "llm_hedged_requests_total",
+    "Hedged duplicate requests launched, and how many of them answered first",
+    ("stage", "outcome"),
+)
+llm_model_fallbacks = metrics.counter(
+    "llm_model_fallback_total",
+    "Calls answered by a fallback model tier",
+    ("stage", "model"),
+)
+
+
+class LLMOverloadedError(Exception):
+    """Raised when the local LLM queue is full; callers should answer 503"""
+
+
+class LLMTimeoutError(Exception):
+    """Raised when no model tier answered within the stage deadline; callers should answer 504"""
+
+
+@dataclass
+class StagePolicy:
+    """Latency budget for one pipeline stage (analyze, ideas, steps)"""
+    deadline: float
+    # Time the primary model gets before the next tier is tried
+    primary_slo: Optional[float] = None
+    # Launch a duplicate request once a call outlives this latency percentile (0 disables)
+    hedge_percentile: float = 0.0
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures; after the cooldown one trial call is let through"""
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allows(self) -> bool:
+        return self.state != "open"
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.failures >= self.failure_threshold or self.state == "half_open":
+            self.opened_at = time.monotonic()
+
+
+class TokenBucket:
+    """Token bucket with FIFO waiters (asyncio.Lock hands over in arrival order)"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = max(burst, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+
+def parse_rate(spec: str) -> Tuple[float, float]:
+    """Parse "rate:burst" (requests per second, bucket size); burst defaults to rate"""
+    rate, _, burst = spec.partition(":")
+    return float(rate), float(burst or rate)
+
+
+def parse_rate_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    """Parse "model=rate:burst,model2=rate:burst" """
+    limits = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        model, _, value = part.partition("=")
+        limits[model.strip()] = parse_rate(value)
+    return limits
+
+
+def prompt_chars(system_message: str, message: UserMessage) -> int:
+    size = len(system_message) + len(message.text or "")
+    for content in getattr(message, "file_contents", None) or ():
+        size += len(getattr(content, "image_base64", "") or "")
+    return size
+
+
+class LLMProvider(ABC):
+    """Upstream backend behind LLMClientManager (the real API, or a fake for load tests)"""
+    name = "base"
+
+    @abstractmethod
+    async def complete(self, system_message: str, message: UserMessage, model: str, stage: str) -> str:
+        """Return the full response text"""
+
+    async def stream(self, system_message: str, message: UserMessage, model: str, stage: str) -> AsyncIterator[str]:
+        """Yield the response in chunks; backends without streaming yield it whole"""
+        yield await self.complete(system_message, message, model, stage)
+
+
+class EmergentProvider(LLMProvider):
+    """emergentintegrations LlmChat.
+
+    LlmChat keeps conversation history per instance, so each call gets its
+    own lightweight chat; the HTTP connection pool underneath is shared by
+    the library. send_message only returns the finished completion, so
+    stream() falls back to yielding it as one chunk.
+    """
+    name = "emergent"
+
+    def __init__(self, api_key: str, provider: str = "openai"):
+        self.api_key = api_key
+        self.provider = provider
+
+    async def complete(self, system_message: str, message: UserMessage, model: str, stage: str) -> str:
+        chat = LlmChat(
+            api_key=self.api_key,
+            session_id=str(uuid.uuid4()),
+            system_message=system_message
+        ).with_model(self.provider, model)
+        return await chat.send_message(message)
+
+
+class LLMClientManager:
+    """Single entry point for upstream calls.
+
+    Wraps an LLMProvider, admits calls through a per-model token bucket and
+    a global concurrency semaphore (both FIFO), and bounds the number of
+    queued calls.
+    """
+
+    def __init__(self, backend: LLMProvider, model: str = "gpt-5.2",
+                 max_concurrency: int = 16, max_queue: int = 200,
+                 rate_limits: Optional[Dict[str, Tuple[float, float]]] = None,
+                 default_rate: Tuple[float, float] = (10.0, 20.0),
+                 policies: Optional[Dict[str, StagePolicy]] = None,
+                 fallback_models: Sequence[str] = (),
+                 breaker_failures: int = 5, breaker_cooldown: float = 30.0,
+                 hedge_min_samples: int = 20):
+        self.backend = backend
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.rate_limits = rate_limits or {}
+        self.default_rate = default_rate
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._buckets: Dict[str, TokenBucket] = {}
+        self.queued: Dict[str, int] = {}
+        self.in_flight: Dict[str, int] = {}
+        self.policies = policies or {}
+        self.fallback_models = [m for m in fallback_models if m and m != model]
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+        self.hedge_min_samples = hedge_min_samples
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._latencies: Dict[Tuple[str, str], deque] = {}
+
+    def _bucket(self, model: str) -> TokenBucket:
+        bucket = self._buckets.get(model)
+        if bucket is None:
+            rate, burst = self.rate_limits.get(model, self.default_rate)
+            bucket = self._buckets[model] = TokenBucket(rate, burst)
+        return bucket
+
+    def _breaker(self, model: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = self._breakers[model] = CircuitBreaker(self.breaker_failures, self.breaker_cooldown)
+        return breaker
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(self.queued.values())
+
+    def latency_percentile(self, stage: str, model: str, percentile: float) -> Optional[float]:
+        """Recent successful-call latency at percentile, once enough samples exist"""
+        samples = self._latencies.get((stage, model))
+        if not samples or len(samples) < self.hedge_min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(percentile * len(ordered)))]
+
+    async def send(self, system_message: str, message: UserMessage, stage: str = "default",
+                   model: Optional[str] = None) -> str:
+        """Send one message under the stage's deadline, falling back across model tiers.
+
+        The primary gets ``primary_slo`` seconds (the whole deadline when it
+        is the only tier); a timeout or error counts against its circuit
+        breaker and the next tier gets what is left of the deadline. Tiers
+        with an open breaker are skipped.
+        """
+        policy = self.policies.get(stage)
+        tiers = [model or self.model] + ([] if model else self.fallback_models)
+        if policy is None:
+            return await self._call(system_message, message, stage, tiers[0])
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + policy.deadline
+        candidates = [m for m in tiers if self._breaker(m).allows()] or tiers[-1:]
+        last_error: Optional[Exception] = None
+        for index, tier_model in enumerate(candidates):
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            is_last = index == len(candidates) - 1
+            budget = remaining if is_last or not policy.primary_slo else min(remaining, policy.primary_slo)
+            breaker = self._breaker(tier_model)
+            try:
+                response = await asyncio.wait_for(
+                    self._hedged(system_message, message, stage, tier_model, policy), budget
+                )
+            except LLMOverloadedError:
+                raise
+            except Exception as e:
+                breaker.record_failure()
+                last_error = e
+                logging.warning(f"LLM {stage} call to {tier_model} failed ({type(e).__name__}), "
+                                f"{len(candidates) - index - 1} tier(s) left")
+                continue
+            breaker.record_success()
+            if tier_model != tiers[0]:
+                llm_model_fallbacks.inc(stage=stage, model=tier_model)
+            return response
+
+        if last_error is None or isinstance(last_error, asyncio.TimeoutError):
+            raise LLMTimeoutError(f"No answer for {stage} within {policy.deadline:g}s")
+        raise last_error
+
+    async def _hedged(self, system_message: str, message: UserMessage, stage: str, model: str,
+                      policy: StagePolicy) -> str:
+        """Run the call; if it outlives the latency percentile, race a duplicate against it"""
+        hedge_after = None
+        if policy.hedge_percentile:
+            hedge_after = self.latency_percentile(stage, model, policy.hedge_percentile)
+        first = asyncio.create_task(self._call(system_message, message, stage, model))
+        pending = {first}
+        try:
+            if hedge_after is not None:
+                done, pending = await asyncio.wait(pending, timeout=hedge_after)
+                if not done:
+                    llm_hedges.inc(stage=stage, outcome="launched")
+                    pending.add(asyncio.create_task(self._call(system_message, message, stage, model)))
+
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            llm_hedges.inc(stage=stage, outcome="won")
+                        return task.result()
+                    error = task.exception()
+            if error is None:
+                return first.result()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    @asynccontextmanager
+    async def _slot(self, stage: str, model: str):
+        """Wait for a rate-limit token and a concurrency slot, or reject when the queue is full"""
+        if self.max_queue and self.queue_depth >= self.max_queue:
+            llm_requests.inc(stage=stage, model=model, outcome="rejected")
+            raise LLMOverloadedError(f"LLM queue is full ({self.queue_depth} waiting)")
+
+        queued_at = time.perf_counter()
+        self.queued[model] = self.queued.get(model, 0) + 1
+        try:
+            await self._bucket(model).acquire()
+            await self._semaphore.acquire()
+        finally:
+            self.queued[model] -= 1
+        llm_queue_wait.observe(time.perf_counter() - queued_at, model=model)
+
+        self.in_flight[model] = self.in_flight.get(model, 0) + 1
+        try:
+            yield
+        finally:
+            self.in_flight[model] -= 1
+            self._semaphore.release()
+
+    async def _call(self, system_message: str, message: UserMessage, stage: str, model: str) -> str:
+        """One upstream request, subject to rate and concurrency limits"""
+        async with self._slot(stage, model):
+            llm_prompt_size.observe(prompt_chars(system_message, message), stage=stage)
+            started = time.perf_counter()
+            try:
+                response = await self.backend.complete(system_message, message, model, stage)
+                llm_requests.inc(stage=stage, model=model, outcome="ok")
+                llm_response_size.observe(len(response or ""), stage=stage)
+                self._latencies.setdefault((stage, model), deque(maxlen=500)).append(time.perf_counter() - started)
+                return response
+            except asyncio.CancelledError:
+                llm_requests.inc(stage=stage, model=model, outcome="cancelled")
+                raise
+            except Exception:
+                llm_requests.inc(stage=stage, model=model, outcome="error")
+                raise
+            finally:
+                llm_latency.observe(time.perf_counter() - started, stage=stage, model=model)
+
+    async def stream(self, system_message: str, message: UserMessage, stage: str = "default") -> AsyncIterator[str]:
+        """Stream a response from the primary model.
+
+        Admission and metrics match send(); hedging and tier fallback do not
+        apply because output has already reached the client once it starts.
+        The stage deadline bounds the wait for a slot, the first chunk and
+        the whole stream; running out raises LLMTimeoutError.
+        """
+        model = self.model
+        policy = self.policies.get(stage)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + policy.deadline if policy else None
+
+        async def within_deadline(awaitable):
+            if deadline is None:
+                return await awaitable
+            try:
+                return await asyncio.wait_for(awaitable, max(deadline - loop.time(), 0))
+            except asyncio.TimeoutError:
+                raise LLMTimeoutError(f"No streamed answer for {stage} within {policy.deadline:g}s") from None
+
+        async with AsyncExitStack() as stack:
+            await within_deadline(stack.enter_async_context(self._slot(stage, model)))
+            llm_prompt_size.observe(prompt_chars(system_message, message), stage=stage)
+            started = time.perf_counter()
+            size = 0
+            outcome = "error"
+            chunks = self.backend.stream(system_message, message, model, stage)
+            try:
+                while True:
+                    try:
+                        chunk = await within_deadline(chunks.__anext__())
+                    except StopAsyncIteration:
+                        break
+                    size += len(chunk)
+                    yield chunk
+                outcome = "ok"
+                llm_response_size.observe(size, stage=stage)
+            except LLMTimeoutError:
+                outcome = "timeout"
+                raise
+            except (asyncio.CancelledError, GeneratorExit):
+                outcome = "cancelled"
+                raise
+            finally:
+                await chunks.aclose()
+                llm_requests.inc(stage=stage, model=model, outcome=outcome)
+                llm_latency.observe(time.perf_counter() - started, stage=stage, model=model)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend.name,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "queue_depth": self.queue_depth,
+            "in_flight": sum(self.in_flight.values()),
+            "breakers": {model: breaker.state for model, breaker in self._breakers.items()},
+            "models": {
+                model: {
+                    "queued": self.queued.get(model, 0),
+                    "in_flight": self.in_flight.get(model, 0),
+                    "tokens_available": round(bucket.tokens, 2),
+                }
+                for model, bucket in self._buckets.items()
+            },
+        }
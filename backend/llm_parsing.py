@@ -0,0 +1,187 @@
+"""Structured-output parsing for LLM responses"""
+import re
+from dataclasses import dataclass, field
+from time import perf_counter
+from typing import Any, Callable, List, Optional, Tuple, Type
+
+from pydantic import BaseModel, ValidationError
+
+import metrics
+from json_stream import JsonArrayStream
+
+try:
+    from orjson import loads
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    from json import loads
+
+parse_results = metrics.counter(
+    "llm_parse_total",
+    "Structured LLM responses by kind and outcome (ok, partial, retry)",
+    ("kind", "outcome"),
+)
+parse_latency = metrics.histogram(
+    "llm_parse_seconds",
+    "Time to extract and validate a structured response",
+    ("kind",),
+    buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+
+OK = "ok"
+PARTIAL = "partial"
+RETRY = "retry"
+
+
+@dataclass
+class ParseResult:
+    """Validated items plus how much of the response was usable"""
+    items: List[BaseModel]
+    status: str
+    errors: List[str] = field(default_factory=list)
+
+    @property
+    def needs_retry(self) -> bool:
+        return self.status == RETRY
+
+
+# Strings are matched whole so brackets inside them never count
+_TOKENS = re.compile(r'"(?:[^"\\]|\\.)*"|[\[\]{}]')
+_CLOSERS = {"[": "]", "{": "}"}
+
+
+def find_json(text: str, openers: str = "[{") -> Optional[Tuple[Any, int, int]]:
+    """Return (value, start, end) for the first balanced JSON value that parses.
+
+    Fast path: parse from the first opener to the last matching closer,
+    which covers fenced and bare responses in one C-level call. Otherwise
+    scan tokens once; a balanced candidate that fails to parse resumes the
+    scan after its opener.
+    """
+    starts = sorted(p for p in (text.find(o) for o in openers) if p != -1)
+    if not starts:
+        return None
+    for start in starts:
+        last = text.rfind(_CLOSERS[text[start]])
+        if last > start:
+            try:
+                return loads(text[start:last + 1]), start, last + 1
+            except ValueError:
+                pass
+    first = starts[0]
+
+    pos = first
+    while pos != -1:
+        depth = 0
+        for match in _TOKENS.finditer(text, pos):
+            token = match.group()
+            if token[0] == '"':
+                continue
+            depth += 1 if token in "[{" else -1
+            if depth == 0:
+                end = match.end()
+                try:
+                    return loads(text[pos:end]), pos, end
+                except ValueError:
+                    break
+        else:
+            return None
+        pos = min((p for p in (text.find(o, pos + 1) for o in openers) if p != -1), default=-1)
+    return None
+
+
+def _as_list(value: Any) -> Optional[list]:
+    if isinstance(value, list):
+        return value
+    if isinstance(value, dict):
+        # {"ideas": [...]} style wrappers
+        lists = [v for v in value.values() if isinstance(v, list)]
+        if len(lists) == 1:
+            return lists[0]
+        return [value]
+    return None
+
+
+def parse_model_list(
+    text: str,
+    model: Type[BaseModel],
+    kind: str,
+    prepare: Callable[[dict, int], dict] = lambda item, index: item,
+    limit: Optional[int] = None,
+) -> ParseResult:
+    """Parse a JSON array from text and validate each element into model.
+
+    ``prepare`` fills in server-side fields before validation. Invalid
+    elements are dropped; if some survive the result is PARTIAL, and if
+    none do (or there is no JSON at all) it is RETRY. Truncated arrays are
+    salvaged element by element.
+    """
+    started = perf_counter()
+    errors: List[str] = []
+    found = find_json(text or "")
+    raw_items = _as_list(found[0]) if found else None
+    truncated = False
+    # A lone object after an array opener is usually the first element of an array that never closed
+    if raw_items is None or (isinstance(found[0], dict) and "[" in text[:found[1]]):
+        salvaged = JsonArrayStream().feed(text or "")
+        if salvaged:
+            raw_items = salvaged
+            truncated = True
+        elif raw_items is None:
+            raw_items = []
+            errors.append("no JSON array found")
+
+    items = []
+    for index, raw in enumerate(raw_items[:limit] if limit else raw_items, 1):
+        if not isinstance(raw, dict):
+            errors.append(f"item {index}: expected an object")
+            continue
+        try:
+            items.append(model.model_validate(prepare(raw, index)))
+        except (ValidationError, TypeError, ValueError) as e:
+            errors.append(f"item {index}: {e}")
+
+    if not items:
+        status = RETRY
+    elif errors or truncated:
+        status = PARTIAL
+    else:
+        status = OK
+    parse_results.inc(kind=kind, outcome=status)
+    parse_latency.observe(perf_counter() - started, kind=kind)
+    return ParseResult(items=items, status=status, errors=errors)
+
+
+def parse_model(text: str, model: Type[BaseModel], kind: str) -> Optional[BaseModel]:
+    """Parse the first JSON object in text into model, or None (counted as RETRY).
+
+    A single-object wrapper such as ``{"analysis": {...}}`` is unwrapped.
+    """
+    started = perf_counter()
+    found = find_json(text or "", "{")
+    value = found[0] if found else None
+    if isinstance(value, dict) and len(value) == 1 and isinstance(next(iter(value.values())), dict):
+        value = next(iter(value.values()))
+    item = None
+    if isinstance(value, dict):
+        try:
+            item = model.model_validate(value)
+        except (ValidationError, TypeError, ValueError):
+            pass
+    parse_results.inc(kind=kind, outcome=OK if item is not None else RETRY)
+    parse_latency.observe(perf_counter() - started, kind=kind)
+    return item
+
+
+def failure_rates() -> dict:
+    """Share of partial and retry outcomes per kind"""
+    totals = {}
+    for labels, value in parse_results.samples():
+        totals.setdefault(labels["kind"], {})[labels["outcome"]] = value
+    rates = {}
+    for kind, outcomes in totals.items():
+        total = sum(outcomes.values())
+        rates[kind] = {
+            "total": total,
+            "partial_rate": outcomes.get(PARTIAL, 0) / total if total else 0.0,
+            "retry_rate": outcomes.get(RETRY, 0) / total if total else 0.0,
+        }
+    return rates
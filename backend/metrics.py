@@ -0,0 +1,187 @@
+"""In-process metrics shared by the ReCircuit backend"""
+from bisect import bisect_left
+from collections import defaultdict
+from time import perf_counter
+from typing import Dict, Iterable, Sequence, Tuple, Union
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Payload sizes in bytes (prompts, responses, uploads)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+class _Metric:
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels.get(label, "")) for label in self.labelnames)
+
+
+class Counter(_Metric):
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = defaultdict(float)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        self._values[self._key(labels)] += amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        for key, value in list(self._values.items()):
+            yield dict(zip(self.labelnames, key)), value
+
+
+class Gauge(_Metric):
+    """Point-in-time value, set by whoever owns it (e.g. refreshed at scrape time)"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        for key, value in list(self._values.items()):
+            yield dict(zip(self.labelnames, key)), value
+
+
+class Histogram(_Metric):
+    """Bucketed distribution (cumulative buckets, Prometheus style)"""
+
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[Tuple[str, ...], list] = {}
+        self._sums: Dict[Tuple[str, ...], float] = defaultdict(float)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        counts = self._counts.get(key)
+        if counts is None:
+            counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+        counts[bisect_left(self.buckets, value)] += 1
+        self._sums[key] += value
+
+    def samples(self):
+        for key, counts in list(self._counts.items()):
+            cumulative, running = [], 0
+            for count in counts:
+                running += count
+                cumulative.append(running)
+            yield dict(zip(self.labelnames, key)), {
+                "count": running,
+                "sum": self._sums[key],
+                "buckets": dict(zip([*self.buckets, float("inf")], cumulative)),
+            }
+
+
+class timer:
+    """Context manager that observes elapsed seconds into a histogram"""
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, **labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(perf_counter() - self.started, **self.labels)
+        return False
+
+
+_REGISTRY: Dict[str, Union[Counter, Gauge, Histogram]] = {}
+
+
+def _register(cls, name: str, documentation: str, labelnames: Iterable[str], **kwargs):
+    metric = _REGISTRY.get(name)
+    if metric is None:
+        metric = _REGISTRY[name] = cls(name, documentation, labelnames, **kwargs)
+    return metric
+
+
+def counter(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+    """Get or create a registered counter"""
+    return _register(Counter, name, documentation, labelnames)
+
+
+def gauge(name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+    """Get or create a registered gauge"""
+    return _register(Gauge, name, documentation, labelnames)
+
+
+def histogram(name: str, documentation: str, labelnames: Iterable[str] = (), **kwargs) -> Histogram:
+    """Get or create a registered histogram"""
+    return _register(Histogram, name, documentation, labelnames, **kwargs)
+
+
+def _summarize(value):
+    if isinstance(value, dict):
+        count = value["count"]
+        return {"count": count, "sum": value["sum"], "avg": value["sum"] / count if count else 0.0}
+    return value
+
+
+def snapshot() -> dict:
+    """Return all registered metrics as a JSON-friendly dict"""
+    result = {}
+    for name, metric in _REGISTRY.items():
+        samples = [(labels, _summarize(value)) for labels, value in metric.samples()]
+        if not metric.labelnames:
+            result[name] = samples[0][1] if samples else 0.0
+        else:
+            result[name] = [{"labels": labels, "value": value} for labels, value in samples]
+    return result
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+_TYPES = {Counter: "counter", Gauge: "gauge", Histogram: "histogram"}
+
+
+def render() -> str:
+    """Return all registered metrics in the Prometheus text exposition format"""
+    lines = []
+    for name, metric in _REGISTRY.items():
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {_TYPES[type(metric)]}")
+        if isinstance(metric, Histogram):
+            for labels, value in metric.samples():
+                for bound, count in value["buckets"].items():
+                    lines.append(f"{name}_bucket{_labels({**labels, 'le': _number(bound)})} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(value['sum'])}")
+                lines.append(f"{name}_count{_labels(labels)} {value['count']}")
+        else:
+            for labels, value in metric.samples():
+                lines.append(f"{name}{_labels(labels)} {_number(value)}")
+    return "\n".join(lines) + "\n"
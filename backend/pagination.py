@@ -0,0 +1,53 @@
+"""Opaque cursors for keyset pagination"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, List
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a client sends a cursor we did not issue"""
+
+
+def _encode_value(value: Any) -> Any:
+    # Datetimes round-trip as datetimes so keyset filters compare BSON dates
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    return str(value)
+
+
+def _decode_value(obj: dict) -> Any:
+    if set(obj) == {"$dt"}:
+        try:
+            return datetime.fromisoformat(obj["$dt"])
+        except (TypeError, ValueError) as e:
+            raise InvalidCursorError("Malformed cursor") from e
+    return obj
+
+
+def encode_cursor(values: List) -> str:
+    """Pack the sort-key values of the last item into a URL-safe token"""
+    raw = json.dumps(values, separators=(",", ":"), default=_encode_value).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, size: int) -> List:
+    padded = token + "=" * (-len(token) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")), object_hook=_decode_value)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursorError("Malformed cursor") from e
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursorError("Malformed cursor")
+    return values
+
+
+def keyset_filter(fields: List[str], values: List, descending: bool = True) -> dict:
+    """Filter for rows strictly after ``values`` in (fields...) order"""
+    op = "$lt" if descending else "$gt"
+    clauses = []
+    for i, field in enumerate(fields):
+        clause = {fields[j]: values[j] for j in range(i)}
+        clause[field] = {op: values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
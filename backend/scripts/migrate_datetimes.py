@@ -0,0 +1,82 @@
+"""Convert ISO-string timestamps to native BSON dates.
+
+Older documents stored ``created_at``/``saved_at`` as ISO strings; the
+API now writes dates, and Mongo never matches a string against a date in
+range queries or sorts them together. This rewrites, in batches:
+  - innovations.created_at
+  - waste_cache.created_at
+  - saved_innovations.saved_at
+
+Unparseable values are reported and left alone. Safe to re-run.
+
+    python scripts/migrate_datetimes.py --dry-run
+    python scripts/migrate_datetimes.py
+"""
+import argparse
+import asyncio
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+FIELDS = [
+    ("innovations", "created_at"),
+    ("waste_cache", "created_at"),
+    ("saved_innovations", "saved_at"),
+]
+
+
+def parse_timestamp(value: str):
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+async def migrate_field(collection, field: str, batch_size: int, dry_run: bool) -> dict:
+    counts = {"converted": 0, "unparseable": 0}
+    ops = []
+    cursor = collection.find({field: {"$type": "string"}}, {"_id": 1, field: 1})
+    async for doc in cursor:
+        parsed = parse_timestamp(doc[field])
+        if parsed is None:
+            counts["unparseable"] += 1
+            continue
+        ops.append(UpdateOne({"_id": doc["_id"], field: doc[field]}, {"$set": {field: parsed}}))
+        counts["converted"] += 1
+        if len(ops) >= batch_size:
+            if not dry_run:
+                await collection.bulk_write(ops, ordered=False)
+            ops.clear()
+    if ops and not dry_run:
+        await collection.bulk_write(ops, ordered=False)
+    return counts
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = parser.parse_args()
+
+    load_dotenv(BACKEND_DIR / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        prefix = "[dry run] " if args.dry_run else ""
+        for collection, field in FIELDS:
+            counts = await migrate_field(db[collection], field, args.batch_size, args.dry_run)
+            print(f"{prefix}{collection}.{field}: converted {counts['converted']}, "
+                  f"skipped {counts['unparseable']} unparseable")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+"""Convert embedded saved_innovations documents into (user_id, innovation_id) references.
+
+Older saves embedded a full copy of the innovation. For each of them this
+script:
+  1. restores the innovation into db.innovations if it no longer exists there,
+  2. replaces the embedded copy with ``innovation_id``,
+  3. drops duplicate saves of the same pair, keeping the earliest one.
+
+Run it before the unique (user_id, innovation_id) index is created, or
+re-run ``python db_indexes.py ensure`` afterwards:
+
+    python scripts/migrate_saved_innovations.py --dry-run
+    python scripts/migrate_saved_innovations.py
+"""
+import argparse
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import DeleteOne, UpdateOne
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+async def migrate(db, batch_size: int, dry_run: bool) -> dict:
+    counts = {"converted": 0, "restored_innovations": 0, "duplicates_removed": 0}
+
+    saved_ops, innovation_ops = [], []
+    restored = set()
+
+    async def flush():
+        if dry_run:
+            saved_ops.clear()
+            innovation_ops.clear()
+            return
+        if innovation_ops:
+            await db.innovations.bulk_write(innovation_ops, ordered=False)
+            innovation_ops.clear()
+        if saved_ops:
+            await db.saved_innovations.bulk_write(saved_ops, ordered=False)
+            saved_ops.clear()
+
+    cursor = db.saved_innovations.find({"innovation": {"$exists": True}})
+    async for doc in cursor:
+        innovation = doc["innovation"]
+        innovation_id = innovation["id"]
+
+        if innovation_id not in restored and not await db.innovations.find_one({"id": innovation_id}, {"_id": 1}):
+            restored.add(innovation_id)
+            innovation_ops.append(UpdateOne({"id": innovation_id}, {"$setOnInsert": innovation}, upsert=True))
+            counts["restored_innovations"] += 1
+
+        saved_ops.append(UpdateOne(
+            {"_id": doc["_id"]},
+            {"$set": {"innovation_id": innovation_id}, "$unset": {"innovation": ""}},
+        ))
+        counts["converted"] += 1
+
+        if len(saved_ops) >= batch_size:
+            await flush()
+    await flush()
+
+    # Keep the earliest save for each (user_id, innovation_id) pair
+    duplicates = db.saved_innovations.aggregate([
+        {"$sort": {"saved_at": 1}},
+        {"$group": {"_id": {"user_id": "$user_id",
+                            "innovation_id": {"$ifNull": ["$innovation_id", "$innovation.id"]}},
+                    "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+    ], allowDiskUse=True)
+    async for group in duplicates:
+        for object_id in group["ids"][1:]:
+            saved_ops.append(DeleteOne({"_id": object_id}))
+            counts["duplicates_removed"] += 1
+        if len(saved_ops) >= batch_size:
+            await flush()
+    await flush()
+
+    return counts
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = parser.parse_args()
+
+    load_dotenv(BACKEND_DIR / '.env')
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        counts = await migrate(db, args.batch_size, args.dry_run)
+        if not args.dry_run:
+            from db_indexes import ensure_indexes
+            await ensure_indexes(db)
+        prefix = "[dry run] " if args.dry_run else ""
+        print(f"{prefix}converted {counts['converted']} saves, restored {counts['restored_innovations']} "
+              f"innovations, removed {counts['duplicates_removed']} duplicates")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+"""JSON encoding for responses and streamed events (orjson when available)"""
+import json
+from datetime import date, datetime, timezone
+from typing import Any
+
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def bson_now() -> datetime:
+    """Current UTC time at BSON's millisecond precision.
+
+    A document then reads back from Mongo exactly as it was first served,
+    so bodies (and their ETags) match whether they come from memory or Mongo.
+    """
+    now = datetime.now(timezone.utc)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    # ObjectId, Decimal128 and friends
+    return str(value)
+
+
+def dumps(value: Any) -> bytes:
+    """Compact UTF-8 JSON; datetimes become ISO 8601 strings"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson.
+
+    As the app's default response class it only changes rendering; routes
+    on hot paths return it directly with plain dicts (e.g. Mongo documents)
+    so FastAPI's jsonable_encoder pass is skipped as well.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
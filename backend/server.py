@@ -1,31 +1,62 @@
-from fastapi import FastAPI, APIRouter, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, APIRouter, UploadFile, File, Form, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from dotenv import load_dotenv
+from starlette.datastructures import Headers
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict
-from typing import List, Optional
+from pydantic import BaseModel, Field, ConfigDict, field_validator
+from typing import AsyncIterator, List, Optional
 import uuid
-from datetime import datetime, timezone
+import time
+from datetime import datetime
 import base64
-from PIL import Image
-import io
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
-from emergentintegrations.llm.chat import LlmChat, UserMessage, ImageContent
+from emergentintegrations.llm.chat import UserMessage, ImageContent
+
+import metrics
+from cache import IdeaCache, ImageAnalysisCache, WasteAnalysisCache, WasteLookup, normalize_text, waste_text_key
+from coalesce import Coalescer
+from db_indexes import ensure_indexes, explain_queries
+from http_cache import ImmutableResponses
+from instrumentation import MongoCommandMetrics, RequestMetricsMiddleware
+from json_stream import JsonArrayStream
+from llm_client import (
+    EmergentProvider, LLMClientManager, LLMOverloadedError, LLMProvider, LLMTimeoutError, StagePolicy,
+    parse_rate, parse_rate_limits
+)
+from llm_parsing import failure_rates, parse_model, parse_model_list
+from jobs import TERMINAL, JobQueue, JobWorker, PermanentJobError, public_job
+from imaging import InvalidImageError, PreparedImage, hash_to_hex, prepare_image, prepare_image_file
+from pagination import InvalidCursorError, decode_cursor, encode_cursor, keyset_filter
+from serialization import FastJSONResponse, bson_now, dumps
+from similarity import SimilarityIndex, WasteSimilarity
+from write_behind import WriteBehindBuffer
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+USE_MEMORY_DB = mongo_url.startswith('memory://')
+if USE_MEMORY_DB:
+    # In-process stand-in for offline load tests; needs mongomock-motor (not in requirements.txt)
+    from mongomock_motor import AsyncMongoMockClient
+    client = AsyncMongoMockClient(tz_aware=True)
+else:
+    # tz_aware: BSON dates come back as UTC-aware datetimes, matching what the models produce
+    client = AsyncIOMotorClient(mongo_url, tz_aware=True, event_listeners=[MongoCommandMetrics()])
 db = client[os.environ['DB_NAME']]
 
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -33,6 +64,200 @@ api_router = APIRouter(prefix="/api")
 # Get API key with fallback
 API_KEY = os.environ.get('EMERGENT_LLM_KEY', '')
 
+# Per-stage latency budgets; a cheaper fallback tier takes over once the
+# primary has used its SLO share of the deadline or its breaker is open
+LLM_FALLBACK_MODELS = [m.strip() for m in os.environ.get('LLM_FALLBACK_MODELS', '').split(',') if m.strip()]
+LLM_PRIMARY_SLO_FRACTION = float(os.environ.get('LLM_PRIMARY_SLO_FRACTION', '0.6'))
+LLM_HEDGE_PERCENTILE = float(os.environ.get('LLM_HEDGE_PERCENTILE', '0'))
+
+def stage_policy(stage: str, default_deadline: str) -> StagePolicy:
+    deadline = float(os.environ.get(f'LLM_DEADLINE_{stage.upper()}_SECONDS', default_deadline))
+    return StagePolicy(
+        deadline=deadline,
+        primary_slo=deadline * LLM_PRIMARY_SLO_FRACTION if LLM_FALLBACK_MODELS else None,
+        hedge_percentile=LLM_HEDGE_PERCENTILE
+    )
+
+def make_llm_backend() -> LLMProvider:
+    """LLM_BACKEND=fake replays recorded responses for offline load tests"""
+    if os.environ.get('LLM_BACKEND', 'emergent') == 'fake':
+        from fake_llm import FakeLLMProvider
+        return FakeLLMProvider.from_file(
+            os.environ.get('LLM_FAKE_RECORDS') or None,
+            latency=float(os.environ.get('LLM_FAKE_LATENCY_MS', '800')) / 1000,
+            jitter=float(os.environ.get('LLM_FAKE_JITTER_MS', '200')) / 1000,
+            seed=int(os.environ.get('LLM_FAKE_SEED', '0'))
+        )
+    return EmergentProvider(API_KEY, os.environ.get('LLM_MODEL_PROVIDER', 'openai'))
+
+# Shared upstream LLM access (global concurrency cap + per-model token buckets)
+llm = LLMClientManager(
+    make_llm_backend(),
+    model=os.environ.get('LLM_MODEL', 'gpt-5.2'),
+    max_concurrency=int(os.environ.get('LLM_MAX_CONCURRENCY', '16')),
+    max_queue=int(os.environ.get('LLM_MAX_QUEUE', '200')),
+    rate_limits=parse_rate_limits(os.environ.get('LLM_RATE_LIMITS', '')),
+    default_rate=parse_rate(os.environ.get('LLM_DEFAULT_RATE', '10:20')),
+    policies={
+        "analyze": stage_policy("analyze", '30'),
+        "ideas": stage_policy("ideas", '60'),
+        "steps": stage_policy("steps", '90'),
+    },
+    fallback_models=LLM_FALLBACK_MODELS,
+    breaker_failures=int(os.environ.get('LLM_BREAKER_FAILURES', '5')),
+    breaker_cooldown=float(os.environ.get('LLM_BREAKER_COOLDOWN_SECONDS', '30')),
+    hedge_min_samples=int(os.environ.get('LLM_HEDGE_MIN_SAMPLES', '20'))
+)
+
+# Analysis and innovation inserts are batched off the request path; reads check the buffer first
+WRITE_BEHIND_MAX_BATCH = int(os.environ.get('WRITE_BEHIND_MAX_BATCH', '100'))
+WRITE_BEHIND_FLUSH_SECONDS = float(os.environ.get('WRITE_BEHIND_FLUSH_SECONDS', '0.05'))
+WRITE_BEHIND_MAX_PENDING = int(os.environ.get('WRITE_BEHIND_MAX_PENDING', '5000'))
+waste_writes = WriteBehindBuffer(db.waste_cache, max_batch=WRITE_BEHIND_MAX_BATCH,
+                                 flush_interval=WRITE_BEHIND_FLUSH_SECONDS, max_pending=WRITE_BEHIND_MAX_PENDING)
+innovation_writes = WriteBehindBuffer(db.innovations, max_batch=WRITE_BEHIND_MAX_BATCH,
+                                      flush_interval=WRITE_BEHIND_FLUSH_SECONDS, max_pending=WRITE_BEHIND_MAX_PENDING)
+
+# Text analysis cache (in-process LRU in front of waste_cache)
+waste_analysis_cache = WasteAnalysisCache(
+    db.waste_cache,
+    maxsize=int(os.environ.get('WASTE_CACHE_MAXSIZE', '1024')),
+    ttl=float(os.environ.get('WASTE_CACHE_TTL_SECONDS', '3600')),
+    mongo_ttl=float(os.environ.get('WASTE_CACHE_MONGO_TTL_SECONDS', str(7 * 24 * 3600)))
+)
+
+# waste_id -> stored analysis, so clients need not echo the description back
+waste_lookup = WasteLookup(
+    db.waste_cache,
+    maxsize=int(os.environ.get('WASTE_LOOKUP_MAXSIZE', '4096')),
+    ttl=float(os.environ.get('WASTE_LOOKUP_TTL_SECONDS', '3600'))
+)
+
+# Near-duplicate photo cache (perceptual hash stored next to waste_cache entries)
+image_analysis_cache = ImageAnalysisCache(
+    db.waste_cache,
+    max_distance=int(os.environ.get('IMAGE_DEDUP_MAX_DISTANCE', '4')),
+    maxsize=int(os.environ.get('WASTE_CACHE_MAXSIZE', '1024')),
+    ttl=float(os.environ.get('WASTE_CACHE_TTL_SECONDS', '3600')),
+    mongo_ttl=float(os.environ.get('WASTE_CACHE_MONGO_TTL_SECONDS', str(7 * 24 * 3600)))
+)
+
+# Near-duplicate text analyses ("dead dell notebook" reuses "broken dell laptop")
+SIMILARITY_ENABLED = os.environ.get('SIMILARITY_ENABLED', 'true').lower() == 'true'
+SIMILARITY_REFRESH_SECONDS = float(os.environ.get('SIMILARITY_REFRESH_SECONDS', '30'))
+similar_waste = WasteSimilarity(
+    db.waste_cache,
+    SimilarityIndex(threshold=float(os.environ.get('SIMILARITY_THRESHOLD', '0.8'))),
+    max_age=float(os.environ.get('WASTE_CACHE_MONGO_TTL_SECONDS', str(7 * 24 * 3600))),
+    rescan=float(os.environ.get('SIMILARITY_RESCAN_SECONDS', '300'))
+)
+similarity_tasks = []
+
+# Idea sets reused across near-identical generate requests (budgets bucketed by band)
+IDEAS_PER_REQUEST = 3
+IDEA_CACHE_ENABLED = os.environ.get('IDEA_CACHE_ENABLED', 'true').lower() == 'true'
+# Ideas generated fresh on every hit and mixed in with cached ones; 0 serves hits without an LLM call
+IDEA_CACHE_FRESH_IDEAS = min(int(os.environ.get('IDEA_CACHE_FRESH_IDEAS', '1')), IDEAS_PER_REQUEST)
+idea_cache = IdeaCache(
+    db.idea_cache,
+    bands=[float(b) for b in os.environ.get('IDEA_CACHE_BUDGET_BANDS', '5,10,25,50,100,250,500,1000').split(',')],
+    pool_size=int(os.environ.get('IDEA_CACHE_POOL_SIZE', '9')),
+    ttl=float(os.environ.get('IDEA_CACHE_TTL_SECONDS', str(24 * 3600))),
+    maxsize=int(os.environ.get('IDEA_CACHE_MAXSIZE', '1024')),
+    memory_ttl=float(os.environ.get('IDEA_CACHE_MEMORY_TTL_SECONDS', '600'))
+)
+ideas_served = metrics.counter("ideas_served_total", "Ideas returned by generate requests by source (cached, generated)", ("source",))
+
+# Structured output parsing
+LLM_PARSE_RETRIES = int(os.environ.get('LLM_PARSE_RETRIES', '1'))
+llm_fallbacks = metrics.counter("llm_fallback_total", "Placeholder responses served after unparseable output", ("kind",))
+
+# Image preprocessing (Pillow work runs off the event loop)
+IMAGE_MAX_EDGE = int(os.environ.get('IMAGE_MAX_EDGE', '1024'))
+IMAGE_FORMAT = os.environ.get('IMAGE_FORMAT', 'JPEG')
+IMAGE_QUALITY = int(os.environ.get('IMAGE_QUALITY', '85'))
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', str(20 * 1024 * 1024)))
+image_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('IMAGE_WORKERS', '4')),
+    thread_name_prefix="image"
+)
+# Uploads are counted at their base64 size so both sources share one unit
+image_bytes_in = metrics.counter(
+    "image_bytes_in_total", "Base64 image bytes received from clients by source (json, upload)", ("source",)
+)
+image_bytes_out = metrics.counter(
+    "image_bytes_out_total", "Base64 image bytes sent to the vision model by source (json, upload)", ("source",)
+)
+images_prepared = metrics.counter("images_prepared_total", "Images decoded and normalized")
+image_prepare_latency = metrics.histogram(
+    "image_prepare_seconds",
+    "Image decode, normalize and hash time by operation (includes waiting for the pool)",
+    ("operation",)
+)
+cache_hit_ratio = metrics.gauge("cache_hit_ratio", "Share of lookups answered from cache, refreshed at scrape time", ("cache",))
+
+# One in-flight LLM call per key; the lease collection extends this across workers
+coalescer = Coalescer(
+    db.llm_leases if os.environ.get('COALESCE_ACROSS_WORKERS', 'true').lower() == 'true' else None,
+    lease_ttl=float(os.environ.get('LLM_LEASE_TTL_SECONDS', '120')),
+    result_ttl=float(os.environ.get('LLM_LEASE_RESULT_SECONDS', '5'))
+)
+
+# Background step generation for freshly created innovations
+STEP_PREFETCH_ENABLED = os.environ.get('STEP_PREFETCH_ENABLED', 'true').lower() == 'true'
+STEP_PREFETCH_CONCURRENCY = int(os.environ.get('STEP_PREFETCH_CONCURRENCY', '3'))
+step_prefetch_semaphore = asyncio.Semaphore(STEP_PREFETCH_CONCURRENCY)
+step_prefetch_tasks = set()
+innovation_detail_latency = metrics.histogram(
+    "innovation_detail_seconds",
+    "Innovation detail latency by how the response was produced (memory, warm, inflight, cold)",
+    ("path",)
+)
+
+# Innovation detail is immutable once its steps exist: ETags, 304s and compressed bodies from memory
+innovation_responses = ImmutableResponses(
+    max_versions=int(os.environ.get('DETAIL_VERSION_MAXSIZE', '100000')),
+    max_bodies=int(os.environ.get('DETAIL_BODY_CACHE_MAXSIZE', '1024')),
+    min_compress_size=int(os.environ.get('COMPRESS_MIN_BYTES', '1024')),
+    max_age=int(os.environ.get('DETAIL_MAX_AGE_SECONDS', '86400'))
+)
+
+# Bulk intake (/analyze-waste/batch)
+BATCH_MAX_ITEMS = int(os.environ.get('BATCH_MAX_ITEMS', '50'))
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', '8'))
+
+# Durable queue for innovation generation; worker processes run the jobs
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', '0.5'))
+JOB_WORKER_PROCESSES = int(os.environ.get('JOB_WORKER_PROCESSES', '1'))
+JOB_WORKER_CONCURRENCY = int(os.environ.get('JOB_WORKER_CONCURRENCY', '4'))
+job_queue = JobQueue(
+    db.jobs,
+    lease_seconds=float(os.environ.get('JOB_LEASE_SECONDS', '60')),
+    max_attempts=int(os.environ.get('JOB_MAX_ATTEMPTS', '3'))
+)
+job_processes = []
+job_workers = []
+
+# explain() actually runs each route query (the browse sort included), so the HTTP route is opt-in;
+# `python db_indexes.py explain` gives the same report from the command line
+QUERY_PLANS_ENDPOINT_ENABLED = os.environ.get('QUERY_PLANS_ENDPOINT_ENABLED', 'false').lower() == 'true'
+
+# Saved innovations listing
+SAVED_PAGE_SIZE = int(os.environ.get('SAVED_PAGE_SIZE', '20'))
+SAVED_MAX_PAGE_SIZE = 100
+
+# Summary fields shared by the saved listing and innovation search
+INNOVATION_SUMMARY_FIELDS = [
+    "id", "title", "description", "innovation_type", "difficulty", "estimated_cost",
+    "currency", "time_estimate", "sustainability_score", "reusability_score"
+]
+INNOVATION_SUMMARY_PROJECTION = {"_id": 0, **{field: 1 for field in INNOVATION_SUMMARY_FIELDS}}
+
+# Innovation search and browse (facets are computed on the first page only)
+SEARCH_PAGE_SIZE = int(os.environ.get('SEARCH_PAGE_SIZE', '20'))
+SEARCH_MAX_PAGE_SIZE = 100
+SEARCH_COST_BUCKETS = [0, 10, 25, 50, 100, 250, 500]
+
 # Innovation types mapping
 INNOVATION_TYPES = {
     "diy_tools": "DIY Tools",
@@ -49,14 +274,42 @@ class WasteInput(BaseModel):
     waste_name: Optional[str] = None
     waste_description: Optional[str] = None
     image_base64: Optional[str] = None
+    bypass_cache: bool = False
+
+class WasteAnalysis(BaseModel):
+    model_config = ConfigDict(extra="ignore")
+    
+    waste_type: str
+    components: List[str] = []
+    condition: str = ""
+    reusable_materials: List[str] = []
+    
+    @field_validator("components", "reusable_materials", mode="before")
+    @classmethod
+    def split_items(cls, value):
+        """Accept "a, b" strings and non-string items from the model"""
+        if value is None:
+            return []
+        if isinstance(value, str):
+            value = value.split(",")
+        return [str(item).strip() for item in value if str(item).strip()]
+    
+    @field_validator("waste_type", "condition", mode="before")
+    @classmethod
+    def flatten_text(cls, value):
+        if isinstance(value, (list, tuple)):
+            value = ", ".join(str(item) for item in value)
+        return " ".join(str(value or "").split())
 
 class InnovationRequest(BaseModel):
     waste_id: str
-    waste_description: str
+    # Resolved from waste_id on the server; only needed for ids it does not know
+    waste_description: Optional[str] = None
     innovation_types: List[str]
     budget: float
     currency: str = "USD"
     skill_level: str
+    bypass_cache: bool = False
 
 class Step(BaseModel):
     step_number: int
@@ -85,26 +338,61 @@ class Innovation(BaseModel):
     reusability_score: int
     potential_value: str
     safety_warnings: List[str]
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=bson_now)
 
 class SavedInnovation(BaseModel):
     model_config = ConfigDict(extra="ignore")
     
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
-    innovation: Innovation
+    innovation_id: str
     user_id: str = "default_user"
-    saved_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    saved_at: datetime = Field(default_factory=bson_now)
+
+async def run_image_job(func, *args) -> PreparedImage:
+    """Run a Pillow job in the image pool and record payload sizes"""
+    loop = asyncio.get_running_loop()
+    try:
+        with metrics.timer(image_prepare_latency, operation=func.__name__):
+            prepared = await loop.run_in_executor(
+                image_executor,
+                partial(func, *args, max_edge=IMAGE_MAX_EDGE, fmt=IMAGE_FORMAT, quality=IMAGE_QUALITY)
+            )
+    except InvalidImageError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid image: {str(e)}")
+    
+    images_prepared.inc()
+    source = "upload" if func is prepare_image_file else "json"
+    image_bytes_in.inc(prepared.bytes_in, source=source)
+    image_bytes_out.inc(prepared.bytes_out, source=source)
+    return prepared
+
+def render_analysis(analysis: WasteAnalysis) -> str:
+    """Compact canonical text for an analysis; this is what later prompts see"""
+    parts = [f"Type: {analysis.waste_type}"]
+    if analysis.components:
+        parts.append(f"Components: {', '.join(analysis.components)}")
+    if analysis.condition:
+        parts.append(f"Condition: {analysis.condition}")
+    if analysis.reusable_materials:
+        parts.append(f"Reusable: {', '.join(analysis.reusable_materials)}")
+    return "; ".join(parts)
+
+def summarize_analysis(response: str) -> dict:
+    """Typed analysis plus its compact rendering; unparseable responses keep their (trimmed) text"""
+    analysis = parse_model(response, WasteAnalysis, "analysis")
+    if analysis is None:
+        return {"waste_description": (response or "").strip(), "analysis": None}
+    return {"waste_description": render_analysis(analysis), "analysis": analysis.model_dump()}
+
+def compact_description(description: str) -> str:
+    """Compact rendering for descriptions stored before analyses were structured"""
+    analysis = parse_model(description, WasteAnalysis, "analysis") if "{" in description else None
+    return render_analysis(analysis) if analysis else description
 
 # AI Service Functions
 async def identify_waste_from_image(image_base64: str) -> dict:
     """Identify e-waste from image using AI"""
     try:
-        chat = LlmChat(
-            api_key=API_KEY,
-            session_id=str(uuid.uuid4()),
-            system_message="You are an expert in identifying electronic waste and recyclable materials. Analyze images and provide detailed descriptions of e-waste components."
-        ).with_model("openai", "gpt-5.2")
-        
         image_content = ImageContent(image_base64=image_base64)
         
         user_message = UserMessage(
@@ -114,17 +402,21 @@ async def identify_waste_from_image(image_base64: str) -> dict:
             3. Condition assessment
             4. Potential materials that can be reused
             
-            Format your response as JSON with keys: waste_type, components, condition, reusable_materials""",
+            Return only a JSON object with keys: waste_type (string), components (list of strings), condition (string), reusable_materials (list of strings)""",
             file_contents=[image_content]
         )
         
-        response = await chat.send_message(user_message)
+        response = await llm.send(
+            "You are an expert in identifying electronic waste and recyclable materials. Analyze images and provide detailed descriptions of e-waste components.",
+            user_message,
+            stage="analyze"
+        )
         
-        # Parse the AI response
-        return {
-            "waste_description": response,
-            "identified_from": "image"
-        }
+        return {**summarize_analysis(response), "identified_from": "image"}
+    except LLMOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except LLMTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logging.error(f"Error identifying waste from image: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to identify waste: {str(e)}")
@@ -132,12 +424,6 @@ async def identify_waste_from_image(image_base64: str) -> dict:
 async def classify_waste_from_text(waste_name: str, waste_description: str = "") -> dict:
     """Classify e-waste from text description"""
     try:
-        chat = LlmChat(
-            api_key=API_KEY,
-            session_id=str(uuid.uuid4()),
-            system_message="You are an expert in electronic waste classification. Provide detailed analysis of e-waste based on text descriptions."
-        ).with_model("openai", "gpt-5.2")
-        
         user_message = UserMessage(
             text=f"""Analyze this e-waste description:
             Name: {waste_name}
@@ -149,37 +435,38 @@ async def classify_waste_from_text(waste_name: str, waste_description: str = "")
             3. Typical condition/state
             4. Reusable materials and components
             
-            Format as JSON with keys: waste_type, components, condition, reusable_materials"""
+            Return only a JSON object with keys: waste_type (string), components (list of strings), condition (string), reusable_materials (list of strings)"""
         )
         
-        response = await chat.send_message(user_message)
+        response = await llm.send(
+            "You are an expert in electronic waste classification. Provide detailed analysis of e-waste based on text descriptions.",
+            user_message,
+            stage="analyze"
+        )
         
-        return {
-            "waste_description": response,
-            "identified_from": "text"
-        }
+        return {**summarize_analysis(response), "identified_from": "text"}
+    except LLMOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except LLMTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logging.error(f"Error classifying waste from text: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to classify waste: {str(e)}")
 
-async def generate_innovations(request: InnovationRequest) -> List[Innovation]:
-    """Generate innovation ideas using AI"""
-    try:
-        innovation_types_str = ", ".join([INNOVATION_TYPES.get(t, t) for t in request.innovation_types])
-        
-        chat = LlmChat(
-            api_key=API_KEY,
-            session_id=str(uuid.uuid4()),
-            system_message="You are an expert in upcycling and creating innovative projects from e-waste. You help people transform electronic waste into useful, creative, and sustainable projects."
-        ).with_model("openai", "gpt-5.2")
-        
-        user_message = UserMessage(
-            text=f"""Generate 3 innovative project ideas from this e-waste:
+INNOVATION_SYSTEM_MESSAGE = "You are an expert in upcycling and creating innovative projects from e-waste. You help people transform electronic waste into useful, creative, and sustainable projects."
+
+def innovation_types_label(request: InnovationRequest) -> str:
+    return ", ".join([INNOVATION_TYPES.get(t, t) for t in request.innovation_types])
+
+def innovation_prompt(request: InnovationRequest, count: int = IDEAS_PER_REQUEST, avoid: List[str] = ()) -> str:
+    """User prompt for idea generation; ``avoid`` lists titles the caller already has"""
+    avoid_line = f"\n            Avoid these existing ideas: {'; '.join(avoid)}" if avoid else ""
+    return f"""Generate {count} innovative project ideas from this e-waste:
             
             E-waste: {request.waste_description}
             Budget: {request.budget} {request.currency}
             Skill Level: {request.skill_level}
-            Innovation Types: {innovation_types_str}
+            Innovation Types: {innovation_types_label(request)}{avoid_line}
             
             For each idea, provide:
             1. Creative project title
@@ -195,7 +482,7 @@ async def generate_innovations(request: InnovationRequest) -> List[Innovation]:
             11. Potential value or utility description
             12. 2-3 important safety warnings
             
-            Return ONLY a valid JSON array with 3 objects. Each object must have all these fields:
+            Return ONLY a valid JSON array with {count} objects. Each object must have all these fields:
             [{{
                 "title": "...",
                 "description": "...",
@@ -212,73 +499,188 @@ async def generate_innovations(request: InnovationRequest) -> List[Innovation]:
             }}]
             
             Make ideas practical, creative, and achievable within the budget and skill level."""
-        )
-        
-        response = await chat.send_message(user_message)
-        
-        # Parse JSON response
-        import json
-        try:
-            # Try to extract JSON from response
-            response_text = response.strip()
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0]
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0]
+
+def default_idea(request: InnovationRequest) -> dict:
+    """Placeholder idea used when the model response cannot be parsed"""
+    innovation_types_str = innovation_types_label(request)
+    return {
+        "title": "Creative Upcycling Project",
+        "description": "Transform your e-waste into something useful",
+        "innovation_type": innovation_types_str.split(",")[0].strip() if innovation_types_str else "DIY Project",
+        "difficulty": request.skill_level,
+        "estimated_cost": request.budget * 0.7,
+        "materials_needed": ["E-waste components", "Basic tools", "Adhesive"],
+        "tools_required": ["Screwdriver", "Pliers", "Wire cutters"],
+        "time_estimate": "2-3 hours",
+        "sustainability_score": 75,
+        "reusability_score": 70,
+        "potential_value": "Functional and eco-friendly",
+        "safety_warnings": ["Handle sharp components carefully", "Work in ventilated area"]
+    }
+
+def idea_fields(idea: dict, request: InnovationRequest) -> dict:
+    """Model output plus server-side fields, ready for Innovation validation"""
+    fields = {
+        "title": "Unnamed Project",
+        "description": "",
+        "innovation_type": "",
+        "difficulty": request.skill_level,
+        "estimated_cost": 0,
+        "materials_needed": [],
+        "tools_required": [],
+        "time_estimate": "Unknown",
+        "sustainability_score": 70,
+        "reusability_score": 65,
+        "potential_value": "",
+        "safety_warnings": []
+    }
+    fields.update({k: v for k, v in idea.items() if v is not None and k not in ("id", "created_at")})
+    fields.update(waste_description=request.waste_description, currency=request.currency, steps=[])
+    return fields
+
+async def resolve_waste(request: InnovationRequest) -> InnovationRequest:
+    """Fill waste_description from the stored analysis for waste_id.
+    
+    The stored analysis wins; a client-supplied description is only used
+    when the id is unknown (e.g. the analysis has expired).
+    """
+    entry = await waste_lookup.get(request.waste_id)
+    if entry:
+        description = entry["waste_description"] if entry.get("analysis") else compact_description(entry["waste_description"])
+        return request.model_copy(update={"waste_description": description})
+    if request.waste_description:
+        return request
+    raise HTTPException(status_code=404, detail="Waste analysis not found")
+
+def build_innovation(idea: dict, request: InnovationRequest) -> Innovation:
+    """Turn one parsed idea object into an Innovation"""
+    return Innovation.model_validate(idea_fields(idea, request))
+
+async def generate_innovations(request: InnovationRequest, count: int = IDEAS_PER_REQUEST, avoid: List[str] = (),
+                               placeholder: bool = True) -> List[Innovation]:
+    """Generate innovation ideas using AI.
+    
+    An unparseable response yields the placeholder idea, or nothing when
+    ``placeholder`` is off.
+    """
+    try:
+        for attempt in range(LLM_PARSE_RETRIES + 1):
+            response = await llm.send(
+                INNOVATION_SYSTEM_MESSAGE,
+                UserMessage(text=innovation_prompt(request, count, avoid)),
+                stage="ideas"
+            )
             
-            ideas = json.loads(response_text)
-        except:
-            # If JSON parsing fails, create a default response
-            ideas = [{
-                "title": "Creative Upcycling Project",
-                "description": "Transform your e-waste into something useful",
-                "innovation_type": innovation_types_str.split(",")[0].strip() if innovation_types_str else "DIY Project",
-                "difficulty": request.skill_level,
-                "estimated_cost": request.budget * 0.7,
-                "materials_needed": ["E-waste components", "Basic tools", "Adhesive"],
-                "tools_required": ["Screwdriver", "Pliers", "Wire cutters"],
-                "time_estimate": "2-3 hours",
-                "sustainability_score": 75,
-                "reusability_score": 70,
-                "potential_value": "Functional and eco-friendly",
-                "safety_warnings": ["Handle sharp components carefully", "Work in ventilated area"]
-            }]
-        
-        innovations = []
-        for idea in ideas[:3]:  # Limit to 3 ideas
-            innovation = Innovation(
-                waste_description=request.waste_description,
-                title=idea.get("title", "Unnamed Project"),
-                description=idea.get("description", ""),
-                innovation_type=idea.get("innovation_type", ""),
-                difficulty=idea.get("difficulty", request.skill_level),
-                estimated_cost=float(idea.get("estimated_cost", 0)),
-                currency=request.currency,
-                materials_needed=idea.get("materials_needed", []),
-                tools_required=idea.get("tools_required", []),
-                time_estimate=idea.get("time_estimate", "Unknown"),
-                steps=[],  # Will be generated separately
-                sustainability_score=int(idea.get("sustainability_score", 70)),
-                reusability_score=int(idea.get("reusability_score", 65)),
-                potential_value=idea.get("potential_value", ""),
-                safety_warnings=idea.get("safety_warnings", [])
+            parsed = parse_model_list(
+                response, Innovation, "innovations",
+                prepare=lambda idea, _: idea_fields(idea, request),
+                limit=count
             )
-            innovations.append(innovation)
+            if not parsed.needs_retry:
+                break
+            logging.warning(f"Unparseable innovations response (attempt {attempt + 1}): {parsed.errors[:3]}")
+        
+        if parsed.needs_retry:
+            if not placeholder:
+                return []
+            llm_fallbacks.inc(kind="innovations")
+            return [build_innovation(default_idea(request), request)]
         
-        return innovations
+        return parsed.items
+    except LLMOverloadedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except LLMTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logging.error(f"Error generating innovations: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to generate innovations: {str(e)}")
 
+def cacheable_idea(innovation: Innovation) -> dict:
+    """Idea fields worth reusing; ids, waste, currency and steps are re-stamped per request"""
+    return innovation.model_dump(mode="json", exclude={"id", "created_at", "waste_description", "currency", "steps"})
+
+async def cached_innovations(request: InnovationRequest) -> List[Innovation]:
+    """Serve ideas from the idea cache, generating only what it cannot supply.
+    
+    A hit reuses IDEAS_PER_REQUEST - IDEA_CACHE_FRESH_IDEAS pooled ideas
+    that fit the budget and asks the LLM for the rest, which are then
+    pooled too. If that call is overloaded or times out, a hit with
+    enough pooled ideas is served from the cache alone.
+    """
+    if not IDEA_CACHE_ENABLED or request.bypass_cache:
+        return await generate_innovations(request)
+    
+    key = idea_cache.key(request.waste_description, request.innovation_types, request.skill_level,
+                         request.currency, request.budget)
+    candidates = await idea_cache.sample(key, IDEAS_PER_REQUEST, max_cost=request.budget)
+    reused = candidates[:IDEAS_PER_REQUEST - IDEA_CACHE_FRESH_IDEAS]
+    if len(reused) < IDEAS_PER_REQUEST - IDEA_CACHE_FRESH_IDEAS:
+        reused = []
+    
+    fresh = []
+    if len(reused) < IDEAS_PER_REQUEST:
+        try:
+            fresh = await generate_innovations(request, count=IDEAS_PER_REQUEST - len(reused),
+                                               avoid=[idea["title"] for idea in reused], placeholder=False)
+        except HTTPException as e:
+            if e.status_code not in (503, 504) or len(candidates) < IDEAS_PER_REQUEST:
+                raise
+            reused = candidates
+        await idea_cache.add(key, [cacheable_idea(innovation) for innovation in fresh])
+    
+    innovations = [build_innovation(idea, request) for idea in reused] + fresh
+    ideas_served.inc(len(reused), source="cached")
+    ideas_served.inc(len(fresh), source="generated")
+    if not innovations:
+        llm_fallbacks.inc(kind="innovations")
+        innovations = [build_innovation(default_idea(request), request)]
+    return innovations
+
+async def stream_innovation_text(request: InnovationRequest) -> AsyncIterator[str]:
+    """Yield the idea-generation response as text chunks.
+    
+    Backends without streaming support yield the whole response as one chunk.
+    """
+    async for chunk in llm.stream(INNOVATION_SYSTEM_MESSAGE, UserMessage(text=innovation_prompt(request)), stage="ideas"):
+        yield chunk
+
+async def stream_innovations(request: InnovationRequest) -> AsyncIterator[Innovation]:
+    """Yield each Innovation as soon as its JSON object closes in the model output"""
+    parser = JsonArrayStream()
+    emitted = 0
+    async for chunk in stream_innovation_text(request):
+        for idea in parser.feed(chunk):
+            if emitted >= IDEAS_PER_REQUEST:
+                return
+            try:
+                innovation = build_innovation(idea, request)
+            except (TypeError, ValueError) as e:
+                logging.error(f"Skipping malformed streamed idea: {str(e)}")
+                continue
+            emitted += 1
+            yield innovation
+    
+    if not emitted:
+        yield build_innovation(default_idea(request), request)
+
+DEFAULT_STEP = {
+    "title": "Prepare Materials",
+    "description": "Gather all required materials and tools",
+    "duration": "10 minutes",
+    "tools_required": ["All listed tools"],
+    "safety_note": "Ensure workspace is clean and organized"
+}
+
+def step_fields(step: dict, idx: int) -> dict:
+    """Model output plus defaults, ready for Step validation"""
+    fields = {"title": f"Step {idx}", "description": "", "duration": "Variable", "tools_required": []}
+    fields.update({k: v for k, v in step.items() if v is not None})
+    fields["step_number"] = idx
+    return fields
+
 async def generate_steps(innovation: Innovation) -> List[Step]:
     """Generate step-by-step instructions for an innovation"""
     try:
-        chat = LlmChat(
-            api_key=API_KEY,
-            session_id=str(uuid.uuid4()),
-            system_message="You are an expert instructor who creates clear, detailed step-by-step guides for DIY projects."
-        ).with_model("openai", "gpt-5.2")
-        
         user_message = UserMessage(
             text=f"""Create detailed step-by-step instructions for this project:
             
@@ -305,101 +707,468 @@ async def generate_steps(innovation: Innovation) -> List[Step]:
             }}]"""
         )
         
-        response = await chat.send_message(user_message)
-        
-        # Parse JSON response
-        import json
-        try:
-            response_text = response.strip()
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0]
-            elif "```" in response_text:
-                response_text = response_text.split("```")[1].split("```")[0]
-            
-            steps_data = json.loads(response_text)
-        except:
-            # Default steps if parsing fails
-            steps_data = [
-                {
-                    "title": "Prepare Materials",
-                    "description": "Gather all required materials and tools",
-                    "duration": "10 minutes",
-                    "tools_required": ["All listed tools"],
-                    "safety_note": "Ensure workspace is clean and organized"
-                }
-            ]
-        
-        steps = []
-        for idx, step_data in enumerate(steps_data, 1):
-            step = Step(
-                step_number=idx,
-                title=step_data.get("title", f"Step {idx}"),
-                description=step_data.get("description", ""),
-                duration=step_data.get("duration", "Variable"),
-                tools_required=step_data.get("tools_required", []),
-                safety_note=step_data.get("safety_note")
+        for attempt in range(LLM_PARSE_RETRIES + 1):
+            response = await llm.send(
+                "You are an expert instructor who creates clear, detailed step-by-step guides for DIY projects.",
+                user_message,
+                stage="steps"
             )
-            steps.append(step)
+            parsed = parse_model_list(response, Step, "steps", prepare=step_fields)
+            if not parsed.needs_retry:
+                break
+            logging.warning(f"Unparseable steps response (attempt {attempt + 1}): {parsed.errors[:3]}")
+        
+        if parsed.needs_retry:
+            llm_fallbacks.inc(kind="steps")
+            return [Step.model_validate(step_fields(DEFAULT_STEP, 1))]
+        
+        steps = parsed.items
+        for idx, step in enumerate(steps, 1):
+            step.step_number = idx
         
         return steps
     except Exception as e:
         logging.error(f"Error generating steps: {str(e)}")
         return []
 
+async def generate_and_store_steps(innovation: Innovation) -> List[dict]:
+    """Generate steps and write them to the innovation document; returns them as stored"""
+    steps = await generate_steps(innovation)
+    docs = [step.model_dump() for step in steps]
+    if docs:
+        # The update must not race the buffered insert of the document itself
+        await innovation_writes.wait_written([innovation.id])
+        result = await db.innovations.update_one(
+            {"id": innovation.id, "steps.0": {"$exists": False}},
+            {"$set": {"steps": docs}}
+        )
+        if result.matched_count == 0:
+            # Another writer stored steps first; serve and cache those, not ours
+            return await load_stored_steps(innovation.id) or docs
+    return docs
+
+async def load_stored_steps(innovation_id: str) -> Optional[List[dict]]:
+    """Steps already written by another worker, if any"""
+    doc = await db.innovations.find_one(
+        {"id": innovation_id, "steps.0": {"$exists": True}},
+        {"_id": 0, "steps": 1}
+    )
+    return doc["steps"] if doc else None
+
+def steps_key(innovation_id: str) -> str:
+    return f"steps:{innovation_id}"
+
+def schedule_steps(innovation: Innovation) -> asyncio.Task:
+    """Return the in-flight step generation for an innovation, starting one if needed"""
+    return coalescer.start(
+        steps_key(innovation.id),
+        lambda: generate_and_store_steps(innovation),
+        lambda: load_stored_steps(innovation.id)
+    )
+
+async def prefetch_steps(innovation: Innovation) -> None:
+    """Generate steps in the background once a prefetch slot is free.
+    
+    The step lease is only claimed after the slot, so while this waits it
+    holds nothing: a detail view in any process generates the steps itself,
+    and the prefetch then joins that run or finds the steps stored.
+    """
+    try:
+        async with step_prefetch_semaphore:
+            if await load_stored_steps(innovation.id) is None:
+                await asyncio.shield(schedule_steps(innovation))
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logging.error(f"Error prefetching steps: {str(e)}")
+
+def start_prefetch(innovation: Innovation) -> None:
+    task = asyncio.create_task(prefetch_steps(innovation))
+    step_prefetch_tasks.add(task)
+    task.add_done_callback(step_prefetch_tasks.discard)
+
 # API Endpoints
 @api_router.get("/")
 async def root():
     return {"message": "ReCircuit API - Transform E-waste into Innovation"}
 
+def waste_source_text(waste_input: WasteInput) -> str:
+    """Normalized text-analysis input, indexed for near-duplicate lookups"""
+    return normalize_text(f"{waste_input.waste_name} {waste_input.waste_description or ''}")
+
+def analysis_document(result: dict, content_hash: Optional[str] = None, image_hash: Optional[int] = None,
+                      source_text: Optional[str] = None) -> dict:
+    """Build the waste_cache document for a fresh analysis"""
+    doc = {
+        "id": str(uuid.uuid4()),
+        "description": result["waste_description"],
+        "identified_from": result["identified_from"],
+        "created_at": bson_now()
+    }
+    if result.get("analysis"):
+        doc["analysis"] = result["analysis"]
+    if content_hash:
+        doc["content_hash"] = content_hash
+    if source_text:
+        doc["source_text"] = source_text
+    if image_hash is not None:
+        doc.update(ImageAnalysisCache.document_fields(image_hash))
+    return doc
+
+def remember_analysis(doc: dict, result: dict, content_hash: Optional[str] = None, image_hash: Optional[int] = None) -> None:
+    """Prime the in-process caches once the document is stored"""
+    waste_lookup.remember(doc["id"], result)
+    if content_hash:
+        waste_analysis_cache.remember(content_hash, doc["id"], result)
+    if image_hash is not None:
+        image_analysis_cache.remember(image_hash, doc["id"], result)
+    if SIMILARITY_ENABLED and doc.get("source_text"):
+        similar_waste.add(doc["id"], doc["source_text"])
+
+async def similar_analysis(waste_input: WasteInput, content_hash: str) -> Optional[dict]:
+    """Reuse a stored analysis whose input reads like this one, priming the exact cache for next time"""
+    if not SIMILARITY_ENABLED:
+        return None
+    match = similar_waste.find(waste_source_text(waste_input))
+    if not match:
+        return None
+    # Invalidation unsets source_text; another worker may have invalidated an entry this index still holds
+    if not waste_writes.get(match[0]) and not await db.waste_cache.find_one(
+        {"id": match[0], "source_text": {"$exists": True}}, {"_id": 0, "id": 1}
+    ):
+        similar_waste.discard([match[0]])
+        return None
+    entry = await waste_lookup.get(match[0])
+    if not entry:
+        return None
+    waste_analysis_cache.remember(content_hash, entry["waste_id"], entry)
+    return {**entry, "cached": True, "similarity": round(match[1], 3)}
+
+async def store_analysis(result: dict, content_hash: Optional[str] = None, image_hash: Optional[int] = None,
+                         source_text: Optional[str] = None) -> str:
+    """Persist an analysis in waste_cache and prime the in-process caches"""
+    doc = analysis_document(result, content_hash, image_hash, source_text)
+    await waste_writes.put(doc)
+    remember_analysis(doc, result, content_hash, image_hash)
+    return doc["id"]
+
+async def analyze_prepared_image(prepared: PreparedImage, bypass_cache: bool = False) -> dict:
+    """Shared image path for JSON and multipart uploads"""
+    if not bypass_cache:
+        cached = await image_analysis_cache.find(prepared.image_hash)
+        if cached:
+            return {**cached, "cached": True}
+    
+    async def produce():
+        result = await identify_waste_from_image(prepared.image_base64)
+        waste_id = await store_analysis(result, image_hash=prepared.image_hash)
+        return {
+            "waste_id": waste_id,
+            "waste_description": result["waste_description"],
+            "analysis": result.get("analysis"),
+            "identified_from": result["identified_from"],
+            "cached": False
+        }
+    
+    async def fetch_existing():
+        cached = await image_analysis_cache.find(prepared.image_hash)
+        return {**cached, "cached": True} if cached else None
+    
+    return await coalescer.run(f"image:{hash_to_hex(prepared.image_hash)}", produce, fetch_existing)
+
 @api_router.post("/analyze-waste")
 async def analyze_waste(waste_input: WasteInput):
     """Analyze e-waste from image or text"""
     try:
         if waste_input.image_base64:
-            result = await identify_waste_from_image(waste_input.image_base64)
-        elif waste_input.waste_name:
+            prepared = await run_image_job(prepare_image, waste_input.image_base64)
+            return await analyze_prepared_image(prepared, waste_input.bypass_cache)
+        
+        if not waste_input.waste_name:
+            raise HTTPException(status_code=400, detail="Either image or waste name is required")
+        
+        content_hash = waste_text_key(waste_input.waste_name, waste_input.waste_description or "")
+        if waste_input.bypass_cache:
+            waste_analysis_cache.bypass()
+        else:
+            cached = await waste_analysis_cache.get(content_hash) or await similar_analysis(waste_input, content_hash)
+            if cached:
+                return {**cached, "cached": True}
+        
+        async def produce():
             result = await classify_waste_from_text(
                 waste_input.waste_name,
                 waste_input.waste_description or ""
             )
+            waste_id = await store_analysis(result, content_hash=content_hash, source_text=waste_source_text(waste_input))
+            return {
+                "waste_id": waste_id,
+                "waste_description": result["waste_description"],
+                "analysis": result.get("analysis"),
+                "identified_from": result["identified_from"],
+                "cached": False
+            }
+        
+        async def fetch_existing():
+            cached = await waste_analysis_cache.get(content_hash)
+            return {**cached, "cached": True} if cached else None
+        
+        # Identical requests already in flight share a single LLM call
+        return await coalescer.run(f"text:{content_hash}", produce, fetch_existing)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error in analyze_waste: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@api_router.post("/analyze-waste/upload")
+async def analyze_waste_upload(file: UploadFile = File(...), bypass_cache: bool = Form(False)):
+    """Analyze e-waste from a multipart image upload.
+    
+    Starlette spools the upload to a temporary file, and Pillow decodes
+    straight from it, so the raw image never exists as a base64 string.
+    """
+    try:
+        if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Image exceeds {MAX_UPLOAD_BYTES} bytes")
+        if file.content_type and not file.content_type.startswith("image/"):
+            raise HTTPException(status_code=415, detail="Upload must be an image")
+        
+        prepared = await run_image_job(prepare_image_file, file.file, file.size or 0)
+        return await analyze_prepared_image(prepared, bypass_cache)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error in analyze_waste_upload: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        await file.close()
+
+async def prepare_batch_item(waste_input: WasteInput):
+    """Return (dedupe key, prepared image or None) for one batch item"""
+    if waste_input.image_base64:
+        prepared = await run_image_job(prepare_image, waste_input.image_base64)
+        return f"image:{hash_to_hex(prepared.image_hash)}", prepared
+    if not waste_input.waste_name:
+        raise HTTPException(status_code=400, detail="Either image or waste name is required")
+    return f"text:{waste_text_key(waste_input.waste_name, waste_input.waste_description or '')}", None
+
+async def analyze_batch_item(waste_input: WasteInput, prepared: Optional[PreparedImage], semaphore: asyncio.Semaphore):
+    """Return (response, waste_cache document or None, result); new documents are not stored yet"""
+    if prepared is not None:
+        if not waste_input.bypass_cache:
+            cached = await image_analysis_cache.find(prepared.image_hash)
+            if cached:
+                return {**cached, "cached": True}, None, None
+        async with semaphore:
+            result = await identify_waste_from_image(prepared.image_base64)
+        doc = analysis_document(result, image_hash=prepared.image_hash)
+    else:
+        content_hash = waste_text_key(waste_input.waste_name, waste_input.waste_description or "")
+        if waste_input.bypass_cache:
+            waste_analysis_cache.bypass()
         else:
-            raise HTTPException(status_code=400, detail="Either image or waste name is required")
+            cached = await waste_analysis_cache.get(content_hash) or await similar_analysis(waste_input, content_hash)
+            if cached:
+                return {**cached, "cached": True}, None, None
+        async with semaphore:
+            result = await classify_waste_from_text(waste_input.waste_name, waste_input.waste_description or "")
+        doc = analysis_document(result, content_hash=content_hash, source_text=waste_source_text(waste_input))
+    response = {
+        "waste_id": doc["id"],
+        "waste_description": result["waste_description"],
+        "analysis": result.get("analysis"),
+        "identified_from": result["identified_from"],
+        "cached": False
+    }
+    return response, doc, result
+
+def batch_error(exc: BaseException) -> dict:
+    if isinstance(exc, HTTPException):
+        return {"status": "error", "status_code": exc.status_code, "detail": exc.detail}
+    logging.error(f"Error in analyze_waste_batch item: {str(exc)}")
+    return {"status": "error", "status_code": 500, "detail": str(exc)}
+
+@api_router.post("/analyze-waste/batch")
+async def analyze_waste_batch(items: List[WasteInput]):
+    """Analyze many e-waste items at once.
+    
+    Identical items are analyzed once, unique ones run concurrently under
+    BATCH_CONCURRENCY, and all new analyses are written with one
+    insert_many. Every item gets its own result; a failed item does not
+    fail the batch.
+    """
+    if not items:
+        raise HTTPException(status_code=400, detail="Batch is empty")
+    if len(items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {BATCH_MAX_ITEMS} items")
+    
+    try:
+        keyed = await asyncio.gather(*(prepare_batch_item(item) for item in items), return_exceptions=True)
         
-        waste_id = str(uuid.uuid4())
+        # First occurrence of each key does the work; later duplicates share its outcome
+        unique = {}
+        for index, entry in enumerate(keyed):
+            if not isinstance(entry, BaseException):
+                unique.setdefault(entry[0], index)
         
-        # Store in cache (optional)
-        await db.waste_cache.insert_one({
-            "id": waste_id,
-            "description": result["waste_description"],
-            "identified_from": result["identified_from"],
-            "created_at": datetime.now(timezone.utc).isoformat()
-        })
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+        outcomes = dict(zip(unique, await asyncio.gather(
+            *(analyze_batch_item(items[index], keyed[index][1], semaphore) for index in unique.values()),
+            return_exceptions=True
+        )))
         
+        fresh = [(key, outcome) for key, outcome in outcomes.items()
+                 if not isinstance(outcome, BaseException) and outcome[1] is not None]
+        if fresh:
+            failed = set()
+            try:
+                await db.waste_cache.insert_many([outcome[1] for _, outcome in fresh], ordered=False)
+            except BulkWriteError as e:
+                failed = {error["index"] for error in e.details.get("writeErrors", [])}
+                logging.error(f"Error in analyze_waste_batch insert: {len(failed)} documents not written")
+            except Exception as e:
+                failed = set(range(len(fresh)))
+                logging.error(f"Error in analyze_waste_batch insert: {str(e)}")
+            for position, (key, (response, doc, result)) in enumerate(fresh):
+                if position in failed:
+                    outcomes[key] = HTTPException(status_code=500, detail="Failed to store analysis")
+                    continue
+                content_hash = doc.get("content_hash")
+                image_hash = keyed[unique[key]][1].image_hash if key.startswith("image:") else None
+                remember_analysis(doc, result, content_hash, image_hash)
+        
+        results = []
+        for index, entry in enumerate(keyed):
+            outcome = entry if isinstance(entry, BaseException) else outcomes[entry[0]]
+            if isinstance(outcome, BaseException):
+                results.append({"index": index, **batch_error(outcome)})
+            else:
+                results.append({
+                    "index": index,
+                    "status": "ok",
+                    **outcome[0],
+                    "duplicate_of": None if unique[entry[0]] == index else unique[entry[0]]
+                })
+        
+        succeeded = sum(1 for r in results if r["status"] == "ok")
         return {
-            "waste_id": waste_id,
-            "waste_description": result["waste_description"],
-            "identified_from": result["identified_from"]
+            "results": results,
+            "total": len(items),
+            "unique": len(unique),
+            "succeeded": succeeded,
+            "failed": len(items) - succeeded
         }
     except HTTPException:
         raise
     except Exception as e:
-        logging.error(f"Error in analyze_waste: {str(e)}")
+        logging.error(f"Error in analyze_waste_batch: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@api_router.post("/generate-innovations")
+@api_router.get("/stats")
+async def get_stats():
+    """Cache hit/miss counters, image preprocessing totals and latency summaries"""
+    return {
+        "waste_analysis_cache": waste_analysis_cache.stats(),
+        "image_analysis_cache": image_analysis_cache.stats(),
+        "waste_lookup": waste_lookup.stats(),
+        "similarity_index": similar_waste.index.stats(),
+        "innovation_responses": innovation_responses.stats(),
+        "write_behind": {
+            "waste_cache": waste_writes.stats(),
+            "innovations": innovation_writes.stats()
+        },
+        "idea_cache": {
+            **idea_cache.stats(),
+            "ideas_cached": ideas_served.value(source="cached"),
+            "ideas_generated": ideas_served.value(source="generated")
+        },
+        "image_preprocessing": {
+            "images": images_prepared.value(),
+            "bytes_in": image_bytes_in.value(source="json") + image_bytes_in.value(source="upload"),
+            "bytes_out": image_bytes_out.value(source="json") + image_bytes_out.value(source="upload"),
+            "by_source": {
+                source: {"bytes_in": image_bytes_in.value(source=source), "bytes_out": image_bytes_out.value(source=source)}
+                for source in ("json", "upload")
+            }
+        },
+        "llm": llm.stats(),
+        "coalesced_keys_in_flight": len(coalescer),
+        "llm_parse": failure_rates(),
+        "jobs": await job_queue.counts(),
+        "metrics": metrics.snapshot()
+    }
+
+@api_router.post("/cache/invalidate")
+async def invalidate_cache(waste_input: WasteInput):
+    """Drop the cached text analysis for a waste name/description, including near-duplicate reuse of it"""
+    if not waste_input.waste_name:
+        raise HTTPException(status_code=400, detail="waste_name is required")
+    
+    content_hash = waste_text_key(waste_input.waste_name, waste_input.waste_description or "")
+    # A fresh analysis may still be in the insert buffer, where the unset would miss it
+    cached = waste_analysis_cache.memory.get(content_hash)
+    if cached:
+        await waste_writes.wait_written([cached["waste_id"]])
+    
+    waste_ids = await waste_analysis_cache.invalidate(content_hash)
+    if SIMILARITY_ENABLED:
+        similar_waste.discard(waste_ids)
+    return {"content_hash": content_hash, "invalidated": len(waste_ids)}
+
+@api_router.get("/admin/query-plans", include_in_schema=QUERY_PLANS_ENDPOINT_ENABLED)
+async def get_query_plans():
+    """explain() for each route query, to confirm index use (QUERY_PLANS_ENDPOINT_ENABLED only)"""
+    if not QUERY_PLANS_ENDPOINT_ENABLED:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return {"query_plans": await explain_queries(db)}
+
+async def store_innovation(innovation: Innovation) -> dict:
+    """Insert a new innovation and start warming up its step guide.
+    
+    Returns the stored document, which doubles as the response payload so
+    each innovation is dumped once.
+    """
+    doc = innovation.model_dump()
+    await innovation_writes.put(doc)
+    
+    # Warm up step guides so the first detail view does not wait on the LLM
+    if STEP_PREFETCH_ENABLED:
+        start_prefetch(innovation)
+    return doc
+
+async def generate_innovations_job(payload: dict) -> dict:
+    """Job handler: generate and store ideas for a queued InnovationRequest"""
+    try:
+        request = await resolve_waste(InnovationRequest.model_validate(payload))
+        innovations = await cached_innovations(request)
+    except HTTPException as e:
+        if e.status_code < 500:
+            raise PermanentJobError(e.detail)
+        raise
+    
+    # Store innovations in database; the job only completes once they are readable from any process
+    docs = [await store_innovation(innovation) for innovation in innovations]
+    await innovation_writes.wait_written([doc["id"] for doc in docs])
+    
+    return {"innovations": docs}
+
+JOB_HANDLERS = {
+    "generate_innovations": generate_innovations_job,
+}
+
+@api_router.post("/generate-innovations", status_code=202)
 async def create_innovations(request: InnovationRequest):
-    """Generate innovation ideas"""
+    """Queue innovation generation and return the job id right away"""
     try:
-        innovations = await generate_innovations(request)
-        
-        # Store innovations in database
-        for innovation in innovations:
-            doc = innovation.model_dump()
-            doc['created_at'] = doc['created_at'].isoformat()
-            await db.innovations.insert_one(doc)
-        
+        # Fail fast on unknown ids. The worker resolves again; the compact description rides along
+        # in case its process cannot see an analysis that is still in this process's write buffer
+        resolved = await resolve_waste(request)
+        job = await job_queue.enqueue("generate_innovations", resolved.model_dump())
         return {
-            "innovations": [innovation.model_dump() for innovation in innovations]
+            **public_job(job),
+            "status_url": f"/api/jobs/{job['id']}",
+            "events_url": f"/api/jobs/{job['id']}/events"
         }
     except HTTPException:
         raise
@@ -407,34 +1176,113 @@ async def create_innovations(request: InnovationRequest):
         logging.error(f"Error in create_innovations: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Poll a queued job; finished jobs carry their result or error"""
+    job = await job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return FastJSONResponse(public_job(job))
+
+def format_stream_event(event: str, data: dict, fmt: str) -> bytes:
+    if fmt == "ndjson":
+        return dumps({"event": event, "data": data}) + b"\n"
+    return b"event: " + event.encode("utf-8") + b"\ndata: " + dumps(data) + b"\n\n"
+
+@api_router.post("/generate-innovations/stream")
+async def stream_create_innovations(request: InnovationRequest, format: str = Query("sse", pattern="^(sse|ndjson)$")):
+    """Generate innovation ideas, persisting and emitting each one as soon as it is parsed"""
+    request = await resolve_waste(request)
+    
+    async def events():
+        count = 0
+        try:
+            async for innovation in stream_innovations(request):
+                doc = await store_innovation(innovation)
+                count += 1
+                yield format_stream_event("innovation", doc, format)
+            yield format_stream_event("done", {"count": count}, format)
+        except LLMOverloadedError as e:
+            yield format_stream_event("error", {"detail": str(e), "status_code": 503, "count": count}, format)
+        except LLMTimeoutError as e:
+            logging.error(f"Timeout in stream_create_innovations: {str(e)}")
+            yield format_stream_event("error", {"detail": str(e), "status_code": 504, "count": count}, format)
+        except Exception as e:
+            logging.error(f"Error in stream_create_innovations: {str(e)}")
+            yield format_stream_event("error", {"detail": str(e), "status_code": 500, "count": count}, format)
+    
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/event-stream"
+    return StreamingResponse(
+        events(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, format: str = Query("sse", pattern="^(sse|ndjson)$")):
+    """Emit a status event whenever a job changes state, ending with its result"""
+    if not await job_queue.get(job_id):
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def events():
+        last_state = None
+        while True:
+            job = await job_queue.get(job_id)
+            if job is None:
+                yield format_stream_event("error", {"detail": "Job not found"}, format)
+                return
+            state = (job["status"], job.get("attempts"))
+            if state != last_state:
+                last_state = state
+                yield format_stream_event("status", public_job(job), format)
+            if job["status"] in TERMINAL:
+                return
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+    
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/event-stream"
+    return StreamingResponse(
+        events(),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @api_router.get("/innovation/{innovation_id}")
-async def get_innovation_detail(innovation_id: str):
+async def get_innovation_detail(innovation_id: str, request: Request):
     """Get innovation with step-by-step guide"""
     try:
-        # Find innovation in database
-        innovation_doc = await db.innovations.find_one({"id": innovation_id}, {"_id": 0})
+        start = time.perf_counter()
         
-        if not innovation_doc:
-            raise HTTPException(status_code=404, detail="Innovation not found")
+        # Conditional and repeat fetches of a finished innovation never reach Mongo
+        cached = innovation_responses.cached(innovation_id, request.headers)
+        if cached is not None:
+            innovation_detail_latency.observe(time.perf_counter() - start, path="memory")
+            return cached
         
-        # Convert ISO string back to datetime
-        if isinstance(innovation_doc.get('created_at'), str):
-            innovation_doc['created_at'] = datetime.fromisoformat(innovation_doc['created_at'])
+        # Find innovation in database (a just-generated one may still be in the insert buffer)
+        innovation_doc = innovation_writes.get(innovation_id)
+        if innovation_doc is None:
+            innovation_doc = await db.innovations.find_one({"id": innovation_id}, {"_id": 0})
         
-        innovation = Innovation(**innovation_doc)
+        if not innovation_doc:
+            raise HTTPException(status_code=404, detail="Innovation not found")
         
-        # Generate steps if not already generated
-        if not innovation.steps:
-            steps = await generate_steps(innovation)
-            innovation.steps = steps
-            
-            # Update in database
-            await db.innovations.update_one(
-                {"id": innovation_id},
-                {"$set": {"steps": [step.model_dump() for step in steps]}}
-            )
+        # Generate steps if not already generated, joining a background run if one is in flight
+        if innovation_doc.get("steps"):
+            path = "warm"
+        else:
+            path = "inflight" if coalescer.in_flight(steps_key(innovation_id)) else "cold"
+            # We wrote this document, so skip validation; the model only feeds the steps prompt
+            innovation = Innovation.model_construct(**innovation_doc)
+            innovation_doc["steps"] = await asyncio.shield(schedule_steps(innovation))
         
-        return innovation.model_dump()
+        body = dumps(innovation_doc)
+        if innovation_doc["steps"]:
+            response = innovation_responses.store(innovation_id, body, request.headers)
+        else:
+            # Step generation failed; the next fetch retries it
+            response = innovation_responses.uncached(body, request.headers)
+        innovation_detail_latency.observe(time.perf_counter() - start, path=path)
+        return response
     except HTTPException:
         raise
     except Exception as e:
@@ -445,28 +1293,26 @@ async def get_innovation_detail(innovation_id: str):
 async def save_innovation(innovation_id: str, user_id: str = "default_user"):
     """Save innovation to user's collection"""
     try:
-        innovation_doc = await db.innovations.find_one({"id": innovation_id}, {"_id": 0})
-        
-        if not innovation_doc:
+        if not innovation_writes.get(innovation_id) and not await db.innovations.find_one({"id": innovation_id}, {"_id": 0, "id": 1}):
             raise HTTPException(status_code=404, detail="Innovation not found")
         
-        if isinstance(innovation_doc.get('created_at'), str):
-            innovation_doc['created_at'] = datetime.fromisoformat(innovation_doc['created_at'])
-        
-        innovation = Innovation(**innovation_doc)
-        
-        saved = SavedInnovation(
-            innovation=innovation,
-            user_id=user_id
-        )
-        
-        doc = saved.model_dump()
-        doc['saved_at'] = doc['saved_at'].isoformat()
-        doc['innovation']['created_at'] = doc['innovation']['created_at'].isoformat()
+        doc = SavedInnovation(innovation_id=innovation_id, user_id=user_id).model_dump()
         
-        await db.saved_innovations.insert_one(doc)
+        # Saving twice is a no-op: the (user_id, innovation_id) pair is unique
+        key = {"user_id": user_id, "innovation_id": innovation_id}
+        try:
+            stored = await db.saved_innovations.find_one_and_update(
+                key,
+                {"$setOnInsert": doc},
+                projection={"_id": 0, "id": 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # A concurrent save of the same pair won the upsert
+            stored = await db.saved_innovations.find_one(key, {"_id": 0, "id": 1})
         
-        return {"message": "Innovation saved successfully", "saved_id": saved.id}
+        return {"message": "Innovation saved successfully", "saved_id": stored["id"]}
     except HTTPException:
         raise
     except Exception as e:
@@ -474,19 +1320,242 @@ async def save_innovation(innovation_id: str, user_id: str = "default_user"):
         raise HTTPException(status_code=500, detail=str(e))
 
 @api_router.get("/saved-innovations")
-async def get_saved_innovations(user_id: str = "default_user"):
-    """Get user's saved innovations"""
+async def get_saved_innovations(
+    user_id: str = "default_user",
+    cursor: Optional[str] = None,
+    page_size: int = Query(SAVED_PAGE_SIZE, ge=1, le=SAVED_MAX_PAGE_SIZE),
+    expand: bool = False
+):
+    """Get user's saved innovations, newest first, one keyset page at a time"""
     try:
-        saved = await db.saved_innovations.find(
-            {"user_id": user_id},
-            {"_id": 0}
-        ).sort("saved_at", -1).to_list(100)
+        query = {"user_id": user_id}
+        if cursor:
+            try:
+                query.update(keyset_filter(["saved_at", "id"], decode_cursor(cursor, 2)))
+            except InvalidCursorError as e:
+                raise HTTPException(status_code=400, detail=str(e))
         
-        return {"saved_innovations": saved}
+        saved = await db.saved_innovations.find(query, {"_id": 0}).sort(
+            [("saved_at", -1), ("id", -1)]
+        ).limit(page_size + 1).to_list(page_size + 1)
+        
+        next_cursor = None
+        if len(saved) > page_size:
+            saved = saved[:page_size]
+            next_cursor = encode_cursor([saved[-1]["saved_at"], saved[-1]["id"]])
+        
+        # Join the referenced innovations with one batched $in read
+        projection = {"_id": 0} if expand else INNOVATION_SUMMARY_PROJECTION
+        innovation_ids = list({item["innovation_id"] for item in saved})
+        innovations = {
+            doc["id"]: doc
+            for doc in await db.innovations.find(
+                {"id": {"$in": innovation_ids}}, projection
+            ).to_list(len(innovation_ids))
+        }
+        
+        results = []
+        for item in saved:
+            innovation = innovations.get(item["innovation_id"])
+            if innovation is not None:
+                results.append({**item, "innovation": innovation})
+        
+        return FastJSONResponse({"saved_innovations": results, "next_cursor": next_cursor})
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error in get_saved_innovations: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@api_router.get("/saved-innovations/stats")
+async def get_saved_innovation_stats(user_id: str = "default_user"):
+    """Totals across all of a user's saved innovations, not just the loaded page"""
+    try:
+        innovation_ids = [
+            doc["innovation_id"]
+            async for doc in db.saved_innovations.find({"user_id": user_id}, {"_id": 0, "innovation_id": 1})
+        ]
+        stats = await db.innovations.aggregate([
+            {"$match": {"id": {"$in": innovation_ids}}},
+            {"$group": {
+                "_id": None,
+                "total": {"$sum": 1},
+                "avg_sustainability": {"$avg": "$sustainability_score"},
+                "avg_reusability": {"$avg": "$reusability_score"}
+            }}
+        ]).to_list(1) if innovation_ids else []
+        
+        if not stats:
+            return {"total": 0, "avg_sustainability": None, "avg_reusability": None}
+        return {
+            "total": stats[0]["total"],
+            "avg_sustainability": round(stats[0]["avg_sustainability"] or 0, 1),
+            "avg_reusability": round(stats[0]["avg_reusability"] or 0, 1)
+        }
+    except Exception as e:
+        logging.error(f"Error in get_saved_innovation_stats: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def search_filter(q: Optional[str], innovation_type: List[str], difficulty: List[str], min_cost: Optional[float],
+                  max_cost: Optional[float], min_sustainability: Optional[int], min_reusability: Optional[int]) -> dict:
+    """$match stage for /innovations/search; $text must lead so Mongo can use the text index"""
+    query = {}
+    if q:
+        query["$text"] = {"$search": q}
+    if innovation_type:
+        query["innovation_type"] = {"$in": innovation_type}
+    if difficulty:
+        query["difficulty"] = {"$in": difficulty}
+    cost = {}
+    if min_cost is not None:
+        cost["$gte"] = min_cost
+    if max_cost is not None:
+        cost["$lte"] = max_cost
+    if cost:
+        query["estimated_cost"] = cost
+    if min_sustainability is not None:
+        query["sustainability_score"] = {"$gte": min_sustainability}
+    if min_reusability is not None:
+        query["reusability_score"] = {"$gte": min_reusability}
+    return query
+
+def search_facets() -> dict:
+    """$facet branches for the counts shown next to search results"""
+    return {
+        "innovation_type": [{"$group": {"_id": "$innovation_type", "count": {"$sum": 1}}}, {"$sort": {"count": -1, "_id": 1}}],
+        "difficulty": [{"$group": {"_id": "$difficulty", "count": {"$sum": 1}}}, {"$sort": {"count": -1, "_id": 1}}],
+        "estimated_cost": [{"$bucket": {
+            "groupBy": "$estimated_cost",
+            "boundaries": SEARCH_COST_BUCKETS,
+            "default": SEARCH_COST_BUCKETS[-1],  # the open-ended top bucket
+            "output": {"count": {"$sum": 1}}
+        }}],
+        "total": [{"$count": "count"}]
+    }
+
+def format_facets(raw: dict) -> dict:
+    bounds = dict(zip(SEARCH_COST_BUCKETS, SEARCH_COST_BUCKETS[1:] + [None]))
+    return {
+        "innovation_type": [{"value": row["_id"], "count": row["count"]} for row in raw["innovation_type"]],
+        "difficulty": [{"value": row["_id"], "count": row["count"]} for row in raw["difficulty"]],
+        "estimated_cost": [
+            {"min": row["_id"], "max": bounds.get(row["_id"]), "count": row["count"]}
+            for row in raw["estimated_cost"]
+        ],
+        "total": raw["total"][0]["count"] if raw["total"] else 0
+    }
+
+@api_router.get("/innovations/search")
+async def search_innovations(
+    q: Optional[str] = Query(None, max_length=200),
+    innovation_type: List[str] = Query([]),
+    difficulty: List[str] = Query([]),
+    min_cost: Optional[float] = Query(None, ge=0),
+    max_cost: Optional[float] = Query(None, ge=0),
+    min_sustainability: Optional[int] = Query(None, ge=0, le=100),
+    min_reusability: Optional[int] = Query(None, ge=0, le=100),
+    cursor: Optional[str] = None,
+    page_size: int = Query(SEARCH_PAGE_SIZE, ge=1, le=SEARCH_MAX_PAGE_SIZE)
+):
+    """Search and browse stored innovations.
+    
+    Text queries rank by relevance, otherwise newest first; both page by
+    keyset cursor. The first page also carries facet counts over the
+    whole match, computed in the same aggregation as the results.
+    """
+    try:
+        q = (q or "").strip() or None
+        sort_field = "score" if q else "created_at"
+        
+        stages = [{"$match": search_filter(q, innovation_type, difficulty, min_cost, max_cost,
+                                           min_sustainability, min_reusability)}]
+        if q:
+            stages.append({"$addFields": {"score": {"$meta": "textScore"}}})
+        
+        page = []
+        if cursor:
+            try:
+                page.append({"$match": keyset_filter([sort_field, "id"], decode_cursor(cursor, 2))})
+            except InvalidCursorError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+        page.extend([
+            {"$sort": {sort_field: -1, "id": -1}},
+            {"$limit": page_size + 1},
+            {"$project": {**INNOVATION_SUMMARY_PROJECTION, **({"score": 1} if q else {"created_at": 1})}}
+        ])
+        
+        if cursor:
+            # Later pages skip the facets and stay on the index-backed sort
+            raw = {"results": await db.innovations.aggregate(stages + page).to_list(page_size + 1)}
+        else:
+            # One pass over the match yields the first page and every facet
+            rows = await db.innovations.aggregate(stages + [{"$facet": {"results": page, **search_facets()}}]).to_list(1)
+            raw = rows[0]
+        
+        results = raw["results"]
+        next_cursor = None
+        if len(results) > page_size:
+            results = results[:page_size]
+            next_cursor = encode_cursor([results[-1][sort_field], results[-1]["id"]])
+        
+        return FastJSONResponse({
+            "innovations": results,
+            "next_cursor": next_cursor,
+            "facets": None if cursor else format_facets(raw)
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error in search_innovations: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    cache_hit_ratio.set(waste_analysis_cache.stats()["hit_ratio"], cache="waste_text")
+    cache_hit_ratio.set(image_analysis_cache.stats()["hit_ratio"], cache="waste_image")
+    cache_hit_ratio.set(idea_cache.stats()["hit_ratio"], cache="ideas")
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+class UploadSizeLimit:
+    """Pure ASGI guard for upload routes.
+    
+    Oversized Content-Length is rejected before the body is read; otherwise
+    (e.g. chunked uploads) bytes are counted as they are received and the
+    read fails with 413 once the limit is passed, before Starlette spools
+    the rest to disk.
+    """
+    
+    def __init__(self, app, paths, max_bytes: int):
+        self.app = app
+        self.paths = frozenset(paths)
+        self.max_bytes = max_bytes
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        
+        detail = f"Image exceeds {self.max_bytes} bytes"
+        content_length = Headers(scope=scope).get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes:
+            await JSONResponse(status_code=413, content={"detail": detail})(scope, receive, send)
+            return
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside form parsing; FastAPI passes HTTPException through as the response
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+        
+        await self.app(scope, limited_receive, send)
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -498,6 +1567,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(UploadSizeLimit, paths=["/api/analyze-waste/upload"], max_bytes=MAX_UPLOAD_BYTES)
+
+# Added last so it is outermost and times the whole stack, streamed bodies included
+app.add_middleware(RequestMetricsMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -505,6 +1579,38 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def ensure_db_indexes():
+    if os.environ.get('ENSURE_INDEXES', 'true').lower() == 'true':
+        await ensure_indexes(db)
+
+@app.on_event("startup")
+async def load_similarity_index():
+    if SIMILARITY_ENABLED:
+        # Fills in the background; lookups simply miss until their neighbours are loaded
+        similarity_tasks.append(asyncio.create_task(similar_waste.follow(SIMILARITY_REFRESH_SECONDS)))
+
+@app.on_event("startup")
+async def start_job_workers():
+    if USE_MEMORY_DB:
+        # Worker processes cannot see an in-process database; run the worker loops here instead
+        worker = JobWorker(job_queue, JOB_HANDLERS, concurrency=JOB_WORKER_CONCURRENCY, poll_interval=JOB_POLL_INTERVAL)
+        job_workers.append((worker, asyncio.create_task(worker.run())))
+    elif JOB_WORKER_PROCESSES > 0:
+        from worker import start_processes
+        job_processes.extend(start_processes(JOB_WORKER_PROCESSES, JOB_WORKER_CONCURRENCY))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    coalescer.cancel_all()
+    for task in [*similarity_tasks, *step_prefetch_tasks]:
+        task.cancel()
+    for worker, _ in job_workers:
+        worker.stop()
+    # Workers finish their current jobs; anything cut short is reclaimed once its lease expires
+    for process in job_processes:
+        process.terminate()
+    await waste_writes.close()
+    await innovation_writes.close()
     client.close()
+    image_executor.shutdown(wait=False)
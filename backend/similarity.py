@@ -0,0 +1,295 @@
+"""In-process near-duplicate index over waste descriptions (MinHash + LSH on NumPy)"""
+import asyncio
+import logging
+import re
+import zlib
+from datetime import datetime, timedelta, timezone
+from time import perf_counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+import metrics
+
+similarity_lookups = metrics.counter(
+    "similarity_lookups_total",
+    "Near-duplicate waste description lookups by outcome",
+    ("outcome",),
+)
+similarity_latency = metrics.histogram(
+    "similarity_lookup_seconds",
+    "Time to sign a description and search the LSH index",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01),
+)
+
+_PRIME = np.uint64((1 << 31) - 1)
+# Odd 64-bit multipliers that mix a band's rows into one key
+_MIXERS = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0x27D4EB2F165667C5,
+                    0x85EBCA77C2B2AE63, 0xFF51AFD7ED558CCD, 0xC4CEB9FE1A85EC53, 0x94D049BB133111EB],
+                   dtype=np.uint64)
+
+# Common e-waste phrasings folded together so "dead dell notebook" reads like "broken dell laptop"
+SYNONYMS = {
+    "notebook": "laptop", "netbook": "laptop", "macbook": "laptop", "ultrabook": "laptop",
+    "cellphone": "phone", "smartphone": "phone", "mobile": "phone", "iphone": "phone", "handset": "phone",
+    "dead": "broken", "faulty": "broken", "damaged": "broken", "defective": "broken", "busted": "broken",
+    "cracked": "broken", "smashed": "broken", "nonworking": "broken",
+    "screen": "display", "monitor": "display", "lcd": "display", "led": "display",
+    "tv": "television", "telly": "television",
+    "pc": "computer", "desktop": "computer", "tower": "computer",
+    "charger": "adapter", "adaptor": "adapter", "psu": "power supply",
+    "cable": "wire", "cables": "wire", "wires": "wire", "cord": "wire", "cords": "wire",
+    "pcb": "circuit board", "motherboard": "circuit board", "mainboard": "circuit board",
+    "hdd": "hard drive", "harddrive": "hard drive",
+}
+STOPWORDS = frozenset(("a", "an", "the", "my", "our", "some", "of", "with", "and", "from", "for", "to", "in", "old",
+                       "none"))
+_WORDS = re.compile(r"[a-z0-9]+")
+
+
+def features(text: str) -> List[str]:
+    """Canonical word tokens plus their character trigrams; word order does not matter"""
+    words = []
+    for word in _WORDS.findall((text or "").lower()):
+        if word not in STOPWORDS:
+            words.extend(SYNONYMS.get(word, word).split())
+    out = set()
+    for word in words:
+        out.add(word)
+        padded = f" {word} "
+        out.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return list(out)
+
+
+class SimilarityIndex:
+    """MinHash signatures bucketed by LSH bands, answered without touching Mongo.
+
+    Each description gets ``num_perm`` min-hashes; ``bands`` groups of
+    rows are mixed into 64-bit keys. Every band keeps its keys sorted
+    (with the owning rows alongside) so a query is a handful of binary
+    searches. Recent additions sit in a small unsorted tail that is merged
+    in once it holds ``merge_every`` rows. Candidates are scored by the
+    share of matching signature rows, which estimates Jaccard similarity
+    of the feature sets; only the low 16 bits of each row are kept for
+    scoring, which keeps a few hundred thousand entries in tens of MB.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 8, threshold: float = 0.8, max_candidates: int = 256,
+                 merge_every: int = 4096, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+        self.merge_every = merge_every
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)[:, None]
+        self._b = rng.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)[:, None]
+
+        self.ids: List[str] = []
+        self._signatures = np.empty((1024, num_perm), dtype=np.uint16)
+        self._live = np.zeros(1024, dtype=bool)
+        self._keys = [np.empty(0, dtype=np.uint64) for _ in range(bands)]
+        self._order = [np.empty(0, dtype=np.int32) for _ in range(bands)]
+        self._tail_keys = np.empty((merge_every, bands), dtype=np.uint64)
+        self._tail_rows = np.empty(merge_every, dtype=np.int32)
+        self._tail = 0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def signatures(self, texts: Sequence[str]) -> np.ndarray:
+        """(n, num_perm) MinHash signatures, uint64 values below 2**31.
+
+        Feature hashes for all texts are permuted in one array and reduced
+        per text with ``minimum.reduceat``.
+        """
+        grams = [features(text) or [""] for text in texts]
+        counts = np.fromiter((len(g) for g in grams), dtype=np.int64, count=len(grams))
+        hashes = np.fromiter((zlib.crc32(f.encode("utf-8")) for g in grams for f in g), dtype=np.uint64,
+                             count=int(counts.sum()))
+        permuted = (self._a * hashes + self._b) % _PRIME
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        return np.minimum.reduceat(permuted, starts, axis=1).T
+
+    def band_keys(self, signatures: np.ndarray) -> np.ndarray:
+        """(n, bands) keys for (n, num_perm) signatures"""
+        grouped = signatures.reshape(len(signatures), self.bands, self.rows)
+        mixers = np.resize(_MIXERS, self.rows)
+        return (grouped * mixers).sum(axis=2, dtype=np.uint64)
+
+    def add_many(self, ids: Sequence[str], texts: Sequence[str]) -> None:
+        if ids:
+            self.add_signed(ids, self.signatures(texts))
+
+    def add_signed(self, ids: Sequence[str], full: np.ndarray) -> None:
+        """Add rows whose signatures were computed already (e.g. off the event loop)"""
+        if not ids:
+            return
+        keys = self.band_keys(full)
+        start = len(self.ids)
+        rows = np.arange(start, start + len(ids), dtype=np.int32)
+
+        needed = start + len(ids)
+        if needed > len(self._signatures):
+            grown = np.empty((max(needed, 2 * len(self._signatures)), self.num_perm), dtype=np.uint16)
+            grown[:start] = self._signatures[:start]
+            self._signatures = grown
+            self._live = np.concatenate([self._live[:start], np.zeros(len(grown) - start, dtype=bool)])
+        self._signatures[start:needed] = full.astype(np.uint16)
+        self._live[start:needed] = True
+        self.ids.extend(ids)
+
+        if self._tail + len(ids) <= self.merge_every:
+            self._tail_keys[self._tail:self._tail + len(ids)] = keys
+            self._tail_rows[self._tail:self._tail + len(ids)] = rows
+            self._tail += len(ids)
+            if self._tail == self.merge_every:
+                self._merge(self._tail_keys, self._tail_rows)
+                self._tail = 0
+        else:
+            self._merge(np.concatenate([self._tail_keys[:self._tail], keys]),
+                        np.concatenate([self._tail_rows[:self._tail], rows]))
+            self._tail = 0
+
+    def add(self, item_id: str, text: str) -> None:
+        self.add_many([item_id], [text])
+
+    def discard(self, ids: Iterable[str]) -> int:
+        """Tombstone entries so queries no longer return them; returns how many rows were dropped"""
+        dropped = set(ids)
+        rows = [row for row, item_id in enumerate(self.ids) if item_id in dropped and self._live[row]]
+        self._live[rows] = False
+        return len(rows)
+
+    def _merge(self, keys: np.ndarray, rows: np.ndarray) -> None:
+        for band in range(self.bands):
+            column = keys[:, band]
+            order = np.argsort(column, kind="stable")
+            column = column[order]
+            positions = np.searchsorted(self._keys[band], column)
+            self._keys[band] = np.insert(self._keys[band], positions, column)
+            self._order[band] = np.insert(self._order[band], positions, rows[order])
+
+    def query(self, text: str) -> Optional[Tuple[str, float]]:
+        """(id, estimated similarity) of the closest entry at or above threshold"""
+        started = perf_counter()
+        match = self._search(text)
+        similarity_latency.observe(perf_counter() - started)
+        similarity_lookups.inc(outcome="hit" if match else "miss")
+        return match
+
+    def _search(self, text: str) -> Optional[Tuple[str, float]]:
+        if not self.ids:
+            return None
+        full = self.signatures([text])[0]
+        query_keys = self.band_keys(full[None, :])[0]
+        candidates = []
+        for band in range(self.bands):
+            keys = self._keys[band]
+            low = np.searchsorted(keys, query_keys[band], side="left")
+            high = np.searchsorted(keys, query_keys[band], side="right")
+            if high > low:
+                candidates.append(self._order[band][low:min(high, low + self.max_candidates)])
+        if self._tail:
+            hits = (self._tail_keys[:self._tail] == query_keys).any(axis=1)
+            candidates.append(self._tail_rows[:self._tail][hits])
+        if not candidates:
+            return None
+        rows = np.unique(np.concatenate(candidates))
+        rows = rows[self._live[rows]]
+        if not len(rows):
+            return None
+        scores = (self._signatures[rows] == full.astype(np.uint16)).mean(axis=1)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None
+        return self.ids[rows[best]], float(scores[best])
+
+    def stats(self) -> dict:
+        lookups = similarity_lookups.value(outcome="hit") + similarity_lookups.value(outcome="miss")
+        return {
+            "entries": len(self.ids),
+            "discarded": len(self.ids) - int(self._live[:len(self.ids)].sum()),
+            "hits": similarity_lookups.value(outcome="hit"),
+            "misses": similarity_lookups.value(outcome="miss"),
+            "hit_ratio": similarity_lookups.value(outcome="hit") / lookups if lookups else 0.0,
+            "signature_bytes": len(self.ids) * self.num_perm * 2,
+        }
+
+
+class WasteSimilarity:
+    """Keeps a SimilarityIndex in step with the ``source_text`` of waste_cache documents.
+
+    ``load`` pages through documents newer than the last one seen and signs
+    each page on a thread, so startup serves requests while the index
+    fills and later calls only pick up what other processes wrote.
+
+    Inserts go through a write-behind buffer, so a document can become
+    visible after newer ones. Each load therefore re-reads the last
+    ``rescan`` seconds before the watermark and skips ids already indexed
+    in that window; ``rescan`` must exceed the longest buffered delay
+    (flush interval plus retries) and any clock skew between processes.
+    """
+
+    def __init__(self, collection, index: SimilarityIndex, max_age: float = 7 * 24 * 3600, page_size: int = 5000,
+                 rescan: float = 300):
+        self.collection = collection
+        self.index = index
+        self.page_size = page_size
+        self.rescan = timedelta(seconds=rescan)
+        self.watermark = datetime.now(timezone.utc) - timedelta(seconds=max_age)
+        # Ids indexed inside the rescan window, with the time that keeps them there
+        self._recent: Dict[str, datetime] = {}
+
+    def add(self, waste_id: str, source_text: str) -> None:
+        self.index.add(waste_id, source_text)
+        # Added after the document was created, so this outlives its created_at in the window
+        self._recent[waste_id] = datetime.now(timezone.utc)
+
+    def discard(self, waste_ids: Iterable[str]) -> int:
+        return self.index.discard(waste_ids)
+
+    def find(self, source_text: str) -> Optional[Tuple[str, float]]:
+        return self.index.query(source_text)
+
+    async def load(self) -> int:
+        """Index documents created since the rescan window before the watermark; returns how many were added"""
+        loaded = 0
+        ids, texts = [], []
+        cursor = self.collection.find(
+            {"source_text": {"$exists": True}, "created_at": {"$gt": self.watermark - self.rescan}},
+            {"_id": 0, "id": 1, "source_text": 1, "created_at": 1},
+        ).sort("created_at", 1).batch_size(self.page_size)
+        async for doc in cursor:
+            self.watermark = max(self.watermark, doc["created_at"])
+            if doc["id"] in self._recent:
+                continue
+            self._recent[doc["id"]] = doc["created_at"]
+            ids.append(doc["id"])
+            texts.append(doc["source_text"])
+            if len(ids) >= self.page_size:
+                loaded += await self._add_page(ids, texts)
+                ids, texts = [], []
+        if ids:
+            loaded += await self._add_page(ids, texts)
+        cutoff = self.watermark - self.rescan
+        self._recent = {waste_id: seen for waste_id, seen in self._recent.items() if seen > cutoff}
+        return loaded
+
+    async def _add_page(self, ids: List[str], texts: List[str]) -> int:
+        self.index.add_signed(ids, await asyncio.to_thread(self.index.signatures, texts))
+        return len(ids)
+
+    async def follow(self, interval: float) -> None:
+        """Load, then keep loading every interval seconds until cancelled"""
+        while True:
+            try:
+                added = await self.load()
+                if added:
+                    logging.info(f"Similarity index loaded {added} descriptions ({len(self.index)} total)")
+            except Exception as e:
+                logging.error(f"Error loading similarity index: {str(e)}")
+            await asyncio.sleep(interval)
@@ -0,0 +1,70 @@
+"""Worker processes for queued jobs (see jobs.py).
+
+The API process starts JOB_WORKER_PROCESSES of these itself; set it to 0
+and run them separately to scale LLM capacity independently of web
+workers:
+
+    python worker.py --processes 4 --concurrency 8
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import signal
+from typing import List
+
+
+async def serve(concurrency: int) -> None:
+    # Imported here so the parent never pays for it and spawned children get their own clients
+    import server
+    from jobs import JobWorker
+
+    worker = JobWorker(server.job_queue, server.JOB_HANDLERS, concurrency=concurrency,
+                       poll_interval=server.JOB_POLL_INTERVAL)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, worker.stop)
+    logging.info(f"Job worker {worker.worker_id} started ({concurrency} slots)")
+    try:
+        await worker.run()
+    finally:
+        server.coalescer.cancel_all()
+        await server.waste_writes.close()
+        await server.innovation_writes.close()
+        server.client.close()
+
+
+def run_process(concurrency: int) -> None:
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    asyncio.run(serve(concurrency))
+
+
+def start_processes(count: int, concurrency: int) -> List[multiprocessing.Process]:
+    """Spawn worker processes; they stop after their current jobs on SIGTERM"""
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    for index in range(count):
+        process = context.Process(target=run_process, args=(concurrency,), name=f"job-worker-{index}", daemon=True)
+        process.start()
+        processes.append(process)
+    return processes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=int(os.environ.get('JOB_WORKER_PROCESSES', '1')) or 1)
+    parser.add_argument("--concurrency", type=int, default=int(os.environ.get('JOB_WORKER_CONCURRENCY', '4')))
+    args = parser.parse_args()
+
+    processes = start_processes(args.processes, args.concurrency)
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""Write-behind buffer that batches inserts off the request path"""
+import asyncio
+import logging
+from time import perf_counter
+from typing import Dict, Iterable, List, Optional
+
+from pymongo.errors import BulkWriteError
+
+import metrics
+
+DUPLICATE_KEY = 11000
+
+write_behind_docs = metrics.counter(
+    "write_behind_documents_total",
+    "Buffered inserts by collection and outcome (queued, written, duplicate, failed)",
+    ("collection", "outcome"),
+)
+write_behind_pending = metrics.gauge(
+    "write_behind_pending",
+    "Documents accepted but not yet written, by collection",
+    ("collection",),
+)
+write_behind_flush_latency = metrics.histogram(
+    "write_behind_flush_seconds",
+    "insert_many latency per flushed batch by collection and outcome",
+    ("collection", "outcome"),
+)
+write_behind_waits = metrics.counter(
+    "write_behind_backpressure_total",
+    "Inserts that waited because the buffer was full, by collection",
+    ("collection",),
+)
+
+
+class WriteBehindBuffer:
+    """Accepts documents immediately and writes them with insert_many.
+
+    A batch goes out once ``max_batch`` documents are queued or
+    ``flush_interval`` seconds after the first one arrived. At most
+    ``max_pending`` documents may be unwritten; further ``put`` calls wait
+    (backpressure) instead of growing memory while Mongo is slow or down.
+    Failed batches are retried with backoff; duplicates and other
+    per-document write errors are not. Until a document is written,
+    ``get`` returns it by ``id`` so the process that accepted it can read
+    its own writes.
+
+    The flush loop starts on the first ``put``; call ``close`` on shutdown
+    to drain it. Documents still buffered when a process dies are lost.
+    """
+
+    def __init__(self, collection, max_batch: int = 100, flush_interval: float = 0.05, max_pending: int = 5000,
+                 retry_backoff: float = 0.1, max_backoff: float = 5.0):
+        self.collection = collection
+        self.name = collection.name
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self._pending: Dict[str, dict] = {}
+        self._written: Dict[str, asyncio.Future] = {}
+        self._queue: List[dict] = []
+        self._ready = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._space = asyncio.Event()
+        self._closing = False
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def put(self, doc: dict) -> None:
+        """Queue doc for insertion; the caller's dict is left as is (insert_many adds _id to its copy)"""
+        doc = dict(doc)
+        if self._closing:
+            # Shutdown already drained the buffer; write through
+            await self.collection.insert_one(doc)
+            return
+        if len(self._pending) >= self.max_pending:
+            write_behind_waits.inc(collection=self.name)
+            while len(self._pending) >= self.max_pending:
+                self._space.clear()
+                await self._space.wait()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+        self._pending[doc["id"]] = doc
+        self._written[doc["id"]] = asyncio.get_running_loop().create_future()
+        self._queue.append(doc)
+        write_behind_docs.inc(collection=self.name, outcome="queued")
+        write_behind_pending.set(len(self._pending), collection=self.name)
+        self._ready.set()
+        if len(self._queue) >= self.max_batch:
+            self._batch_full.set()
+
+    def get(self, doc_id: str) -> Optional[dict]:
+        """A copy of an accepted but unwritten document, as find_one would return it"""
+        doc = self._pending.get(doc_id)
+        return {k: v for k, v in doc.items() if k != "_id"} if doc is not None else None
+
+    async def wait_written(self, doc_ids: Iterable[str]) -> None:
+        """Wait until these documents are in Mongo (or were given up on)"""
+        futures = [self._written[doc_id] for doc_id in doc_ids if doc_id in self._written]
+        if futures:
+            await asyncio.gather(*(asyncio.shield(future) for future in futures))
+
+    async def close(self) -> None:
+        """Flush everything still buffered and stop the loop"""
+        self._closing = True
+        self._ready.set()
+        self._batch_full.set()
+        if self._task is not None:
+            await self._task
+
+    async def _run(self) -> None:
+        failures = 0
+        while True:
+            await self._ready.wait()
+            if len(self._queue) < self.max_batch and not self._closing:
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            if self._queue:
+                if await self._flush(self._queue[:self.max_batch]):
+                    failures = 0
+                else:
+                    failures += 1
+                    if self._closing and failures > 3:
+                        logging.error(f"Dropping {len(self._queue)} unwritten {self.name} documents at shutdown")
+                        self._finish(self._queue, "failed")
+                        self._queue.clear()
+                    else:
+                        await asyncio.sleep(min(self.retry_backoff * 2 ** failures, self.max_backoff))
+            if len(self._queue) < self.max_batch:
+                self._batch_full.clear()
+            if not self._queue:
+                self._ready.clear()
+                if self._closing:
+                    return
+
+    async def _flush(self, batch: List[dict]) -> bool:
+        """Write one batch; False means nothing was written and it should be retried"""
+        started = perf_counter()
+        failed = set()
+        duplicates = set()
+        try:
+            await self.collection.insert_many(batch, ordered=False)
+            outcome = "ok"
+        except BulkWriteError as e:
+            outcome = "partial"
+            for error in e.details.get("writeErrors", []):
+                if error.get("code") == DUPLICATE_KEY:
+                    duplicates.add(error["index"])
+                else:
+                    failed.add(error["index"])
+                    logging.error(f"Error writing buffered {self.name} document: {error.get('errmsg')}")
+        except Exception as e:
+            write_behind_flush_latency.observe(perf_counter() - started, collection=self.name, outcome="error")
+            logging.error(f"Error flushing {len(batch)} buffered {self.name} documents: {str(e)}")
+            return False
+        write_behind_flush_latency.observe(perf_counter() - started, collection=self.name, outcome=outcome)
+
+        del self._queue[:len(batch)]
+        self._finish([doc for i, doc in enumerate(batch) if i not in failed and i not in duplicates], "written")
+        self._finish([batch[i] for i in duplicates], "duplicate")
+        self._finish([batch[i] for i in failed], "failed")
+        return True
+
+    def _finish(self, docs: List[dict], outcome: str) -> None:
+        for doc in docs:
+            self._pending.pop(doc["id"], None)
+            future = self._written.pop(doc["id"], None)
+            if future is not None and not future.done():
+                future.set_result(outcome != "failed")
+        if docs:
+            write_behind_docs.inc(len(docs), collection=self.name, outcome=outcome)
+        write_behind_pending.set(len(self._pending), collection=self.name)
+        self._space.set()
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "queued": write_behind_docs.value(collection=self.name, outcome="queued"),
+            "written": write_behind_docs.value(collection=self.name, outcome="written"),
+            "duplicates": write_behind_docs.value(collection=self.name, outcome="duplicate"),
+            "failed": write_behind_docs.value(collection=self.name, outcome="failed"),
+            "backpressure_waits": write_behind_waits.value(collection=self.name),
+        }
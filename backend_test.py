@@ -2,6 +2,7 @@ import requests
 import sys
 import json
 import base64
+import time
 from datetime import datetime
 from io import BytesIO
 from PIL import Image
@@ -140,13 +141,40 @@ class EWasteAPITester:
             "currency": "USD",
             "skill_level": "Beginner"
         }
-        return self.run_test(
+        success, response = self.run_test(
             "Generate Innovations",
             "POST",
             "generate-innovations",
-            200,
+            202,
             data
         )
+        if not success or 'job_id' not in response:
+            return False, {}
+        return self.wait_for_job(response['job_id'])
+
+    def wait_for_job(self, job_id, timeout=120, interval=2):
+        """Poll a background job until it finishes; returns its result"""
+        print(f"   Waiting for job {job_id}...")
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                response = requests.get(f"{self.api_url}/jobs/{job_id}", timeout=30)
+                job = response.json()
+            except Exception as e:
+                self.log_test("Innovation Job", False, f"Exception: {str(e)}")
+                return False, {}
+            if response.status_code != 200:
+                self.log_test("Innovation Job", False, f"Status: {response.status_code}")
+                return False, {}
+            if job.get('status') == 'succeeded':
+                self.log_test("Innovation Job", True, f"Attempts: {job.get('attempts')}")
+                return True, job.get('result') or {}
+            if job.get('status') == 'failed':
+                self.log_test("Innovation Job", False, f"Error: {job.get('error')}")
+                return False, {}
+            time.sleep(interval)
+        self.log_test("Innovation Job", False, f"Job not finished after {timeout}s")
+        return False, {}
 
     def test_get_innovation_detail(self, innovation_id):
         """Test getting innovation details"""
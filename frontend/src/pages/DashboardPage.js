@@ -12,15 +12,33 @@ const DashboardPage = () => {
   const navigate = useNavigate();
   const [savedInnovations, setSavedInnovations] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [stats, setStats] = useState(null);
 
   useEffect(() => {
     fetchSavedInnovations();
+    fetchStats();
   }, []);
 
-  const fetchSavedInnovations = async () => {
+  // Totals cover every saved project, not just the pages loaded so far
+  const fetchStats = async () => {
     try {
-      const response = await axios.get(`${API}/saved-innovations`);
-      setSavedInnovations(response.data.saved_innovations || []);
+      const response = await axios.get(`${API}/saved-innovations/stats`);
+      setStats(response.data);
+    } catch (error) {
+      console.error("Error fetching saved innovation stats:", error);
+    }
+  };
+
+  const fetchSavedInnovations = async (cursor = null) => {
+    try {
+      const response = await axios.get(`${API}/saved-innovations`, {
+        params: cursor ? { cursor } : {},
+      });
+      const page = response.data.saved_innovations || [];
+      setSavedInnovations((prev) => (cursor ? [...prev, ...page] : page));
+      setNextCursor(response.data.next_cursor || null);
     } catch (error) {
       console.error("Error fetching saved innovations:", error);
       toast.error("Failed to load saved innovations");
@@ -29,6 +47,12 @@ const DashboardPage = () => {
     }
   };
 
+  const loadMore = async () => {
+    setLoadingMore(true);
+    await fetchSavedInnovations(nextCursor);
+    setLoadingMore(false);
+  };
+
   const getDifficultyColor = (difficulty) => {
     switch (difficulty?.toLowerCase()) {
       case "beginner":
@@ -189,8 +213,23 @@ const DashboardPage = () => {
           </div>
         )}
 
+        {/* Load More */}
+        {nextCursor && (
+          <div className="mt-8 flex justify-center">
+            <button
+              data-testid="load-more-saved-btn"
+              onClick={loadMore}
+              disabled={loadingMore}
+              className="bg-white border border-gray-200 text-primary hover:border-accent rounded-full px-6 py-3 font-medium transition-all flex items-center gap-2 disabled:opacity-60"
+            >
+              {loadingMore && <Loader2 className="w-4 h-4 animate-spin" />}
+              Load More
+            </button>
+          </div>
+        )}
+
         {/* Stats Section (if there are saved innovations) */}
-        {savedInnovations.length > 0 && (
+        {stats && stats.total > 0 && (
           <motion.div
             initial={{ opacity: 0, y: 20 }}
             animate={{ opacity: 1, y: 0 }}
@@ -202,30 +241,20 @@ const DashboardPage = () => {
             <div className="grid grid-cols-1 md:grid-cols-3 gap-6">
               <div className="text-center">
                 <div className="text-4xl font-bold text-accent mb-2">
-                  {savedInnovations.length}
+                  {stats.total}
                 </div>
                 <div className="text-gray-600">Saved Projects</div>
               </div>
               <div className="text-center">
                 <div className="text-4xl font-bold text-primary mb-2">
-                  {Math.round(
-                    savedInnovations.reduce(
-                      (sum, s) => sum + (s.innovation.sustainability_score || 0),
-                      0
-                    ) / savedInnovations.length
-                  )}
+                  {Math.round(stats.avg_sustainability)}
                   %
                 </div>
                 <div className="text-gray-600">Avg. Sustainability</div>
               </div>
               <div className="text-center">
                 <div className="text-4xl font-bold text-primary mb-2">
-                  {Math.round(
-                    savedInnovations.reduce(
-                      (sum, s) => sum + (s.innovation.reusability_score || 0),
-                      0
-                    ) / savedInnovations.length
-                  )}
+                  {Math.round(stats.avg_reusability)}
                   %
                 </div>
                 <div className="text-gray-600">Avg. Reusability</div>
@@ -7,6 +7,10 @@ import axios from "axios";
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+const JOB_POLL_INTERVAL_MS = 1000;
+// A job whose worker died is only retried after its lease expires; give up well after that
+const JOB_TIMEOUT_MS = 3 * 60 * 1000;
+
 const INNOVATION_TYPES = [
   { id: "diy_tools", label: "DIY Tools" },
   { id: "electronics", label: "Electronics Projects" },
@@ -100,6 +104,20 @@ const GeneratorPage = () => {
     }
   };
 
+  const waitForJob = async (jobId) => {
+    // Generation runs in a background job; poll until it finishes or the deadline passes
+    const deadline = Date.now() + JOB_TIMEOUT_MS;
+    while (Date.now() < deadline) {
+      const { data: job } = await axios.get(`${API}/jobs/${jobId}`);
+      if (job.status === "succeeded") return job.result.innovations;
+      if (job.status === "failed") {
+        throw new Error(job.error || "Failed to generate innovations");
+      }
+      await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    }
+    throw new Error("Generating innovations is taking too long. Please try again.");
+  };
+
   const generateInnovations = async (wasteData) => {
     try {
       setAnalyzing(false);
@@ -107,14 +125,13 @@ const GeneratorPage = () => {
       // Step 2: Generate innovations
       const innovationResponse = await axios.post(`${API}/generate-innovations`, {
         waste_id: wasteData.waste_id,
-        waste_description: wasteData.waste_description,
         innovation_types: selectedTypes,
         budget: budget,
         currency: currency,
         skill_level: skillLevel,
       });
 
-      const innovations = innovationResponse.data.innovations;
+      const innovations = await waitForJob(innovationResponse.data.job_id);
 
       // Navigate to results
       navigate("/results", {
@@ -128,7 +145,7 @@ const GeneratorPage = () => {
       });
     } catch (error) {
       console.error("Error generating innovations:", error);
-      toast.error(error.response?.data?.detail || "Failed to generate innovations");
+      toast.error(error.response?.data?.detail || error.message || "Failed to generate innovations");
     } finally {
       setLoading(false);
       setAnalyzing(false);
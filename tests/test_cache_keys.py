@@ -0,0 +1,24 @@
+import pytest
+
+from cache import budget_band, idea_cache_key, normalize_text, waste_text_key
+
+BANDS = (10, 25, 50)
+
+
+@pytest.mark.parametrize("budget,band", [(0, "0-10"), (9.99, "0-10"), (10, "10-25"), (30, "25-50"),
+                                         (50, "50+"), (1000, "50+")])
+def test_budget_band(budget, band):
+    assert budget_band(budget, BANDS) == band
+
+
+def test_waste_text_key_ignores_case_and_whitespace():
+    assert normalize_text("  Old   LAPTOP ") == "old laptop"
+    assert waste_text_key("Old  Laptop", "Broken\nscreen") == waste_text_key("old laptop", "broken screen")
+    assert waste_text_key("old laptop") != waste_text_key("old", "laptop")
+
+
+def test_idea_cache_key_buckets_budget_and_ignores_type_order():
+    key = idea_cache_key("Old phone", ["DIY Tools", "electronics"], "Beginner", "usd", 30, BANDS)
+    assert key == idea_cache_key("old phone", ["electronics", "diy tools"], "beginner", "USD", 45, BANDS)
+    assert key != idea_cache_key("old phone", ["electronics", "diy tools"], "beginner", "USD", 60, BANDS)
+    assert key != idea_cache_key("old phone", ["electronics"], "beginner", "USD", 30, BANDS)
@@ -0,0 +1,177 @@
+import asyncio
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from coalesce import Coalescer
+
+
+class FakeLeases:
+    """Just enough of a Motor collection for lease documents"""
+
+    def __init__(self):
+        self.docs = {}
+
+    @staticmethod
+    def _matches(doc, query):
+        for field, condition in query.items():
+            value = doc.get(field)
+            if not isinstance(condition, dict):
+                if value != condition:
+                    return False
+                continue
+            for op, arg in condition.items():
+                if op == "$exists" and (field in doc) != arg:
+                    return False
+                if op == "$lt" and not (value is not None and value < arg):
+                    return False
+                if op == "$gt" and not (value is not None and value > arg):
+                    return False
+        return True
+
+    async def update_one(self, query, update, upsert=False):
+        doc = self.docs.get(query["_id"])
+        if doc is None or not self._matches(doc, query):
+            if not upsert:
+                return
+            if doc is not None:
+                raise DuplicateKeyError("lease held")
+            doc = self.docs[query["_id"]] = {"_id": query["_id"]}
+        doc.update(update.get("$set", {}))
+        for field in update.get("$unset", {}):
+            doc.pop(field, None)
+
+    async def find_one(self, query, projection=None):
+        doc = self.docs.get(query["_id"])
+        return dict(doc) if doc is not None and self._matches(doc, query) else None
+
+    async def delete_one(self, query):
+        doc = self.docs.get(query["_id"])
+        if doc is not None and self._matches(doc, query):
+            del self.docs[query["_id"]]
+
+
+def test_concurrent_callers_share_one_run():
+    async def scenario():
+        coalescer = Coalescer()
+        calls = 0
+
+        async def produce():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return calls
+
+        results = await asyncio.gather(*(coalescer.run("text:a", produce) for _ in range(5)))
+        assert results == [1] * 5
+        assert calls == 1
+        assert len(coalescer) == 0
+
+        # Once finished, the next call runs again
+        assert await coalescer.run("text:a", produce) == 2
+        assert await coalescer.run("text:b", produce) == 3
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_caller_does_not_cancel_shared_work():
+    async def scenario():
+        coalescer = Coalescer()
+        release = asyncio.Event()
+
+        async def produce():
+            await release.wait()
+            return "done"
+
+        first = asyncio.create_task(coalescer.run("steps:x", produce))
+        await asyncio.sleep(0)
+        assert coalescer.in_flight("steps:x")
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+        second = asyncio.create_task(coalescer.run("steps:x", produce))
+        release.set()
+        assert await second == "done"
+
+    asyncio.run(scenario())
+
+
+def test_errors_reach_every_caller():
+    async def scenario():
+        coalescer = Coalescer()
+
+        async def produce():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream failed")
+
+        results = await asyncio.gather(*(coalescer.run("text:a", produce) for _ in range(3)),
+                                       return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert not coalescer.in_flight("text:a")
+
+    asyncio.run(scenario())
+
+
+def test_lease_losers_get_the_published_result():
+    async def scenario():
+        leases = FakeLeases()
+        workers = [Coalescer(leases, poll_interval=0.01) for _ in range(3)]
+        calls = 0
+
+        async def produce():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return {"waste_id": "w1"}
+
+        async def not_written_yet():
+            return None
+
+        results = await asyncio.gather(*(w.run("text:a", produce, not_written_yet) for w in workers))
+        assert results == [{"waste_id": "w1"}] * 3
+        assert calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_empty_results_are_not_published():
+    async def scenario():
+        leases = FakeLeases()
+        worker = Coalescer(leases, poll_interval=0.01)
+
+        async def produce():
+            return []
+
+        async def nothing_stored():
+            return None
+
+        assert await worker.run("steps:x", produce, nothing_stored) == []
+        assert "steps:x" not in leases.docs
+
+    asyncio.run(scenario())
+
+
+def test_lease_is_renewed_while_the_producer_runs():
+    async def scenario():
+        leases = FakeLeases()
+        workers = [Coalescer(leases, lease_ttl=0.15, poll_interval=0.01) for _ in range(2)]
+        calls = 0
+
+        async def produce():
+            nonlocal calls
+            calls += 1
+            # Longer than the lease TTL, as when queued behind rate limits
+            await asyncio.sleep(0.25)
+            return ["step"]
+
+        async def nothing_stored():
+            return None
+
+        first = asyncio.create_task(workers[0].run("steps:x", produce, nothing_stored))
+        await asyncio.sleep(0.01)
+        assert await workers[1].run("steps:x", produce, nothing_stored) == ["step"]
+        assert await first == ["step"]
+        assert calls == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,51 @@
+import gzip
+
+from http_cache import ImmutableResponses, coded_etag, etag_matches, pick_encoding
+
+BODY = b'{"id": "x", "steps": [' + b'{"title": "step"},' * 100 + b'{}]}'
+
+
+def test_pick_encoding():
+    assert pick_encoding("gzip, deflate") == "gzip"
+    assert pick_encoding("gzip;q=0") is None
+    assert pick_encoding("identity") is None
+    assert pick_encoding(None) is None
+
+
+def test_etag_matches_is_weak_comparison():
+    assert etag_matches('W/"abc", "def"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abcd"', '"abc"')
+
+
+def test_each_coding_has_its_own_etag():
+    responses = ImmutableResponses(min_compress_size=100)
+    gzipped = responses.store("x", BODY, {"accept-encoding": "gzip"})
+    plain = responses.cached("x", {})
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(gzipped.body) == plain.body == BODY
+    assert gzipped.headers["etag"] == coded_etag(plain.headers["etag"], "gzip")
+    assert gzipped.headers["etag"] != plain.headers["etag"]
+
+
+def test_not_modified_is_answered_from_versions():
+    responses = ImmutableResponses(min_compress_size=100)
+    etag = responses.store("x", BODY, {}).headers["etag"]
+    assert responses.not_modified("x", {"if-none-match": etag}).status_code == 304
+    assert responses.not_modified("x", {"if-none-match": '"other"'}) is None
+    assert responses.not_modified("missing", {"if-none-match": etag}) is None
+
+
+def test_not_modified_only_for_the_selected_representation():
+    responses = ImmutableResponses(min_compress_size=100)
+    gzip_tag = responses.store("x", BODY, {"accept-encoding": "gzip"}).headers["etag"]
+    assert responses.not_modified("x", {"accept-encoding": "gzip", "if-none-match": gzip_tag}).status_code == 304
+    assert responses.not_modified("x", {"if-none-match": gzip_tag}) is None
+    assert responses.not_modified("missing", {"if-none-match": gzip_tag}) is None
+
+
+def test_small_bodies_are_not_compressed():
+    responses = ImmutableResponses(min_compress_size=100)
+    response = responses.store("small", b"{}", {"accept-encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"].endswith('"') and "-gzip" not in response.headers["etag"]
@@ -0,0 +1,18 @@
+from imaging import hamming_distance, hash_bands, hash_to_hex
+
+
+def test_hash_bands_split_into_labelled_tokens():
+    value = 0x0123456789ABCDEF
+    assert hash_bands(value, 4) == ["0:cdef", "1:89ab", "2:4567", "3:123"]
+
+
+def test_hashes_within_distance_share_a_band():
+    # With 4 bands, hashes differing in at most 3 bits always share one band exactly
+    value = 0x0123456789ABCDEF
+    near = value ^ (1 << 3) ^ (1 << 20) ^ (1 << 40)
+    assert hamming_distance(value, near) == 3
+    assert set(hash_bands(value, 4)) & set(hash_bands(near, 4))
+
+
+def test_hash_to_hex_is_fixed_width():
+    assert hash_to_hex(0xAB) == "00000000000000ab"
@@ -0,0 +1,54 @@
+from json_stream import JsonArrayStream
+
+RESPONSE = 'Sure!\n```json\n[{"title": "Lamp", "tags": ["a", "b"]}, {"title": "Say \\"hi\\" {x} [y]"}]\n```'
+
+
+def feed_all(chunks):
+    stream = JsonArrayStream()
+    items = []
+    for chunk in chunks:
+        items.extend(stream.feed(chunk))
+    return stream, items
+
+
+def test_whole_response():
+    stream, items = feed_all([RESPONSE])
+    assert items == [{"title": "Lamp", "tags": ["a", "b"]}, {"title": 'Say "hi" {x} [y]'}]
+    assert stream.finished
+
+
+def test_every_chunk_boundary():
+    for size in range(1, 12):
+        chunks = [RESPONSE[i:i + size] for i in range(0, len(RESPONSE), size)]
+        _, items = feed_all(chunks)
+        assert items == [{"title": "Lamp", "tags": ["a", "b"]}, {"title": 'Say "hi" {x} [y]'}], size
+
+
+def test_split_escape_sequence():
+    _, items = feed_all(['[{"title": "back\\', '\\slash \\', '"q\\"', '"}]'])
+    assert items == [{"title": 'back\\slash "q"'}]
+
+
+def test_items_arrive_as_soon_as_they_close():
+    stream = JsonArrayStream()
+    assert stream.feed('[{"a": 1}, {"b"') == [{"a": 1}]
+    assert stream.feed(': 2}') == [{"b": 2}]
+    assert not stream.finished
+
+
+def test_truncated_element_is_not_returned():
+    stream, items = feed_all(['[{"a": 1}, {"b": ', '[1, 2'])
+    assert items == [{"a": 1}]
+    assert not stream.finished
+
+
+def test_input_after_the_array_is_ignored():
+    stream, items = feed_all(['[{"a": 1}] and [{"b": 2}]'])
+    assert items == [{"a": 1}]
+    assert stream.feed('{"c": 3}') == []
+
+
+def test_invalid_element_is_counted():
+    stream, items = feed_all(['[{"a": tru}, {"b": 2}]'])
+    assert items == [{"b": 2}]
+    assert stream.errors == 1
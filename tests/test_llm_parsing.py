@@ -0,0 +1,92 @@
+from typing import List
+
+from pydantic import BaseModel
+
+from llm_parsing import OK, PARTIAL, RETRY, find_json, parse_model, parse_model_list
+
+
+class Idea(BaseModel):
+    title: str
+    cost: float
+    tags: List[str] = []
+
+
+def test_find_json_fenced_response():
+    text = 'Here you go:\n```json\n[{"title": "Lamp", "cost": 5}]\n```\nEnjoy!'
+    value, start, end = find_json(text)
+    assert value == [{"title": "Lamp", "cost": 5}]
+    assert text[start:end].startswith("[") and text[start:end].endswith("]")
+
+
+def test_find_json_ignores_brackets_inside_strings():
+    text = 'Note [draft]: {"title": "a ] b } c", "cost": 1} trailing }'
+    value, _, _ = find_json(text, "{")
+    assert value == {"title": "a ] b } c", "cost": 1}
+
+
+def test_find_json_skips_unparseable_candidate():
+    text = "[see below] then [1, 2, 3]"
+    value, _, _ = find_json(text)
+    assert value == [1, 2, 3]
+
+
+def test_find_json_without_json():
+    assert find_json("no structured output here") is None
+
+
+def test_parse_model_list_ok():
+    result = parse_model_list('[{"title": "Lamp", "cost": 5}, {"title": "Fan", "cost": 2.5}]', Idea, "test")
+    assert result.status == OK
+    assert [item.title for item in result.items] == ["Lamp", "Fan"]
+    assert not result.needs_retry
+
+
+def test_parse_model_list_unwraps_single_list_object():
+    result = parse_model_list('{"ideas": [{"title": "Lamp", "cost": 5}]}', Idea, "test")
+    assert result.status == OK
+    assert result.items[0].title == "Lamp"
+
+
+def test_parse_model_list_partial_drops_invalid_items():
+    result = parse_model_list('[{"title": "Lamp", "cost": 5}, {"title": "Fan"}, "oops"]', Idea, "test")
+    assert result.status == PARTIAL
+    assert [item.title for item in result.items] == ["Lamp"]
+    assert len(result.errors) == 2
+
+
+def test_parse_model_list_salvages_truncated_array():
+    result = parse_model_list('[{"title": "Lamp", "cost": 5}, {"title": "Fa', Idea, "test")
+    assert result.status == PARTIAL
+    assert [item.title for item in result.items] == ["Lamp"]
+
+
+def test_parse_model_list_array_with_unparseable_element_is_partial():
+    result = parse_model_list('[{"title": "Lamp", "cost": 5}, {"title": oops}]', Idea, "test")
+    assert result.status == PARTIAL
+    assert [item.title for item in result.items] == ["Lamp"]
+
+
+def test_parse_model_list_object_after_bracketed_prose():
+    result = parse_model_list('Note [draft]: {"title": "Lamp", "cost": 5}', Idea, "test")
+    assert result.status == OK
+    assert result.items[0].title == "Lamp"
+
+
+def test_parse_model_list_retry_without_json():
+    result = parse_model_list("Sorry, I cannot help with that.", Idea, "test")
+    assert result.status == RETRY
+    assert result.needs_retry
+    assert result.items == []
+
+
+def test_parse_model_list_prepare_and_limit():
+    text = '[{"title": "a"}, {"title": "b"}, {"title": "c"}]'
+    result = parse_model_list(text, Idea, "test", prepare=lambda item, index: {**item, "cost": index}, limit=2)
+    assert result.status == OK
+    assert [(item.title, item.cost) for item in result.items] == [("a", 1), ("b", 2)]
+
+
+def test_parse_model_unwraps_single_object():
+    item = parse_model('{"idea": {"title": "Lamp", "cost": 5}}', Idea, "test")
+    assert item == Idea(title="Lamp", cost=5)
+    assert parse_model('{"title": "Lamp"}', Idea, "test") is None
@@ -0,0 +1,45 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from pagination import InvalidCursorError, decode_cursor, encode_cursor, keyset_filter
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor([82, "abc"]), 2) == [82, "abc"]
+
+
+def test_cursor_round_trips_datetimes():
+    saved_at = datetime(2026, 3, 4, 5, 6, 7, 123000, tzinfo=timezone.utc)
+    values = decode_cursor(encode_cursor([saved_at, "id-1"]), 2)
+    assert values == [saved_at, "id-1"]
+    assert isinstance(values[0], datetime) and values[0].tzinfo is not None
+
+
+def test_cursor_is_url_safe():
+    token = encode_cursor(["a/b+c" * 10, "?&="])
+    assert all(c.isalnum() or c in "-_" for c in token)
+
+
+@pytest.mark.parametrize("token", ["", "!!!", encode_cursor(["only-one"]), encode_cursor({"a": 1}),
+                                   encode_cursor([{"$dt": "not a date"}, "x"])])
+def test_invalid_cursors(token):
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(token, 2)
+
+
+def test_keyset_filter_descending():
+    assert keyset_filter(["saved_at", "id"], [5, "b"]) == {"$or": [
+        {"saved_at": {"$lt": 5}},
+        {"saved_at": 5, "id": {"$lt": "b"}},
+    ]}
+
+
+def test_keyset_filter_ascending_selects_rows_after_cursor():
+    rows = [{"score": s, "id": i} for s, i in [(1, "a"), (2, "a"), (2, "b"), (2, "c"), (3, "a")]]
+    clauses = keyset_filter(["score", "id"], [2, "b"], descending=False)["$or"]
+
+    def matches(row, clause):
+        return all(row[f] > v["$gt"] if isinstance(v, dict) else row[f] == v for f, v in clause.items())
+
+    assert [r for r in rows if any(matches(r, c) for c in clauses)] == rows[3:]
@@ -0,0 +1,96 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from similarity import SimilarityIndex, WasteSimilarity, features
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, field, direction):
+        self.docs.sort(key=lambda doc: doc[field], reverse=direction < 0)
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+
+class FakeWasteCache:
+    """Only the created_at range query WasteSimilarity.load issues"""
+
+    def __init__(self):
+        self.docs = []
+
+    def find(self, query, projection=None):
+        since = query["created_at"]["$gt"]
+        return FakeCursor([dict(doc) for doc in self.docs if doc["created_at"] > since])
+
+
+def test_features_fold_synonyms_and_ignore_order():
+    assert sorted(features("dead Dell notebook")) == sorted(features("broken dell laptop"))
+    assert sorted(features("the laptop")) == sorted(features("laptop"))
+
+
+def test_query_finds_rephrasing_and_rejects_unrelated():
+    index = SimilarityIndex()
+    index.add_many(["laptop", "phone"], ["broken dell laptop", "cracked samsung phone screen"])
+    match = index.query("dell laptop, broken")
+    assert match is not None and match[0] == "laptop" and match[1] >= 0.8
+    assert index.query("microwave oven") is None
+
+
+def test_tail_and_merged_rows_are_both_searched():
+    index = SimilarityIndex(merge_every=4)
+    texts = [f"item number {i} with {i * 7} parts" for i in range(10)]
+    index.add_many([str(i) for i in range(10)], texts)
+    for i, text in enumerate(texts):
+        assert index.query(text)[0] == str(i)
+
+
+def test_signatures_match_per_text_computation():
+    index = SimilarityIndex()
+    texts = ["broken dell laptop", "old phone charger", ""]
+    batch = index.signatures(texts)
+    assert batch.shape == (3, index.num_perm)
+    for row, text in zip(batch, texts):
+        assert np.array_equal(row, index.signatures([text])[0])
+
+
+def test_discard_tombstones_entries():
+    index = SimilarityIndex()
+    index.add_many(["a", "b"], ["broken dell laptop", "broken dell laptop"])
+    assert index.discard(["a"]) == 1
+    assert index.query("broken dell laptop")[0] == "b"
+    index.discard(["b"])
+    assert index.query("broken dell laptop") is None
+    assert index.stats()["discarded"] == 2
+
+
+def test_load_indexes_documents_flushed_after_newer_ones():
+    async def scenario():
+        now = datetime.now(timezone.utc)
+        collection = FakeWasteCache()
+        similar = WasteSimilarity(collection, SimilarityIndex(), rescan=60)
+        collection.docs.append({"id": "new", "source_text": "broken dell laptop", "created_at": now})
+        assert await similar.load() == 1
+
+        # Created earlier, but its buffered insert only landed now
+        collection.docs.append({"id": "late", "source_text": "cracked samsung phone", "created_at": now - timedelta(seconds=5)})
+        similar.add("local", "old crt television")
+        collection.docs.append({"id": "local", "source_text": "old crt television", "created_at": now})
+        assert await similar.load() == 1
+        assert similar.find("samsung phone, cracked")[0] == "late"
+        assert await similar.load() == 0
+        assert len(similar.index) == 3
+
+    asyncio.run(scenario())
@@ -0,0 +1,110 @@
+import asyncio
+
+from pymongo.errors import BulkWriteError
+
+from write_behind import DUPLICATE_KEY, WriteBehindBuffer
+
+
+class FakeCollection:
+    """Records insert_many batches; can fail whole batches or reject duplicate ids"""
+
+    def __init__(self, name="docs", fail_batches=0):
+        self.name = name
+        self.docs = {}
+        self.batches = []
+        self.fail_batches = fail_batches
+
+    async def insert_many(self, docs, ordered=True):
+        if self.fail_batches:
+            self.fail_batches -= 1
+            raise ConnectionError("mongo unavailable")
+        self.batches.append([doc["id"] for doc in docs])
+        errors = []
+        for index, doc in enumerate(docs):
+            if doc["id"] in self.docs:
+                errors.append({"index": index, "code": DUPLICATE_KEY, "errmsg": "duplicate key"})
+            else:
+                doc.setdefault("_id", f"oid-{doc['id']}")
+                self.docs[doc["id"]] = doc
+        if errors:
+            raise BulkWriteError({"writeErrors": errors})
+
+    async def insert_one(self, doc):
+        self.docs[doc["id"]] = doc
+
+
+def test_flushes_full_batch_and_reads_own_writes():
+    async def scenario():
+        collection = FakeCollection()
+        buffer = WriteBehindBuffer(collection, max_batch=3, flush_interval=60)
+        original = {"id": "a", "value": 1}
+        await buffer.put(original)
+        assert buffer.get("a") == {"id": "a", "value": 1}
+        assert "a" not in collection.docs
+
+        await buffer.put({"id": "b"})
+        await buffer.put({"id": "c"})
+        await buffer.wait_written(["a", "b", "c"])
+        assert collection.batches == [["a", "b", "c"]]
+        assert buffer.get("a") is None and len(buffer) == 0
+        assert "_id" not in original
+        await buffer.close()
+
+    asyncio.run(scenario())
+
+
+def test_flushes_partial_batch_after_interval():
+    async def scenario():
+        collection = FakeCollection()
+        buffer = WriteBehindBuffer(collection, max_batch=100, flush_interval=0.01)
+        await buffer.put({"id": "a"})
+        await asyncio.wait_for(buffer.wait_written(["a"]), 1)
+        assert collection.batches == [["a"]]
+        await buffer.close()
+
+    asyncio.run(scenario())
+
+
+def test_failed_batches_are_retried():
+    async def scenario():
+        collection = FakeCollection(fail_batches=2)
+        buffer = WriteBehindBuffer(collection, max_batch=10, flush_interval=0.01, retry_backoff=0.001)
+        await buffer.put({"id": "a"})
+        assert buffer.get("a") is not None
+        await asyncio.wait_for(buffer.wait_written(["a"]), 1)
+        assert "a" in collection.docs
+        await buffer.close()
+
+    asyncio.run(scenario())
+
+
+def test_duplicates_are_not_retried():
+    async def scenario():
+        collection = FakeCollection()
+        collection.docs["a"] = {"id": "a"}
+        buffer = WriteBehindBuffer(collection, max_batch=2, flush_interval=0.01)
+        await buffer.put({"id": "a"})
+        await buffer.put({"id": "b"})
+        await asyncio.wait_for(buffer.wait_written(["a", "b"]), 1)
+        assert collection.batches == [["a", "b"]]
+        assert buffer.stats()["pending"] == 0
+        await buffer.close()
+
+    asyncio.run(scenario())
+
+
+def test_backpressure_and_close_drain_everything():
+    async def scenario():
+        collection = FakeCollection()
+        buffer = WriteBehindBuffer(collection, max_batch=4, flush_interval=0.01, max_pending=4)
+        for i in range(20):
+            await buffer.put({"id": str(i)})
+            assert len(buffer) <= 4
+        await buffer.close()
+        assert sorted(collection.docs, key=int) == [str(i) for i in range(20)]
+
+        # After close, puts write through
+        await buffer.put({"id": "late"})
+        assert "late" in collection.docs
+
+    asyncio.run(scenario())